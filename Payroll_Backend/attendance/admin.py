@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import Attendance
+from .models import Attendance, AttendancePunch
 from leave_requests.models import LeaveRequest
 
 
 admin.site.register(Attendance)
+admin.site.register(AttendancePunch)
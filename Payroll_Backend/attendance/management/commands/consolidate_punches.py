@@ -0,0 +1,44 @@
+# attendance/management/commands/consolidate_punches.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from attendance.utils import consolidate_punches
+
+
+class Command(BaseCommand):
+    help = "Fold pending AttendancePunch rows into Attendance (entry/exit/work_time/status) in bulk"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Punches claimed per transaction (default 5000)"
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and poll for new punches"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2.0,
+            help="Seconds to sleep when the log is empty in --loop mode (default 2)"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total = 0
+        while True:
+            consumed = consolidate_punches(batch_size=batch_size)
+            total += consumed
+            if consumed:
+                self.stdout.write(f"Consolidated {consumed} punches ({total} total).")
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(f"Done. {total} punches consolidated.")
@@ -0,0 +1,30 @@
+# attendance/management/commands/import_attendance.py
+
+from django.core.management.base import BaseCommand
+from attendance.utils import import_attendance_csv
+
+
+class Command(BaseCommand):
+    help = (
+        "Import attendance from a biometric/CSV export "
+        "(columns: employee_id,date[,entry_time,exit_time,status,entry_latitude,...])"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=str, help="Path to the CSV file")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Rows upserted per INSERT ... ON CONFLICT (default 5000)"
+        )
+
+    def handle(self, *args, **options):
+        with open(options["path"], newline="", encoding="utf-8-sig") as f:
+            result = import_attendance_csv(f, chunk_size=options["chunk_size"])
+
+        for rejected in result["rejected"]:
+            self.stderr.write(f"line {rejected['line']}: {rejected['error']}")
+        self.stdout.write(
+            f"Imported {result['imported']} rows, rejected {len(result['rejected'])} lines."
+        )
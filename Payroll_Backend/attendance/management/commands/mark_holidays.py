@@ -3,6 +3,7 @@
 from django.core.management.base import BaseCommand
 from datetime import date, timedelta
 from attendance.models import Attendance
+from attendance.status import apply_statuses
 from employee.models import Employee
 
 class Command(BaseCommand):
@@ -69,6 +70,8 @@ class Command(BaseCommand):
                             work_time=None
                         )
                     )
+        # bulk_create skips Attendance.save(), so run the shared rules here
+        apply_statuses(to_create)
         Attendance.objects.bulk_create(to_create, ignore_conflicts=True)
         self.stdout.write(f"Created {len(to_create)} holiday rows.")
 
@@ -0,0 +1,82 @@
+# attendance/management/commands/punch_load_test.py
+
+import random
+import threading
+import time
+from datetime import date, time as dtime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from attendance.models import AttendancePunch
+from attendance.utils import consolidate_punches
+from employee.models import Employee
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the punch ingestion path: concurrent writers append punches for "
+        "--seconds, then the consolidator folds them into Attendance. Run against a "
+        "local Postgres; writes real rows for --date."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="Concurrent writer threads (default 8)")
+        parser.add_argument("--seconds", type=float, default=10.0, help="Duration of the write phase (default 10)")
+        parser.add_argument("--date", type=str, default=None, help="Attendance date to punch (YYYY-MM-DD, default today)")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Consolidator batch size (default 5000)")
+
+    def handle(self, *args, **options):
+        punch_date = date.fromisoformat(options["date"]) if options["date"] else date.today()
+        employee_ids = list(Employee.objects.values_list("id", flat=True))
+        if not employee_ids:
+            raise CommandError("No employees found; seed some before running the load test.")
+
+        deadline = time.perf_counter() + options["seconds"]
+        counts = [0] * options["workers"]
+
+        def writer(slot):
+            rng = random.Random(slot)
+            try:
+                while time.perf_counter() < deadline:
+                    kind = "entry" if rng.random() < 0.5 else "exit"
+                    hour = rng.randint(8, 10) if kind == "entry" else rng.randint(16, 19)
+                    # Same single-row INSERT the mark-entry1/mark-exit1 views issue
+                    AttendancePunch.objects.create(
+                        employee_id=rng.choice(employee_ids),
+                        date=punch_date,
+                        time=dtime(hour, rng.randint(0, 59)),
+                        kind=kind,
+                        latitude=13.0,
+                        longitude=80.2,
+                    )
+                    counts[slot] += 1
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(options["workers"])]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        write_elapsed = time.perf_counter() - started
+        written = sum(counts)
+
+        started = time.perf_counter()
+        consolidated = 0
+        while True:
+            consumed = consolidate_punches(batch_size=options["batch_size"])
+            if not consumed:
+                break
+            consolidated += consumed
+        fold_elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"Ingest: {written} punches in {write_elapsed:.2f}s "
+            f"with {options['workers']} writers = {written / write_elapsed:,.0f} punches/sec"
+        )
+        if fold_elapsed > 0:
+            self.stdout.write(
+                f"Consolidate: {consolidated} punches in {fold_elapsed:.2f}s "
+                f"= {consolidated / fold_elapsed:,.0f} punches/sec"
+            )
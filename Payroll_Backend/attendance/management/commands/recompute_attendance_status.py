@@ -0,0 +1,77 @@
+# attendance/management/commands/recompute_attendance_status.py
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from attendance.models import Attendance
+from attendance.status import apply_statuses
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-derive work_time/status for every Attendance row in a date range, "
+        "repairing rows written by bulk paths that bypassed Attendance.save()"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", type=str, required=True, help="First date (YYYY-MM-DD)")
+        parser.add_argument("--end", type=str, required=True, help="Last date (YYYY-MM-DD)")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Rows read and bulk-updated per batch (default 5000)"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report how many rows would change without writing"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options["start"])
+            end = date.fromisoformat(options["end"])
+        except ValueError:
+            raise CommandError("--start and --end must be YYYY-MM-DD")
+        if start > end:
+            raise CommandError("--start must not be after --end")
+
+        chunk_size = options["chunk_size"]
+        rows = (
+            Attendance.objects
+            .filter(date__range=(start, end))
+            .only("id", "entry_time", "exit_time", "work_time", "status", "updated_at")
+            .order_by("id")
+            .iterator(chunk_size=chunk_size)
+        )
+
+        scanned = 0
+        changed = 0
+        batch = []
+
+        def flush(batch):
+            fixed = apply_statuses(batch)
+            if fixed and not options["dry_run"]:
+                now = timezone.now()
+                for record in fixed:
+                    record.updated_at = now
+                with transaction.atomic():
+                    Attendance.objects.bulk_update(
+                        fixed, ["work_time", "status", "updated_at"], batch_size=chunk_size
+                    )
+            return len(fixed)
+
+        for record in rows:
+            batch.append(record)
+            scanned += 1
+            if len(batch) >= chunk_size:
+                changed += flush(batch)
+                batch = []
+        if batch:
+            changed += flush(batch)
+
+        verb = "would change" if options["dry_run"] else "updated"
+        self.stdout.write(f"Scanned {scanned} rows between {start} and {end}; {verb} {changed}.")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_attendance_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancepunch',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
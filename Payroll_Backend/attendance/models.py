@@ -1,6 +1,6 @@
 from django.db import models
-from django.utils import timezone
 from employee.models import Employee
+from .status import LEAVE_STATUSES, derive_statuses
 
 class Attendance(models.Model):
 
@@ -16,10 +16,7 @@ class Attendance(models.Model):
         ('Absent', 'Absent')
     ]
 
-    LEAVE_STATUSES = {
-        'Paid Leave', 'Half Paid Leave', 'UnPaid Leave', 'Half UnPaid Leave',
-        'Sick Leave', 'Holiday'
-    }
+    LEAVE_STATUSES = LEAVE_STATUSES
 
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='attendance_records')
     date = models.DateField()
@@ -31,34 +28,60 @@ class Attendance(models.Model):
     entry_longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     exit_latitude   = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     exit_longitude  = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    # Change tracking for incremental backups; bulk paths set it explicitly
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
 
     class Meta:
         unique_together = ('employee', 'date')
 
-    def save(self, *args, **kwargs):
-        # Calculate work time
-        if self.entry_time and self.exit_time:
-            entry = timezone.datetime.combine(self.date, self.entry_time)
-            exit = timezone.datetime.combine(self.date, self.exit_time)
-            if exit > entry:
-                self.work_time = exit - entry
-
-        if self.work_time:
-            hours_worked = self.work_time.total_seconds() / 3600
-            if hours_worked >= 8:
-                self.status = 'Present'
-            elif 4 <= hours_worked < 8:
-                self.status = 'Half Absent'
-            else:
-                self.status = 'Absent'
-        else:
-            # keep manual leave/holiday if already set
-            if self.status not in self.LEAVE_STATUSES:
-                self.status = 'Absent'
+    def apply_status_rules(self):
+        """
+        Derive work_time and status from the clock times (see attendance.status).
+        Called by save(); bulk paths use attendance.status.apply_statuses().
+        """
+        work_times, statuses = derive_statuses(
+            [self.entry_time], [self.exit_time], [self.work_time], [self.status]
+        )
+        self.work_time, self.status = work_times[0], statuses[0]
 
+    def save(self, *args, **kwargs):
+        self.apply_status_rules()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Attendance for {self.employee.id} on {self.date}"
 
+
+
+class AttendancePunch(models.Model):
+    """
+    Log of clock-in/clock-out punches. Writes are a single INSERT;
+    consolidate_punches() folds them into Attendance rows in bulk and marks
+    them processed.
+    """
+
+    KIND_CHOICES = [
+        ('entry', 'Entry'),
+        ('exit', 'Exit'),
+    ]
+
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='attendance_punches')
+    date = models.DateField()
+    time = models.TimeField()
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed = models.BooleanField(default=False)
+    # Change tracking for incremental backups: marking punches processed must
+    # travel too, or a restored chain would consolidate them again
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['processed', 'id'], name='attendance_punch_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} punch for {self.employee_id} on {self.date} at {self.time}"
@@ -33,6 +33,38 @@ class AttendanceSerializer(serializers.ModelSerializer):
         read_only_fields = ['work_time']
 
 
+class AttendanceListSerializer(serializers.ModelSerializer):
+    """
+    Read-only variant of AttendanceSerializer for bulk reads.
+    Expects the queryset to come with select_related('employee') so the
+    employee columns are read from the joined row instead of one query per record.
+    """
+    employee = serializers.SerializerMethodField()
+    emp_id = serializers.IntegerField(source='employee_id', read_only=True)
+    emp_name = serializers.CharField(source='employee.name', read_only=True)
+
+    class Meta:
+        model = Attendance
+        fields = [
+            'id',
+            'employee',
+            'emp_id',
+            'emp_name',
+            'date',
+            'entry_time',
+            'exit_time',
+            'work_time',
+            'status', 'entry_latitude', 'entry_longitude',
+            'exit_latitude', 'exit_longitude',
+        ]
+        read_only_fields = fields
+
+    def get_employee(self, obj):
+        # Same text as Employee.__str__, built from the columns loaded with only()
+        emp = obj.employee
+        return f"{emp.id} - {emp.name or emp.email}"
+
+
 class LeaveSummarySerializer(serializers.Serializer):
     remaining_paid_leaves = serializers.IntegerField()
     remaining_sick_leaves = serializers.IntegerField()
@@ -0,0 +1,83 @@
+# attendance/status.py
+"""
+Work-time / status rules for Attendance, shared by Attendance.save() and the
+bulk paths (punch consolidation, CSV import, mark_holidays,
+recompute_attendance_status) that write with bulk_create/bulk_update and so
+never reach save().
+"""
+from datetime import timedelta
+
+PRESENT_HOURS = 8
+HALF_ABSENT_HOURS = 4
+
+LEAVE_STATUSES = {
+    'Paid Leave', 'Half Paid Leave', 'UnPaid Leave', 'Half UnPaid Leave',
+    'Sick Leave', 'Holiday'
+}
+
+_PRESENT_SECONDS = PRESENT_HOURS * 3600
+_HALF_ABSENT_SECONDS = HALF_ABSENT_HOURS * 3600
+
+
+def _seconds(t):
+    return t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1_000_000
+
+
+def derive_statuses(entry_times, exit_times, work_times, statuses):
+    """
+    Batch form of the Attendance rules. Takes four equal-length sequences
+    (lists, tuples or NumPy object arrays) and returns (work_times, statuses)
+    as two new lists:
+
+      • work_time = exit - entry when both are set and exit is later,
+        otherwise the existing work_time is kept;
+      • >= 8h  -> 'Present', 4h..8h -> 'Half Absent', otherwise 'Absent';
+      • with no work_time, a leave/holiday status is kept, anything else
+        becomes 'Absent'.
+
+    Entry and exit are on the same date, so the arithmetic is done on seconds
+    since midnight instead of building datetimes.
+    """
+    out_work_times = []
+    out_statuses = []
+    for entry, exit_, work_time, status in zip(entry_times, exit_times, work_times, statuses):
+        if entry is not None and exit_ is not None:
+            worked = _seconds(exit_) - _seconds(entry)
+            if worked > 0:
+                work_time = timedelta(seconds=worked)
+
+        if work_time:
+            worked = work_time.total_seconds()
+            if worked >= _PRESENT_SECONDS:
+                status = 'Present'
+            elif worked >= _HALF_ABSENT_SECONDS:
+                status = 'Half Absent'
+            else:
+                status = 'Absent'
+        elif status not in LEAVE_STATUSES:
+            status = 'Absent'
+
+        out_work_times.append(work_time)
+        out_statuses.append(status)
+    return out_work_times, out_statuses
+
+
+def apply_statuses(records):
+    """
+    Runs derive_statuses over Attendance instances in place and returns the
+    ones whose work_time or status changed.
+    """
+    records = list(records)
+    work_times, statuses = derive_statuses(
+        [r.entry_time for r in records],
+        [r.exit_time for r in records],
+        [r.work_time for r in records],
+        [r.status for r in records],
+    )
+    changed = []
+    for record, work_time, status in zip(records, work_times, statuses):
+        if record.work_time != work_time or record.status != status:
+            record.work_time = work_time
+            record.status = status
+            changed.append(record)
+    return changed
@@ -1,3 +1,196 @@
-from django.test import TestCase
+from datetime import date, time, timedelta
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from employee.models import Employee
+from .models import Attendance, AttendancePunch
+from .status import derive_statuses
+from .utils import consolidate_punches
+
+
+class AttendanceListQueryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Employee.objects.create_user(
+            id='900001', email='admin@example.com', password='pass',
+            name='Admin', role='admin', date_joined=date(2024, 1, 1),
+        )
+        cls.employees = [
+            Employee.objects.create_user(
+                id=f'90010{i}', email=f'emp{i}@example.com', password='pass',
+                name=f'Employee {i}', date_joined=date(2024, 1, 1),
+            )
+            for i in range(5)
+        ]
+        start = date(2025, 4, 1)
+        Attendance.objects.bulk_create([
+            Attendance(
+                employee=emp, date=start + timedelta(days=d),
+                entry_time=time(9, 0), exit_time=time(18, 0),
+                work_time=timedelta(hours=9), status='Present',
+            )
+            for emp in cls.employees
+            for d in range(10)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_list_query_count_does_not_grow_with_rows(self):
+        # one COUNT for the paginator + one joined SELECT for the page
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/attendance/attendance/', {'page_size': 50})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 50)
+        first = response.data['results'][0]
+        self.assertEqual(first['emp_name'], Attendance.objects.get(id=first['id']).employee.name)
+        self.assertEqual(first['employee'], str(Attendance.objects.get(id=first['id']).employee))
+
+    def test_list_filters_by_employee_and_date_range(self):
+        emp = self.employees[0]
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/attendance/attendance/', {
+                'employee': emp.id, 'date_from': '2025-04-03', 'date_to': '2025-04-05',
+            })
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual({row['emp_id'] for row in response.data['results']}, {int(emp.id)})
+
+    def test_invalid_date_filter_is_rejected(self):
+        response = self.client.get('/api/attendance/attendance/', {'date_from': '04-2025'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_retrieve_uses_single_query(self):
+        record = Attendance.objects.first()
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/attendance/attendance/{record.id}/')
+        self.assertEqual(response.data['id'], record.id)
+
+    def test_by_date_marked_list_is_joined(self):
+        # marked attendance, unmarked employees and their two prefetched m2m lists,
+        # independent of the row count
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/attendance/by-date/', {'date': '2025-04-01'})
+        self.assertEqual(len(response.data['marked']), 5)
+
+
+class ConsolidatePunchesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.emp = Employee.objects.create_user(
+            id='900200', email='punch@example.com', password='pass',
+            name='Puncher', date_joined=date(2024, 1, 1),
+        )
+
+    def test_punches_fold_into_attendance_with_status(self):
+        day = date(2025, 4, 1)
+        Attendance.objects.create(employee=self.emp, date=day, entry_time=time(10, 0))
+        AttendancePunch.objects.create(employee=self.emp, date=day, time=time(9, 0), kind='entry')
+        AttendancePunch.objects.create(employee=self.emp, date=day, time=time(18, 0), kind='exit')
+        AttendancePunch.objects.create(employee=self.emp, date=day + timedelta(days=1), time=time(9, 0), kind='entry')
+        AttendancePunch.objects.create(employee=self.emp, date=day + timedelta(days=1), time=time(12, 0), kind='exit')
+
+        self.assertEqual(consolidate_punches(), 4)
+        self.assertEqual(consolidate_punches(), 0)
+
+        first = Attendance.objects.get(employee=self.emp, date=day)
+        self.assertEqual((first.entry_time, first.exit_time), (time(9, 0), time(18, 0)))
+        self.assertEqual((first.work_time, first.status), (timedelta(hours=9), 'Present'))
+        second = Attendance.objects.get(employee=self.emp, date=day + timedelta(days=1))
+        self.assertEqual(second.status, 'Absent')
+
+    @override_settings(ATTENDANCE_PUNCH_QUEUE=True)
+    def test_mark_entry1_appends_punch_when_queue_enabled(self):
+        client = APIClient()
+        client.force_authenticate(self.emp)
+        response = client.post('/api/attendance/mark-entry1/', {
+            'date': '2025-04-02', 'time': '09:15', 'latitude': 13.0, 'longitude': 80.2,
+        }, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Attendance.objects.filter(employee=self.emp).exists())
+        self.assertEqual(AttendancePunch.objects.filter(employee=self.emp, kind='entry').count(), 1)
+
+    @override_settings(ATTENDANCE_PUNCH_QUEUE=True)
+    def test_exit_without_entry_is_refused_or_dropped(self):
+        client = APIClient()
+        client.force_authenticate(self.emp)
+        response = client.post('/api/attendance/mark-exit1/', {
+            'date': '2025-04-02', 'time': '18:00', 'latitude': 13.0, 'longitude': 80.2,
+        }, format='json')
+        self.assertEqual(response.status_code, 404)
+
+        AttendancePunch.objects.create(employee=self.emp, date=date(2025, 4, 3), time=time(18, 0), kind='exit')
+        self.assertEqual(consolidate_punches(), 1)
+        self.assertFalse(Attendance.objects.filter(employee=self.emp).exists())
+
+
+class ImportAttendanceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Employee.objects.create_user(
+            id='900300', email='importer@example.com', password='pass',
+            name='Importer', role='admin', date_joined=date(2024, 1, 1),
+        )
+
+    def test_upload_upserts_rows_and_reports_rejected_lines(self):
+        Attendance.objects.create(employee=self.admin, date=date(2025, 4, 1), entry_time=time(11, 0))
+        csv_data = (
+            "employee_id,date,entry_time,exit_time,status\n"
+            "900300,2025-04-01,09:00,18:00,\n"
+            "900300,2025-04-02,09:00,15:00,\n"
+            "999999,2025-04-02,09:00,18:00,\n"
+            "900300,2025-04-03,,,Holiday\n"
+            "900300,04/04/2025,09:00,18:00,\n"
+        ).encode()
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.post('/api/attendance/import/', {
+            'file': SimpleUploadedFile('export.csv', csv_data, content_type='text/csv'),
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['imported'], 3)
+        self.assertEqual([r['line'] for r in response.data['rejected']], [4, 6])
+        statuses = dict(Attendance.objects.filter(employee=self.admin).values_list('date', 'status'))
+        self.assertEqual(statuses, {
+            date(2025, 4, 1): 'Present',
+            date(2025, 4, 2): 'Half Absent',
+            date(2025, 4, 3): 'Holiday',
+        })
+        self.assertEqual(Attendance.objects.get(employee=self.admin, date=date(2025, 4, 1)).entry_time, time(9, 0))
+
+    def test_upload_that_is_not_utf8_is_refused_with_its_line(self):
+        csv_data = (
+            "employee_id,date,entry_time,exit_time,status\n"
+            "900300,2025-04-01,09:00,18:00,\n"
+            "900300,2025-04-02,09:00,18:00,Présent\n"
+        ).encode('latin-1')
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.post('/api/attendance/import/', {
+            'file': SimpleUploadedFile('export.csv', csv_data, content_type='text/csv'),
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('line 3 is not valid UTF-8', response.data['detail'])
+        self.assertFalse(Attendance.objects.exists())
+
+
+class DeriveStatusesTests(TestCase):
+
+    def test_batch_matches_single_row_save_rules(self):
+        work_times, statuses = derive_statuses(
+            [time(9, 0), time(9, 0), time(9, 0), None, None, time(18, 0)],
+            [time(17, 0), time(14, 0), time(11, 0), None, None, time(9, 0)],
+            [None, None, None, None, None, timedelta(hours=5)],
+            [None, 'Paid Leave', None, 'Holiday', 'Present', None],
+        )
+        self.assertEqual(statuses, ['Present', 'Half Absent', 'Absent', 'Holiday', 'Absent', 'Half Absent'])
+        self.assertEqual(work_times[:3], [timedelta(hours=8), timedelta(hours=5), timedelta(hours=2)])
+        # exit before entry keeps the stored work_time, as Attendance.save() does
+        self.assertEqual(work_times[5], timedelta(hours=5))
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import employee_attendance, manage_attendance, AttendanceViewSet, LeaveRequestViewSet,mark_entry, mark_exit,mark_entry1, mark_exit1, update_leave_status,leave_summary_view,today_attendance_view ,attendance_status, attendance_by_date
+from .views import employee_attendance, manage_attendance, AttendanceViewSet, LeaveRequestViewSet,mark_entry, mark_exit,mark_entry1, mark_exit1, update_leave_status,leave_summary_view,today_attendance_view ,attendance_status, attendance_by_date, import_attendance
 
 router = DefaultRouter()
 router.register(r'attendance', AttendanceViewSet, basename='attendance')
@@ -19,5 +19,6 @@ urlpatterns = [
     path('today/',today_attendance_view, name='attendance-today'),
     path('attendance-status/',attendance_status, name='attendance-status' ),
     path('by-date/', attendance_by_date, name='attendance-by-date'),
+    path('import/', import_attendance, name='attendance-import'),
 
 ]
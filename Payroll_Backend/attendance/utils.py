@@ -1,8 +1,14 @@
 # attendance/utils.py
-from datetime import timedelta, date
-from .models import Attendance
+import csv
+from datetime import timedelta, date, time
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.utils import timezone
+from .models import Attendance, AttendancePunch
+from .status import apply_statuses
 from leave_requests.models import LeaveRequest
 from employee.models import Employee  # import your Employee model
+from payroll_management_system.metrics import LEAVE_APPROVALS, LEAVE_APPROVAL_DAYS
 
 def is_public_holiday(d: date) -> bool:
     public_holidays = {
@@ -107,3 +113,235 @@ def apply_approved_leave(leave_request: LeaveRequest):
         att.entry_time = att.exit_time = att.work_time = None
 
         att.save()
+
+    LEAVE_APPROVALS.inc(leave_type=lt)
+    LEAVE_APPROVAL_DAYS.inc(leave_counter, leave_type=lt)
+
+
+
+def consolidate_punches(batch_size: int = 5000) -> int:
+    """
+    Folds one batch of unprocessed AttendancePunch rows into Attendance.
+
+    Punches are read oldest first, so the last entry/exit punch of a day wins,
+    the same as calling mark_entry1/mark_exit1 one after another. Existing
+    Attendance rows for the batch are loaded in a single query, work_time and
+    status are derived for the whole batch with attendance.status, and the
+    result is written with one bulk_create and one bulk_update.
+
+    Work is claimed by employee: the Employee rows of the oldest punches are
+    locked with SELECT ... FOR NO KEY UPDATE SKIP LOCKED (which new punch
+    INSERTs do not wait for), and only those employees' punches are folded.
+    Two consolidators therefore never write the same Attendance row, so
+    several can run side by side. An exit punch for a day with neither an
+    Attendance row nor an entry punch is dropped. Returns the number of
+    punches consumed.
+    """
+    with transaction.atomic():
+        candidates = set(
+            AttendancePunch.objects.filter(processed=False).order_by('id')
+            .values_list('employee_id', flat=True)[:batch_size]
+        )
+        employee_ids = list(
+            Employee.objects.filter(id__in=candidates)
+            .select_for_update(skip_locked=True, no_key=True)
+            .values_list('id', flat=True)
+        )
+        if not employee_ids:
+            return 0
+        punches = list(
+            AttendancePunch.objects.filter(processed=False, employee_id__in=employee_ids).order_by('id')[:batch_size]
+        )
+        if not punches:
+            return 0
+
+        # (employee_id, date) -> {'entry': punch, 'exit': punch}
+        latest = {}
+        for punch in punches:
+            latest.setdefault((punch.employee_id, punch.date), {})[punch.kind] = punch
+
+        dates = {day for _, day in latest}
+        existing = {
+            (att.employee_id, att.date): att
+            for att in Attendance.objects.filter(employee_id__in=employee_ids, date__in=dates)
+        }
+
+        to_create, to_update = [], []
+        for key, kinds in latest.items():
+            att = existing.get(key)
+            if att is None and 'entry' not in kinds:
+                # exit without an entry, as mark_exit1 refuses
+                continue
+            if att is None:
+                att = Attendance(employee_id=key[0], date=key[1])
+                to_create.append(att)
+            else:
+                to_update.append(att)
+
+            entry = kinds.get('entry')
+            if entry:
+                att.entry_time = entry.time
+                att.entry_latitude = entry.latitude
+                att.entry_longitude = entry.longitude
+            exit_punch = kinds.get('exit')
+            if exit_punch:
+                att.exit_time = exit_punch.time
+                att.exit_latitude = exit_punch.latitude
+                att.exit_longitude = exit_punch.longitude
+
+        # one pass over the whole batch with the shared Attendance rules
+        apply_statuses(to_create + to_update)
+
+        # bulk_update and update() skip auto_now, so stamp updated_at for incremental backups
+        now = timezone.now()
+        for att in to_update:
+            att.updated_at = now
+
+        Attendance.objects.bulk_create(to_create, batch_size=1000)
+        Attendance.objects.bulk_update(
+            to_update,
+            ['entry_time', 'exit_time', 'work_time', 'status',
+             'entry_latitude', 'entry_longitude', 'exit_latitude', 'exit_longitude', 'updated_at'],
+            batch_size=1000,
+        )
+        AttendancePunch.objects.filter(id__in=[p.id for p in punches]).update(processed=True, updated_at=now)
+
+    return len(punches)
+
+
+IMPORT_UPDATE_FIELDS = [
+    'entry_time', 'exit_time', 'work_time', 'status',
+    'entry_latitude', 'entry_longitude', 'exit_latitude', 'exit_longitude',
+    # set by auto_now on the INSERT values; listed so conflicting rows get it too
+    'updated_at',
+]
+
+
+def _parse_import_row(row, employee_ids):
+    """
+    Turns one CSV row (as a dict) into an unsaved Attendance.
+    Raises ValueError with a readable message for rejected lines.
+    """
+    emp_id = (row.get('employee_id') or '').strip()
+    if not emp_id:
+        raise ValueError("employee_id is missing")
+    if emp_id not in employee_ids:
+        raise ValueError(f"unknown employee_id {emp_id}")
+
+    try:
+        day = date.fromisoformat((row.get('date') or '').strip())
+    except ValueError:
+        raise ValueError("date must be YYYY-MM-DD")
+
+    def parse_time(column):
+        value = (row.get(column) or '').strip()
+        if not value:
+            return None
+        try:
+            return time.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"{column} must be HH:MM or HH:MM:SS")
+
+    status = (row.get('status') or '').strip() or None
+    if status and status not in Attendance.LEAVE_STATUSES:
+        raise ValueError(f"status must be one of {sorted(Attendance.LEAVE_STATUSES)} or empty")
+
+    def parse_coordinate(column):
+        value = (row.get(column) or '').strip()
+        if not value:
+            return None
+        try:
+            return Decimal(value).quantize(Decimal('0.000001'))
+        except InvalidOperation:
+            raise ValueError(f"{column} must be a number")
+
+    att = Attendance(
+        employee_id=emp_id,
+        date=day,
+        entry_time=parse_time('entry_time'),
+        exit_time=parse_time('exit_time'),
+        status=status,
+        entry_latitude=parse_coordinate('entry_latitude'),
+        entry_longitude=parse_coordinate('entry_longitude'),
+        exit_latitude=parse_coordinate('exit_latitude'),
+        exit_longitude=parse_coordinate('exit_longitude'),
+    )
+    return att
+
+
+def _flush_import_chunk(chunk):
+    records = list(chunk.values())
+    # Same work_time/status rules as Attendance.save(), derived for the whole chunk
+    apply_statuses(records)
+    Attendance.objects.bulk_create(
+        records,
+        update_conflicts=True,
+        unique_fields=['employee', 'date'],
+        update_fields=IMPORT_UPDATE_FIELDS,
+    )
+    return len(chunk)
+
+
+class ImportEncodingError(ValueError):
+    """An uploaded import file that is not UTF-8 text."""
+
+
+def utf8_lines(fileobj):
+    """
+    Text lines of a binary upload, decoded as UTF-8 one line at a time (a
+    leading BOM is dropped), so a bad byte is reported with its line number:
+    raises ImportEncodingError when it is reached.
+    """
+    for number, raw in enumerate(fileobj, 1):
+        try:
+            yield raw.decode('utf-8-sig' if number == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            raise ImportEncodingError(
+                f"line {number} is not valid UTF-8; save the file as UTF-8 (e.g. 'CSV UTF-8') and upload it again"
+            ) from None
+
+
+def import_attendance_csv(lines, chunk_size: int = 5000) -> dict:
+    """
+    Streams a device/CSV export into Attendance.
+
+    `lines` is any iterable of text lines (an open file, utf8_lines() over an
+    upload); it is read one line at a time. The header must contain
+    employee_id and date, and may contain entry_time, exit_time, status and the
+    four latitude/longitude columns. Status is only taken for leave/holiday
+    rows; otherwise it is derived from the clock times.
+
+    Each chunk gets its work_time/status from attendance.status and is
+    upserted with a single INSERT ... ON CONFLICT (employee, date) DO UPDATE. Bad lines are reported and skipped, the rest of the batch
+    is still imported.
+    """
+    employee_ids = set(Employee.objects.values_list('id', flat=True))
+    reader = csv.DictReader(lines)
+    missing = {'employee_id', 'date'} - set(reader.fieldnames or [])
+    if missing:
+        return {
+            "imported": 0,
+            "rejected": [{"line": 1, "error": f"header is missing {', '.join(sorted(missing))}"}],
+        }
+
+    imported = 0
+    rejected = []
+    # keyed by (employee_id, date): a repeated day inside one chunk keeps its
+    # last line, since ON CONFLICT cannot touch the same row twice
+    chunk = {}
+    for row in reader:
+        try:
+            att = _parse_import_row(row, employee_ids)
+        except ValueError as e:
+            rejected.append({"line": reader.line_num, "error": str(e)})
+            continue
+
+        chunk[(att.employee_id, att.date)] = att
+        if len(chunk) >= chunk_size:
+            imported += _flush_import_chunk(chunk)
+            chunk = {}
+
+    if chunk:
+        imported += _flush_import_chunk(chunk)
+
+    return {"imported": imported, "rejected": rejected}
@@ -1,10 +1,13 @@
 from datetime import date, datetime, time as dtime
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 from rest_framework import status
+from django.db import transaction
 from django.utils import timezone
+from django.conf import settings
 from rest_framework.decorators import action
 from datetime import timedelta
 from django.db.models import Count, Q ,OuterRef, Exists
@@ -12,18 +15,70 @@ from django.db.models.functions import Lower, Trim
 from django.utils.dateparse import parse_datetime
 from rest_framework import status as http_status
 from rest_framework.views import APIView
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
 
-from .models import Employee, Attendance
+from .models import Employee, Attendance, AttendancePunch
 from leave_requests.models import LeaveRequest
-from .serializers import AttendanceSerializer
+from .serializers import AttendanceSerializer, AttendanceListSerializer
 from leave_requests.serializers import LeaveRequestSerializer
 from employee.serializers import EmployeeSerializer
 from attendance.serializers import LeaveSummarySerializer
+from attendance.utils import ImportEncodingError, import_attendance_csv, utf8_lines
+from payroll_management_system.metrics import ATTENDANCE_PUNCHES
+
+
+class AttendancePagination(PageNumberPagination):
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
 
 
 class AttendanceViewSet(ModelViewSet):
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
+    pagination_class = AttendancePagination
+
+    # Columns needed by AttendanceListSerializer; everything else stays unloaded
+    LIST_ONLY_FIELDS = (
+        'id', 'date', 'entry_time', 'exit_time', 'work_time', 'status',
+        'entry_latitude', 'entry_longitude', 'exit_latitude', 'exit_longitude',
+        'employee__id', 'employee__name', 'employee__email',
+    )
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve'):
+            return AttendanceListSerializer
+        return AttendanceSerializer
+
+    def get_queryset(self):
+        """
+        list/retrieve join the employee row and trim columns, and the list can be
+        narrowed with ?employee=<id>&date_from=YYYY-MM-DD&date_to=YYYY-MM-DD.
+        """
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+
+        queryset = queryset.select_related('employee').only(*self.LIST_ONLY_FIELDS)
+
+        params = self.request.query_params
+        employee_id = params.get('employee')
+        date_from = params.get('date_from')
+        date_to = params.get('date_to')
+
+        if employee_id:
+            queryset = queryset.filter(employee_id=employee_id)
+        try:
+            if date_from:
+                queryset = queryset.filter(date__gte=date.fromisoformat(date_from))
+            if date_to:
+                queryset = queryset.filter(date__lte=date.fromisoformat(date_to))
+        except ValueError:
+            raise ValidationError({"detail": "date_from/date_to must be YYYY-MM-DD."})
+
+        return queryset.order_by('-date', 'employee_id')
+
     @action(detail=False, methods=['get'], url_path='today')
     def today(self, request):
         employee_id = request.query_params.get('employee')
@@ -147,7 +202,9 @@ def employee_attendance(request):
     base_filter = dict(employee_id=employee.id, date__year=year)
     if month:
         base_filter['date__month'] = month
-    queryset = Attendance.objects.filter(**base_filter)
+    queryset = Attendance.objects.filter(**base_filter).select_related('employee').only(
+        *AttendanceViewSet.LIST_ONLY_FIELDS
+    )
 
     summary = queryset.aggregate(
         present=Count('id', filter=Q(status__iexact='present')),
@@ -160,7 +217,7 @@ def employee_attendance(request):
         
     )
 
-    details = AttendanceSerializer(queryset, many=True).data
+    details = AttendanceListSerializer(queryset, many=True).data
     summary['details'] = details
     return Response(summary)
 
@@ -211,6 +268,32 @@ def mark_exit(request):
     att.save()
     return Response(AttendanceSerializer(att).data)
 
+def _queue_punch(employee, kind, attendance_date, punch_time, lat, lng):
+    """
+    Punch-log path for mark_entry1/mark_exit1: one INSERT into AttendancePunch,
+    no read-modify-write on Attendance. The consolidate_punches command folds
+    the log into Attendance, so the response is a provisional record.
+    """
+    AttendancePunch.objects.create(
+        employee=employee,
+        date=attendance_date,
+        time=punch_time,
+        kind=kind,
+        latitude=lat,
+        longitude=lng,
+    )
+    ATTENDANCE_PUNCHES.inc(kind=kind, path='queued')
+    return Response({
+        "id": None,
+        "employee": employee.pk,
+        "date": attendance_date,
+        f"{kind}_time": punch_time,
+        f"{kind}_latitude": lat,
+        f"{kind}_longitude": lng,
+        "status": None,
+        "queued": True,
+    }, status=status.HTTP_202_ACCEPTED)
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def mark_entry1(request):
@@ -232,6 +315,9 @@ def mark_entry1(request):
     except Exception:
         return Response({'detail': 'Invalid date/time format'}, status=status.HTTP_400_BAD_REQUEST)
 
+    if settings.ATTENDANCE_PUNCH_QUEUE:
+        return _queue_punch(request.user, 'entry', attendance_date, entry_time, lat, lng)
+
     att, _ = Attendance.objects.update_or_create(
         employee=request.user,
         date=attendance_date,
@@ -241,6 +327,7 @@ def mark_entry1(request):
             'entry_longitude': lng
         }
     )
+    ATTENDANCE_PUNCHES.inc(kind='entry', path='direct')
     return Response(AttendanceSerializer(att).data)
 
 @api_view(['POST'])
@@ -269,6 +356,19 @@ def mark_exit1(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    if settings.ATTENDANCE_PUNCH_QUEUE:
+        # the entry may still be waiting in the punch log
+        has_entry = (
+            Attendance.objects.filter(employee=request.user, date=attendance_date).exists()
+            or AttendancePunch.objects.filter(employee=request.user, date=attendance_date, kind='entry').exists()
+        )
+        if not has_entry:
+            return Response(
+                {'detail': 'No entry record found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return _queue_punch(request.user, 'exit', attendance_date, exit_time, lat, lng)
+
     # fetch existing record
     try:
         att = Attendance.objects.get(employee=request.user, date=attendance_date)
@@ -283,6 +383,7 @@ def mark_exit1(request):
     att.exit_latitude = lat
     att.exit_longitude = lng
     att.save()
+    ATTENDANCE_PUNCHES.inc(kind='exit', path='direct')
 
     return Response(AttendanceSerializer(att).data)
 
@@ -445,8 +546,10 @@ def attendance_by_date(request):
                         status=status.HTTP_400_BAD_REQUEST)
 
     # 1️⃣ fetch all Attendance rows for that date
-    marked_qs = Attendance.objects.filter(date=target).select_related('employee')
-    marked = AttendanceSerializer(marked_qs, many=True).data
+    marked_qs = Attendance.objects.filter(date=target).select_related('employee').only(
+        *AttendanceViewSet.LIST_ONLY_FIELDS
+    )
+    marked = AttendanceListSerializer(marked_qs, many=True).data
 
     # 2️⃣ find employees *without* any Attendance on that date
     #    Using Exists() for efficiency:
@@ -454,11 +557,42 @@ def attendance_by_date(request):
                                                     date=target)
     unmarked_qs = Employee.objects.annotate(
         has_attendance=Exists(attendance_for_date)
-    ).filter(has_attendance=False)
+    ).filter(has_attendance=False).prefetch_related('groups', 'user_permissions')
     unmarked = EmployeeSerializer(unmarked_qs, many=True).data
-    print("→ attendance_by_date data:", marked,"Unmarked:",unmarked)
 
     return Response({
         'marked':   marked,
         'unmarked': unmarked
-    })
\ No newline at end of file
+    })
+
+
+# Rejected lines echoed back in the response; the full count is always returned
+IMPORT_REJECTED_RESPONSE_LIMIT = 1000
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+def import_attendance(request):
+    """
+    POST /api/attendance/import/  (multipart, field "file")
+    Streams a CSV export into Attendance; see attendance.utils.import_attendance_csv.
+    """
+    if request.user.role != 'admin':
+        return Response({'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
+
+    uploaded_file = request.FILES.get('file')
+    if not uploaded_file:
+        return Response({'detail': 'file required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        # one transaction, so a file refused halfway through imports nothing
+        with transaction.atomic():
+            result = import_attendance_csv(utf8_lines(uploaded_file.file))
+    except ImportEncodingError as e:
+        return Response({'detail': f"Nothing imported: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'imported': result['imported'],
+        'rejected_count': len(result['rejected']),
+        'rejected': result['rejected'][:IMPORT_REJECTED_RESPONSE_LIMIT],
+    })
@@ -0,0 +1,48 @@
+# backup_restore/jobs.py
+"""Background job handlers for backup and restore (see the jobs app)."""
+import tempfile
+from contextlib import ExitStack
+from datetime import datetime
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from jobs.utils import job_handler
+from .utils import gzip_stream, iter_backup_json, measure_backup, restore_backup_chain, start_backup
+
+
+@job_handler('backup')
+def run_backup(job):
+    """Writes a gzipped backup to the job artifact; params: mode."""
+    mode = job.params.get('mode', 'full')
+    manifest = start_backup(mode)
+
+    def progress(done, total):
+        job.report_progress(done * 100 // total, f"Exporting table {done + 1} of {total}")
+
+    with tempfile.TemporaryFile() as tmp:
+        pieces = measure_backup(iter_backup_json(manifest=manifest, progress=progress), mode)
+        for piece in gzip_stream(pieces):
+            tmp.write(piece)
+        tmp.seek(0)
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        suffix = "" if mode == 'full' else "_incremental"
+        job.artifact.save(f"backup_{timestamp}{suffix}.json.gz", File(tmp), save=False)
+
+    return {"manifest_id": manifest.id, "kind": manifest.kind}
+
+
+# a restore overwrites live rows: after a lost worker someone must decide whether to run it again
+@job_handler('restore', retry=False)
+def run_restore(job):
+    """
+    Restores the uploaded file(s) in params['files']: a full backup, then its
+    increments. All of it is one transaction, so progress written here would
+    not be visible until the end; the worker's heartbeat thread keeps the job
+    alive meanwhile.
+    """
+    job.report_progress(0, "Restoring")
+    with ExitStack() as stack:
+        files = [stack.enter_context(default_storage.open(name, 'rb')) for name in job.params['files']]
+        counts = restore_backup_chain(files)
+    return {"restored": counts}
@@ -0,0 +1,124 @@
+# backup_restore/management/commands/benchmark_backup.py
+
+import io
+import multiprocessing
+import resource
+import sys
+import time
+from datetime import date, time as dtime, timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from attendance.models import Attendance
+from backup_restore.utils import iter_backup_json, gzip_stream
+from employee.models import Employee
+
+BENCH_EMPLOYEE_PREFIX = 'B'
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_dumpdata():
+    buffer = io.StringIO()
+    call_command('dumpdata', stdout=buffer)
+    body = buffer.getvalue()  # the old view copied this into the HttpResponse
+    return len(body.encode('utf-8'))
+
+
+def _run_streaming(compress):
+    pieces = iter_backup_json()
+    if compress:
+        return sum(len(chunk) for chunk in gzip_stream(pieces))
+    return sum(len(piece.encode('utf-8')) for piece in pieces)
+
+
+def _measure(variant, queue):
+    # Each variant runs in a fresh child so ru_maxrss is its own peak
+    connections.close_all()
+    started = time.perf_counter()
+    if variant == 'dumpdata':
+        size = _run_dumpdata()
+    else:
+        size = _run_streaming(compress=(variant == 'stream+gzip'))
+    queue.put((variant, time.perf_counter() - started, size, _peak_rss_mb()))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare peak RSS and time of the old dumpdata-into-StringIO backup with "
+        "the streaming backup. --seed-attendance adds synthetic rows first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed-attendance",
+            type=int,
+            default=0,
+            help="Insert this many synthetic attendance rows (under B-prefixed employees) before measuring"
+        )
+        parser.add_argument(
+            "--skip-dumpdata",
+            action="store_true",
+            help="Only measure the streaming variants (dumpdata needs the whole DB in memory)"
+        )
+
+    def seed(self, rows):
+        employees_needed = max(1, rows // 365 + 1)
+        existing = Employee.objects.filter(id__startswith=BENCH_EMPLOYEE_PREFIX).count()
+        Employee.objects.bulk_create([
+            Employee(
+                id=f"{BENCH_EMPLOYEE_PREFIX}{i:05d}",
+                email=f"bench{i}@bench.invalid",
+                name=f"Bench {i}",
+                date_joined=date(2020, 1, 1),
+            )
+            for i in range(existing, employees_needed)
+        ], batch_size=1000)
+
+        start = date(2020, 1, 1)
+        batch = []
+        created = 0
+        for i in range(rows):
+            emp_index, day = divmod(i, 365)
+            batch.append(Attendance(
+                employee_id=f"{BENCH_EMPLOYEE_PREFIX}{emp_index:05d}",
+                date=start + timedelta(days=day),
+                entry_time=dtime(9, 0),
+                exit_time=dtime(18, 0),
+                work_time=timedelta(hours=9),
+                status='Present',
+            ))
+            if len(batch) >= 10000:
+                Attendance.objects.bulk_create(batch, ignore_conflicts=True)
+                created += len(batch)
+                batch = []
+        if batch:
+            Attendance.objects.bulk_create(batch, ignore_conflicts=True)
+            created += len(batch)
+        self.stdout.write(f"Seeded up to {created} attendance rows.")
+
+    def handle(self, *args, **options):
+        if options["seed_attendance"]:
+            self.seed(options["seed_attendance"])
+
+        self.stdout.write(f"Attendance rows: {Attendance.objects.count():,}")
+        variants = ['stream', 'stream+gzip']
+        if not options["skip_dumpdata"]:
+            variants.insert(0, 'dumpdata')
+
+        connections.close_all()
+        ctx = multiprocessing.get_context('fork')
+        for variant in variants:
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_measure, args=(variant, queue))
+            proc.start()
+            name, elapsed, size, peak = queue.get()
+            proc.join()
+            self.stdout.write(
+                f"{name:<12} {elapsed:8.2f}s  {size / (1024 * 1024):10.1f} MiB out  peak RSS {peak:8.1f} MiB"
+            )
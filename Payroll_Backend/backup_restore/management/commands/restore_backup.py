@@ -0,0 +1,35 @@
+# backup_restore/management/commands/restore_backup.py
+
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand
+from backup_restore.utils import restore_backup_chain, RESTORE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        "Restore a backup file (.json or .json.gz from the backup endpoint or dumpdata) "
+        "with bulk loads instead of per-object save(). Pass a full backup followed by "
+        "its incremental backups to replay a chain"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", type=str, help="Backup file(s) to restore, full backup first")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=RESTORE_BATCH_SIZE,
+            help=f"Records loaded per COPY/INSERT batch (default {RESTORE_BATCH_SIZE})"
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            files = [stack.enter_context(open(path, "rb")) for path in options["paths"]]
+            counts = restore_backup_chain(files, batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - started
+
+        for label, count in counts.items():
+            self.stdout.write(f"{label}: {count} rows")
+        self.stdout.write(f"Restored {sum(counts.values())} rows in {elapsed:.2f}s.")
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackupManifest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('full', 'Full'), ('incremental', 'Incremental')], default='full', max_length=11)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('high_water', models.JSONField(blank=True, default=dict)),
+                ('completed', models.BooleanField(default=False)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='increments', to='backup_restore.backupmanifest')),
+            ],
+        ),
+    ]
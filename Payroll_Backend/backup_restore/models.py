@@ -1,3 +1,34 @@
 from django.db import models
 
-# Create your models here.
+
+class BackupManifest(models.Model):
+    """
+    One row per backup taken through backup_view. An incremental backup
+    exports only what changed since its parent, so a restore replays the full
+    base and then each increment in order:
+
+      • models with an `updated_at` column: rows with updated_at >= parent.started_at
+      • append-only logs (`created_at`, no `updated_at`): rows with pk above the
+        parent's high-water mark
+      • everything else (employees, auth tables, ...): copied in full every time
+
+    Deleted rows are not carried by increments; take a new full backup after
+    bulk deletions.
+    """
+
+    KIND_CHOICES = [
+        ('full', 'Full'),
+        ('incremental', 'Incremental'),
+    ]
+
+    kind = models.CharField(max_length=11, choices=KIND_CHOICES, default='full')
+    parent = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='increments'
+    )
+    started_at = models.DateTimeField(auto_now_add=True)
+    # {"app_label.model": max_pk} for the append-only tables
+    high_water = models.JSONField(default=dict, blank=True)
+    completed = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.kind} backup #{self.pk} at {self.started_at:%Y-%m-%d %H:%M:%S}"
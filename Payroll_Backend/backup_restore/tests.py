@@ -1,3 +1,122 @@
-from django.test import TestCase
+import io
+import json
+from datetime import date, time, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.test import TransactionTestCase
+
+from attendance.models import Attendance, AttendancePunch
+from attendance.utils import consolidate_punches
+from employee.models import Employee
+from leavedetails.models import LeaveDetails
+from payroll.models import Payroll
+from .models import BackupManifest
+from .utils import (
+    current_high_water, gzip_stream, iter_backup_json, iter_backup_objects,
+    restore_backup, restore_backup_chain,
+)
+
+
+class BackupRestoreRoundTripTests(TransactionTestCase):
+
+    def setUp(self):
+        self.emp = Employee.objects.create_user(
+            id='900400', email='backup@example.com', password='pass',
+            name='Backup', date_joined=date(2024, 1, 1), fee_per_month=Decimal('30000'),
+        )
+        Attendance.objects.bulk_create([
+            Attendance(
+                employee=self.emp, date=date(2025, 4, 1) + timedelta(days=d),
+                entry_time=time(9, 0), exit_time=time(18, 0),
+                work_time=timedelta(hours=9), status='Present',
+            )
+            for d in range(30)
+        ])
+        # Stored values deliberately differ from what save() would compute
+        LeaveDetails.objects.bulk_create([
+            LeaveDetails(employee=self.emp, month=date(2025, 4, 1), working_days=Decimal('21'))
+        ])
+        Payroll.objects.bulk_create([
+            Payroll(
+                employee=self.emp, month=date(2025, 4, 1), fee_per_month=Decimal('25000'),
+                pay_structure='fixed', perform_category='NA', net_fee_earned=12345,
+            )
+        ])
+
+    def dump(self):
+        return sorted(
+            json.loads("".join(iter_backup_json(chunk_size=7))),
+            key=lambda r: (r["model"], str(r["pk"])),
+        )
+
+    def test_gzip_backup_restores_rows_without_calling_save(self):
+        before = self.dump()
+        backup = b"".join(gzip_stream(iter_backup_json(chunk_size=7)))
+
+        Attendance.objects.filter(date__gte=date(2025, 4, 15)).delete()
+        Payroll.objects.update(net_fee_earned=0)
+
+        counts = restore_backup(io.BytesIO(backup), batch_size=8)
+
+        self.assertEqual(counts["attendance.Attendance"], 30)
+        self.assertEqual(self.dump(), before)
+        self.assertEqual(Payroll.objects.get().net_fee_earned, 12345)
+        # sequences were reset past the restored ids
+        Attendance.objects.create(employee=self.emp, date=date(2025, 6, 1))
+
+    def test_parser_handles_records_split_across_reads(self):
+        backup = "".join(iter_backup_json()).encode()
+        records = list(iter_backup_objects(io.BytesIO(backup), read_size=17))
+        self.assertEqual(records, json.loads(backup))
+
+
+class IncrementalBackupTests(TransactionTestCase):
+
+    def setUp(self):
+        self.emp = Employee.objects.create_user(
+            id='900500', email='incremental@example.com', password='pass',
+            name='Incremental', date_joined=date(2024, 1, 1),
+        )
+        for d in range(3):
+            Attendance.objects.create(employee=self.emp, date=date(2025, 4, 1) + timedelta(days=d))
+
+    def take(self, kind, parent=None):
+        manifest = BackupManifest.objects.create(kind=kind, parent=parent, high_water=current_high_water())
+        return manifest, "".join(iter_backup_json(manifest=manifest)).encode()
+
+    def test_increment_carries_only_changed_rows_and_chain_restores(self):
+        base, full_backup = self.take('full')
+        changed = Attendance.objects.get(date=date(2025, 4, 2))
+        changed.entry_time, changed.exit_time = time(9, 0), time(18, 0)
+        changed.save()
+        Attendance.objects.create(employee=self.emp, date=date(2025, 4, 10))
+        increment, incremental_backup = self.take('incremental', parent=base)
+
+        records = json.loads(incremental_backup)
+        attendance = [r for r in records if r["model"] == "attendance.attendance"]
+        self.assertEqual(sorted(r["fields"]["date"] for r in attendance), ['2025-04-02', '2025-04-10'])
+        self.assertEqual(records[-1]["model"], "backup_restore.backupmanifest")
+        self.assertTrue(BackupManifest.objects.get(pk=increment.pk).completed)
+
+        Attendance.objects.all().delete()
+        restore_backup_chain([io.BytesIO(full_backup), io.BytesIO(incremental_backup)])
+        self.assertEqual(Attendance.objects.count(), 4)
+        self.assertEqual(Attendance.objects.get(date=date(2025, 4, 2)).status, 'Present')
+
+    def test_consolidated_punches_stay_processed_through_a_chain(self):
+        AttendancePunch.objects.create(employee=self.emp, date=date(2025, 4, 1), time=time(9, 0), kind='entry')
+        base, full_backup = self.take('full')
+        self.assertEqual(consolidate_punches(), 1)
+        _, incremental_backup = self.take('incremental', parent=base)
+
+        AttendancePunch.objects.all().delete()
+        restore_backup_chain([io.BytesIO(full_backup), io.BytesIO(incremental_backup)])
+        self.assertTrue(AttendancePunch.objects.get().processed)
+        self.assertEqual(consolidate_punches(), 0)
+
+    def test_chain_with_wrong_parent_is_rejected(self):
+        base, full_backup = self.take('full')
+        _, first = self.take('incremental', parent=base)
+        _, sibling = self.take('incremental', parent=base)
+        with self.assertRaises(ValueError):
+            restore_backup_chain([io.BytesIO(full_backup), io.BytesIO(first), io.BytesIO(sibling)])
@@ -0,0 +1,414 @@
+# backup_restore/utils.py
+import codecs
+import json
+import time
+import zlib
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models import Max
+from django.db.models.constants import OnConflict
+
+from payroll_management_system.metrics import BACKUPS, BACKUP_SECONDS
+from .models import BackupManifest
+
+BACKUP_CHUNK_SIZE = 2000
+
+# Operational state that must not travel with a backup: restoring an old job
+# queue would re-run or clobber jobs, including the restore job itself
+BACKUP_EXCLUDED_APPS = {'jobs'}
+
+
+def backup_models(using=DEFAULT_DB_ALIAS):
+    """
+    Every model `dumpdata` would write, sorted so FK targets come before the
+    models that point at them. Proxies, models routed elsewhere and the apps
+    in BACKUP_EXCLUDED_APPS are skipped.
+    """
+    app_list = {
+        app_config: None
+        for app_config in apps.get_app_configs()
+        if app_config.models_module is not None and app_config.label not in BACKUP_EXCLUDED_APPS
+    }
+    return [
+        model
+        for model in serializers.sort_dependencies(app_list.items(), allow_cycles=True)
+        if not model._meta.proxy and router.allow_migrate_model(using, model)
+    ]
+
+
+def _serialize_chunk(objects):
+    return ",".join(
+        json.dumps(obj, cls=DjangoJSONEncoder, ensure_ascii=False)
+        for obj in serializers.serialize("python", objects)
+    )
+
+
+def iter_model_json(model, chunk_size=BACKUP_CHUNK_SIZE, queryset=None):
+    """
+    Yields the dumpdata JSON for one model, one comma-joined string per chunk.
+    Rows come from a server-side .iterator(), auto-created m2m tables are
+    prefetched per chunk, so memory stays at one chunk whatever the table size.
+    """
+    if queryset is None:
+        queryset = model._default_manager.all()
+    queryset = queryset.order_by(model._meta.pk.name)
+    m2m = [
+        field.name for field in model._meta.many_to_many
+        if field.remote_field.through._meta.auto_created
+    ]
+    if m2m:
+        queryset = queryset.prefetch_related(*m2m)
+
+    batch = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        batch.append(obj)
+        if len(batch) >= chunk_size:
+            yield _serialize_chunk(batch)
+            batch = []
+    if batch:
+        yield _serialize_chunk(batch)
+
+
+def change_tracking(model):
+    """
+    How an incremental backup finds changed rows of `model`: 'updated_at',
+    'pk' for append-only logs, or None when the table is always copied whole.
+    """
+    names = {f.name for f in model._meta.concrete_fields}
+    if 'updated_at' in names:
+        return 'updated_at'
+    if 'created_at' in names:
+        return 'pk'
+    return None
+
+
+def current_high_water(models=None):
+    """Max pk of every pk-tracked table, recorded on a new BackupManifest."""
+    return {
+        model._meta.label_lower: model._default_manager.aggregate(mark=Max('pk'))['mark']
+        for model in (models if models is not None else backup_models())
+        if change_tracking(model) == 'pk'
+    }
+
+
+def _changed_rows(model, parent):
+    queryset = model._default_manager.all()
+    if parent is None:
+        return queryset
+    tracking = change_tracking(model)
+    if tracking == 'updated_at':
+        return queryset.filter(updated_at__gte=parent.started_at)
+    if tracking == 'pk':
+        mark = parent.high_water.get(model._meta.label_lower)
+        if mark is not None:
+            return queryset.filter(pk__gt=mark)
+    return queryset
+
+
+def start_backup(mode='full'):
+    """
+    Creates the BackupManifest for a new backup. An incremental backup hangs
+    off the latest completed one; raises ValueError if there is none.
+    """
+    if mode not in ('full', 'incremental'):
+        raise ValueError("mode must be 'full' or 'incremental'")
+
+    parent = BackupManifest.objects.filter(completed=True).order_by('-started_at', '-id').first()
+    if mode == 'incremental' and parent is None:
+        raise ValueError("No completed backup to increment from; take a full backup first")
+
+    return BackupManifest.objects.create(
+        kind=mode,
+        parent=parent if mode == 'incremental' else None,
+        high_water=current_high_water(),
+    )
+
+
+def iter_backup_json(chunk_size=BACKUP_CHUNK_SIZE, models=None, manifest=None, progress=None):
+    """
+    Yields a backup as text pieces of one JSON array, in the same format as
+    `manage.py dumpdata`, so the output can still be fed to `loaddata`.
+
+    With a `manifest`, an incremental manifest limits every table to the rows
+    changed since its parent (see BackupManifest), and the manifest itself is
+    marked completed and written as the last record, so restores can check
+    the chain. `progress(done, total)` is called before each table.
+    """
+    parent = manifest.parent if manifest is not None and manifest.kind == 'incremental' else None
+    if models is None:
+        models = backup_models()
+    yield "["
+    first = True
+    for index, model in enumerate(models):
+        if progress is not None:
+            progress(index, len(models))
+        if manifest is not None and model is BackupManifest:
+            continue
+        queryset = _changed_rows(model, parent)
+        for piece in iter_model_json(model, chunk_size=chunk_size, queryset=queryset):
+            if not first:
+                yield ","
+            first = False
+            yield piece
+
+    if manifest is not None:
+        manifest.completed = True
+        BackupManifest.objects.filter(pk=manifest.pk).update(completed=True)
+        if not first:
+            yield ","
+        yield _serialize_chunk([manifest])
+    yield "]\n"
+
+
+def measure_backup(pieces, mode):
+    """
+    Passes a backup stream through, recording its duration and outcome once
+    the last piece has been produced (or the stream was abandoned).
+    """
+    started = time.perf_counter()
+    outcome = 'aborted'
+    try:
+        yield from pieces
+        outcome = 'completed'
+    except Exception:
+        outcome = 'failed'
+        raise
+    finally:
+        BACKUPS.inc(mode=mode, outcome=outcome)
+        if outcome == 'completed':
+            BACKUP_SECONDS.observe(time.perf_counter() - started, mode=mode)
+
+
+def gzip_stream(pieces, level=6):
+    """Compresses an iterable of text pieces into gzip bytes as they arrive."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for piece in pieces:
+        data = compressor.compress(piece.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# ---------------------------------------------------------------------------
+# Restore
+# ---------------------------------------------------------------------------
+
+RESTORE_BATCH_SIZE = 5000
+_READ_SIZE = 1 << 20
+_SEPARATORS = " \t\r\n,[]﻿"
+
+
+def _iter_backup_text(fileobj, read_size=_READ_SIZE):
+    """Decoded text pieces of a backup file, gunzipping it if needed."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    chunk = fileobj.read(read_size)
+    # 32 + 15: let zlib read the gzip header
+    decompressor = zlib.decompressobj(47) if chunk[:2] == b"\x1f\x8b" else None
+    while chunk:
+        yield decoder.decode(decompressor.decompress(chunk) if decompressor else chunk)
+        chunk = fileobj.read(read_size)
+    tail = decompressor.flush() if decompressor else b""
+    yield decoder.decode(tail, final=True)
+
+
+def iter_backup_objects(fileobj, read_size=_READ_SIZE):
+    """
+    Yields the records of a dumpdata-style JSON array (plain or gzip) one dict
+    at a time, holding only the current read buffer in memory. JSON-lines
+    backups parse the same way.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    for text in _iter_backup_text(fileobj, read_size):
+        buffer = buffer[pos:] + text
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in _SEPARATORS:
+                pos += 1
+            if pos >= len(buffer):
+                break
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # object continues in the next piece
+            yield record
+    if buffer[pos:].strip(_SEPARATORS):
+        raise ValueError("Backup file is truncated or not valid JSON.")
+
+
+def _copy_upsert(model, objs, connection):
+    """
+    PostgreSQL (psycopg 3): COPY the batch into a temp table, then one
+    INSERT ... SELECT ... ON CONFLICT (pk) DO UPDATE into the real table.
+    """
+    opts = model._meta
+    qn = connection.ops.quote_name
+    fields = opts.local_concrete_fields
+    columns = ", ".join(qn(f.column) for f in fields)
+    table = qn(opts.db_table)
+    temp = qn(f"restore_{opts.db_table}")
+    updates = ", ".join(
+        f"{qn(f.column)} = EXCLUDED.{qn(f.column)}" for f in fields if not f.primary_key
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {temp} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"
+        )
+        cursor.execute(f"TRUNCATE {temp}")
+        with cursor.cursor.copy(f"COPY {temp} ({columns}) FROM STDIN") as copy:
+            for obj in objs:
+                copy.write_row([f.get_db_prep_save(getattr(obj, f.attname), connection) for f in fields])
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {temp} "
+            f"ON CONFLICT ({qn(opts.pk.column)}) DO UPDATE SET {updates}"
+        )
+
+
+def _batch_upsert(model, objs, connection, batch_size):
+    """
+    Multi-row INSERT ... ON CONFLICT (pk) DO UPDATE. Inserted raw, like
+    loaddata, so auto_now fields keep their backed-up values.
+    """
+    opts = model._meta
+    fields = list(opts.local_concrete_fields)
+    update_fields = [f for f in fields if not f.primary_key]
+    queryset = model._base_manager.using(connection.alias)
+    size = max(1, min(batch_size, connection.ops.bulk_batch_size(fields, objs)))
+    for start in range(0, len(objs), size):
+        queryset._insert(
+            objs[start:start + size],
+            fields=fields,
+            raw=True,
+            on_conflict=OnConflict.UPDATE if update_fields else OnConflict.IGNORE,
+            update_fields=update_fields or None,
+            unique_fields=[opts.pk],
+        )
+
+
+def _replace_m2m(model, m2m_data, connection):
+    """Rewrites auto-created m2m rows for the restored objects."""
+    for field in model._meta.many_to_many:
+        through = field.remote_field.through
+        if not through._meta.auto_created:
+            continue
+        source = f"{field.m2m_field_name()}_id"
+        target = f"{field.m2m_reverse_field_name()}_id"
+        owners = [pk for pk, data in m2m_data.items() if field.name in data]
+        if not owners:
+            continue
+        manager = through._base_manager.using(connection.alias)
+        manager.filter(**{f"{source}__in": owners}).delete()
+        manager.bulk_create(
+            [
+                through(**{source: pk, target: related})
+                for pk in owners
+                for related in m2m_data[pk][field.name]
+            ],
+            batch_size=RESTORE_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+
+def restore_backup(fileobj, batch_size=RESTORE_BATCH_SIZE, using=DEFAULT_DB_ALIAS, manifests=None):
+    """
+    Loads a backup written by backup_view/dumpdata without calling any model
+    save(), so LeaveDetails/Payroll are restored as stored instead of being
+    recomputed row by row.
+
+    Records are streamed from the file and grouped into batches per model.
+    On PostgreSQL with psycopg 3 each batch goes through COPY, otherwise
+    through multi-row INSERT ... ON CONFLICT. FK checks are deferred for the
+    whole load and verified once at the end. Sequences are reset afterwards.
+    Everything runs in one transaction. Returns {model label: rows restored};
+    BackupManifest records found in the file are appended to `manifests`.
+    """
+    connection = connections[using]
+    use_copy = False
+    if connection.vendor == "postgresql":
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+        use_copy = is_psycopg3
+    counts = {}
+    touched = []
+
+    def flush(model, records):
+        deserialized = list(serializers.deserialize(
+            "python", records, using=using, ignorenonexistent=True
+        ))
+        objs = [d.object for d in deserialized]
+        if use_copy:
+            _copy_upsert(model, objs, connection)
+        else:
+            _batch_upsert(model, objs, connection, batch_size)
+        _replace_m2m(model, {d.object.pk: d.m2m_data for d in deserialized if d.m2m_data}, connection)
+        counts[model._meta.label] = counts.get(model._meta.label, 0) + len(objs)
+
+    with transaction.atomic(using=using):
+        with connection.constraint_checks_disabled():
+            model, records = None, []
+            for record in iter_backup_objects(fileobj):
+                record_model = apps.get_model(record["model"])
+                if manifests is not None and record_model is BackupManifest:
+                    manifests.append(record)
+                if records and (record_model is not model or len(records) >= batch_size):
+                    flush(model, records)
+                    records = []
+                if record_model not in touched:
+                    touched.append(record_model)
+                model = record_model
+                records.append(record)
+            if records:
+                flush(model, records)
+
+        table_names = [m._meta.db_table for m in touched]
+        for m in touched:
+            table_names.extend(
+                f.remote_field.through._meta.db_table
+                for f in m._meta.many_to_many
+                if f.remote_field.through._meta.auto_created
+            )
+        connection.check_constraints(table_names=table_names)
+
+        sequence_sql = connection.ops.sequence_reset_sql(no_style(), touched)
+        if sequence_sql:
+            with connection.cursor() as cursor:
+                for sql in sequence_sql:
+                    cursor.execute(sql)
+
+    return counts
+
+
+def restore_backup_chain(fileobjs, batch_size=RESTORE_BATCH_SIZE, using=DEFAULT_DB_ALIAS):
+    """
+    Replays a full backup followed by its incremental backups, in order, in
+    one transaction. Every increment must name the previous file's manifest
+    as its parent, otherwise nothing is restored.
+    """
+    totals = {}
+    with transaction.atomic(using=using):
+        previous = None
+        for index, fileobj in enumerate(fileobjs):
+            manifests = []
+            counts = restore_backup(fileobj, batch_size=batch_size, using=using, manifests=manifests)
+            manifest = manifests[-1] if manifests else None
+
+            if index == 0:
+                if manifest is not None and manifest["fields"]["kind"] == "incremental":
+                    raise ValueError("A restore chain must start with a full backup.")
+            elif (
+                manifest is None
+                or manifest["fields"]["kind"] != "incremental"
+                or manifest["fields"]["parent"] != previous
+            ):
+                raise ValueError(
+                    f"Backup #{index + 1} is not the increment that follows the previous file."
+                )
+            previous = manifest["pk"] if manifest is not None else None
+
+            for label, count in counts.items():
+                totals[label] = totals.get(label, 0) + count
+    return totals
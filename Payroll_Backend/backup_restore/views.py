@@ -1,28 +1,53 @@
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes, parser_classes
-from django.core.management import call_command
 from django.shortcuts import render
-import io
-import os
-from django.conf import settings
 from datetime import datetime
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.views.decorators.http import require_POST
+from jobs.utils import enqueue_job, job_accepted_response, wants_async
+from .utils import iter_backup_json, gzip_stream, measure_backup, restore_backup_chain, start_backup
 
 
 @require_POST
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def backup_view(request):
+    """
+    Streams a dumpdata-compatible JSON backup. Rows are read and serialized in
+    chunks, and the body is gzip-compressed on the fly (Content-Encoding) when
+    the client accepts it, so memory stays flat regardless of table size.
+
+    `mode=incremental` exports only the rows changed since the last completed
+    backup (see BackupManifest); the default is a full backup. With `async=1`
+    the backup is written by a background job instead (see /api/jobs/).
+    """
     if request.user.role != 'admin':
         return HttpResponse("Forbidden", status=403)
 
-    buffer = io.StringIO()
-    call_command('dumpdata', stdout=buffer)
+    mode = request.query_params.get('mode') or request.data.get('mode') or 'full'
+
+    if wants_async(request):
+        if mode not in ('full', 'incremental'):
+            return HttpResponse("mode must be 'full' or 'incremental'", status=400)
+        return job_accepted_response(enqueue_job('backup', {'mode': mode}, user=request.user))
+
+    try:
+        manifest = start_backup(mode)
+    except ValueError as e:
+        return HttpResponse(str(e), status=400)
+
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"backup_{timestamp}.json"
-    response = HttpResponse(buffer.getvalue(), content_type='application/json')
+    filename = f"backup_{timestamp}.json" if mode == 'full' else f"backup_{timestamp}_incremental.json"
+
+    content = measure_backup(iter_backup_json(manifest=manifest), mode)
+    use_gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if use_gzip:
+        content = gzip_stream(content)
+
+    response = StreamingHttpResponse(content, content_type='application/json')
+    if use_gzip:
+        response['Content-Encoding'] = 'gzip'
     response['Content-Disposition'] = f'attachment; filename={filename}'
     return response
 
@@ -35,34 +60,20 @@ def restore_view(request):
     if not user.is_authenticated or getattr(user, 'role', None) != 'admin':
         return HttpResponse("Forbidden", status=403)
 
-    uploaded_file = request.FILES.get('backup_file')
-    if not uploaded_file:
+    # One file, or a full backup followed by its increments in order
+    uploaded_files = request.FILES.getlist('backup_file')
+    if not uploaded_files:
         return HttpResponse("No file uploaded", status=400)
 
-    try:
-        # Ensure MEDIA_ROOT exists
-        if not os.path.exists(settings.MEDIA_ROOT):
-            os.makedirs(settings.MEDIA_ROOT)
-            
-        # Save to temporary path
-        # Use a more robust temporary filename to avoid conflicts, e.g., using a timestamp
-        temp_filename = f"temp_restore_{datetime.now().strftime('%Y%m%d%H%M%S%f')}.json"
-        temp_path = os.path.join(settings.MEDIA_ROOT, temp_filename)
-        
-        with open(temp_path, 'wb+') as temp_file:
-            for chunk in uploaded_file.chunks():
-                temp_file.write(chunk)
-
-        # Load the data using loaddata
-        call_command('loaddata', temp_path)
+    if wants_async(request):
+        return job_accepted_response(enqueue_job('restore', user=user, files=uploaded_files))
 
+    try:
+        # Streams the uploads (plain or gzipped JSON) straight into the tables
+        restore_backup_chain([f.open('rb') for f in uploaded_files])
     except Exception as e:
         # Log the actual exception on the server side for better debugging
         print(f"Restore failed: {str(e)}")
         return HttpResponse(f"Restore failed: {str(e)}", status=500)
-    finally: # Ensure cleanup even if loaddata fails
-        # Clean up
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-            
+
     return HttpResponse("Restore completed successfully!", status=200)
@@ -0,0 +1,309 @@
+# benchmarks/datagen.py
+"""
+Deterministic synthetic data for benchmarks: N employees with M months of
+attendance and the approved leave requests behind their leave days. Rows are
+written with bulk_create (or COPY for the production-scale generator used by
+`seed_scale`), so model save() logic does not run here.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from attendance.models import Attendance
+from attendance.utils import is_public_holiday
+from employee.models import Employee
+from leave_requests.models import LeaveRequest
+
+# Share of working days per attendance status
+STATUS_WEIGHTS = {
+    'Present': 0.86,
+    'Half Absent': 0.04,
+    'Absent': 0.03,
+    'Paid Leave': 0.03,
+    'Sick Leave': 0.02,
+    'UnPaid Leave': 0.02,
+}
+# Attendance status -> LeaveRequest.leave_type
+LEAVE_TYPES = {'Paid Leave': 'paid', 'Sick Leave': 'sick', 'UnPaid Leave': 'unpaid'}
+CLOCK_TIMES = {
+    'Present': (time(9, 0), time(18, 0), timedelta(hours=9)),
+    'Half Absent': (time(9, 0), time(14, 0), timedelta(hours=5)),
+}
+
+
+class Dataset:
+    """What generate_dataset created; `months` are first days, oldest first."""
+
+    def __init__(self, employees, months, admin=None, counts=None):
+        self.employees = employees
+        self.months = months
+        self.admin = admin
+        self.counts = counts or {}
+
+
+def month_starts(first_month, months):
+    result = []
+    current = first_month.replace(day=1)
+    for _ in range(months):
+        result.append(current)
+        current = (current + timedelta(days=32)).replace(day=1)
+    return result
+
+
+def make_employees(count, rng, id_prefix='BM', joined=date(2020, 1, 1), password='bench'):
+    """Unsaved Employee rows with ids <id_prefix><number>; one password hash is shared."""
+    digits = 6 - len(id_prefix)
+    if count > 10 ** digits - 1:
+        raise ValueError(f"At most {10 ** digits - 1} employees fit the '{id_prefix}' id prefix")
+    password_hash = make_password(password)
+    return [
+        Employee(
+            id=f"{id_prefix}{n:0{digits}d}",
+            email=f"{id_prefix.lower()}{n}@bench.invalid",
+            name=f"Bench Employee {n}",
+            password=password_hash,
+            date_joined=joined,
+            fee_per_month=Decimal(rng.randrange(20000, 150001, 500)),
+            pay_structure=rng.choice(['fixed', 'variable']),
+            designation=rng.choice(['Engineer', 'Analyst', 'Consultant', 'Designer']),
+            role='employee',
+        )
+        for n in range(1, count + 1)
+    ]
+
+
+def iter_attendance(employee_id, start, end, rng):
+    """
+    Unsaved Attendance rows for one employee over [start, end]: Holiday on
+    weekends and public holidays, otherwise a status drawn from STATUS_WEIGHTS
+    with matching clock times.
+    """
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    day = start
+    while day <= end:
+        if day.weekday() >= 5 or is_public_holiday(day):
+            status = 'Holiday'
+        else:
+            status = rng.choices(statuses, weights)[0]
+        entry, exit_, work = CLOCK_TIMES.get(status, (None, None, None))
+        yield Attendance(
+            employee_id=employee_id, date=day, status=status,
+            entry_time=entry, exit_time=exit_, work_time=work,
+        )
+        day += timedelta(days=1)
+
+
+def leave_requests_for(employee, attendance):
+    """One approved single-day LeaveRequest per leave day in `attendance`."""
+    return [
+        LeaveRequest(
+            requester_id=employee.id,
+            employee_id=employee.id,
+            employee_name=employee.name,
+            start_date=att.date,
+            end_date=att.date,
+            total_days=1,
+            leave_type=LEAVE_TYPES[att.status],
+            status='approved',
+        )
+        for att in attendance
+        if att.status in LEAVE_TYPES
+    ]
+
+
+def generate_dataset(employees=20, months=3, first_month=date(2025, 1, 1), seed=42, batch_size=5000):
+    """
+    Creates `employees` employees plus an admin, with `months` months of
+    attendance from `first_month` and matching approved leave requests.
+    The same seed always produces the same rows.
+    """
+    rng = random.Random(seed)
+    month_list = month_starts(first_month, months)
+    end = (month_list[-1] + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+    staff = make_employees(employees, rng)
+    admin = Employee(
+        id='BA0001', email='bench-admin@bench.invalid', name='Bench Admin', role='admin',
+        password=staff[0].password if staff else make_password('bench'), date_joined=date(2020, 1, 1),
+    )
+    Employee.objects.bulk_create(staff + [admin], batch_size=batch_size)
+
+    attendance_count = leave_count = 0
+    for emp in staff:
+        rows = list(iter_attendance(emp.id, month_list[0], end, rng))
+        Attendance.objects.bulk_create(rows, batch_size=batch_size)
+        leaves = leave_requests_for(emp, rows)
+        LeaveRequest.objects.bulk_create(leaves, batch_size=batch_size)
+        attendance_count += len(rows)
+        leave_count += len(leaves)
+
+    return Dataset(
+        employees=staff, months=month_list, admin=admin,
+        counts={'employees': len(staff), 'attendance': attendance_count, 'leave_requests': leave_count},
+    )
+
+
+# --- Production-scale generation (seed_scale) ---
+
+# Working days that are not covered by a leave request
+SCALE_WORKDAY_WEIGHTS = {'Present': 0.93, 'Half Absent': 0.04, 'Absent': 0.03}
+PERFORMANCE_WEIGHTS = {'1': 0.15, '2': 0.55, '3': 0.2, '4': 0.05, 'NA': 0.05}
+
+ATTENDANCE_COLUMNS = (
+    'employee_id', 'date', 'entry_time', 'exit_time', 'work_time', 'status', 'updated_at',
+)
+LEAVE_REQUEST_COLUMNS = (
+    'requester_id', 'employee_id', 'employee_name', 'start_date', 'end_date', 'total_days',
+    'leave_type', 'status', 'created_at', 'updated_at',
+)
+
+
+def bulk_load(model, columns, rows, batch_size=10000, using=DEFAULT_DB_ALIAS):
+    """
+    Writes an iterable of tuples (in `columns` order, attnames) into the
+    model's table and returns the row count. On PostgreSQL with psycopg 3 the
+    rows are streamed with COPY; other backends get batched bulk_create.
+    Every NOT NULL column without a database default must be listed.
+    """
+    connection = connections[using]
+    count = 0
+    if connection.vendor == 'postgresql':
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+        if is_psycopg3:
+            qn = connection.ops.quote_name
+            db_columns = ", ".join(qn(model._meta.get_field(name).column) for name in columns)
+            with connection.cursor() as cursor:
+                with cursor.cursor.copy(f"COPY {qn(model._meta.db_table)} ({db_columns}) FROM STDIN") as copy:
+                    for row in rows:
+                        copy.write_row(row)
+                        count += 1
+            return count
+
+    batch = []
+    for row in rows:
+        batch.append(model(**dict(zip(columns, row))))
+        if len(batch) >= batch_size:
+            model.objects.using(using).bulk_create(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        model.objects.using(using).bulk_create(batch)
+        count += len(batch)
+    return count
+
+
+def _is_workday(day):
+    return day.weekday() < 5 and not is_public_holiday(day)
+
+
+def plan_leaves(start, end, rng):
+    """
+    Leave requests of one employee over [start, end], as
+    (start_date, end_date, leave_type, status) tuples. Per calendar year: up to
+    one paid day a month (at most 9), up to 2 sick days, a few unpaid blocks,
+    plus some pending and rejected requests that never reach attendance.
+    Partial years get a proportional share.
+    """
+    requests = []
+    taken = set()
+
+    def free_workday(first, last):
+        for _ in range(20):
+            day = first + timedelta(days=rng.randrange((last - first).days + 1))
+            if _is_workday(day) and day not in taken:
+                return day
+        return None
+
+    for year in range(start.year, end.year + 1):
+        year_start, year_end = max(start, date(year, 1, 1)), min(end, date(year, 12, 31))
+        months = list(range(year_start.month, year_end.month + 1))
+        # partial years get a proportional share of the yearly quotas
+        share = len(months) / 12
+
+        for month in sorted(rng.sample(months, min(len(months), round(rng.randint(3, 9) * share)))):
+            month_start = max(year_start, date(year, month, 1))
+            month_end = min(year_end, (date(year, month, 1) + timedelta(days=32)).replace(day=1) - timedelta(days=1))
+            day = free_workday(month_start, month_end)
+            if day:
+                taken.add(day)
+                requests.append((day, day, 'paid', 'approved'))
+
+        for leave_type, count in (('sick', rng.randint(0, 2)), ('unpaid', rng.randint(0, 2))):
+            for _ in range(count):
+                if rng.random() >= share:
+                    continue
+                day = free_workday(year_start, year_end)
+                if day is None:
+                    continue
+                length = 1 if leave_type == 'sick' else rng.randint(1, 3)
+                block = [day + timedelta(days=i) for i in range(length)]
+                block = [d for d in block if d <= year_end and d not in taken]
+                taken.update(block)
+                requests.append((block[0], block[-1], leave_type, 'approved'))
+
+        for status in ('pending', 'rejected'):
+            if rng.random() < 0.3 * share:
+                day = free_workday(year_start, year_end)
+                if day:
+                    requests.append((day, day, rng.choice(['paid', 'sick', 'unpaid']), status))
+    return requests
+
+
+def leave_days(requests):
+    """{date: attendance status} for the approved requests from plan_leaves."""
+    statuses = {'paid': 'Paid Leave', 'sick': 'Sick Leave', 'unpaid': 'UnPaid Leave'}
+    days = {}
+    for first, last, leave_type, status in requests:
+        if status != 'approved':
+            continue
+        day = first
+        while day <= last:
+            if _is_workday(day):
+                days[day] = statuses[leave_type]
+            day += timedelta(days=1)
+    return days
+
+
+def iter_scale_attendance(employee_id, start, end, leaves, rng, now=None):
+    """
+    ATTENDANCE_COLUMNS tuples for one employee: Holiday on weekends and public
+    holidays, the approved leave status on leave days, otherwise a clock-in
+    between 08:30 and 10:00 with a working time that matches the status.
+    """
+    now = now or timezone.now()
+    statuses = list(SCALE_WORKDAY_WEIGHTS)
+    weights = list(SCALE_WORKDAY_WEIGHTS.values())
+    day = start
+    while day <= end:
+        entry = exit_ = work = None
+        if not _is_workday(day):
+            status = 'Holiday'
+        elif day in leaves:
+            status = leaves[day]
+        else:
+            status = rng.choices(statuses, weights)[0]
+            if status != 'Absent':
+                entry_minutes = 510 + rng.randrange(91)
+                worked = rng.randrange(480, 600) if status == 'Present' else rng.randrange(240, 450)
+                entry = time(entry_minutes // 60, entry_minutes % 60)
+                exit_minutes = entry_minutes + worked
+                exit_ = time(exit_minutes // 60, exit_minutes % 60)
+                work = timedelta(minutes=worked)
+        yield (employee_id, day, entry, exit_, work, status, now)
+        day += timedelta(days=1)
+
+
+def leave_request_rows(employee, requests, now=None):
+    """LEAVE_REQUEST_COLUMNS tuples for plan_leaves output; filed a week ahead."""
+    now = now or timezone.now()
+    for first, last, leave_type, status in requests:
+        created = datetime.combine(first - timedelta(days=7), time(10, 0), tzinfo=now.tzinfo)
+        yield (
+            employee.id, employee.id, employee.name, first, last, (last - first).days + 1,
+            leave_type, status, created, now,
+        )
@@ -0,0 +1,115 @@
+# benchmarks/management/commands/run_benchmarks.py
+
+import json
+import platform
+import subprocess
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from benchmarks.datagen import generate_dataset
+from benchmarks.suite import BENCHMARKS, run_case
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the payroll, leave and attendance hot paths on generated data and write "
+        "timings and query counts as JSON. All generated rows are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--employees", type=int, default=20, help="Synthetic employees (default 20)")
+        parser.add_argument("--months", type=int, default=3, help="Months of attendance per employee (default 3)")
+        parser.add_argument("--first-month", type=str, default="2025-01", help="First generated month, YYYY-MM")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed for the data generator")
+        parser.add_argument("--rounds", type=int, default=5, help="Timed rounds per case")
+        parser.add_argument("--warmup", type=int, default=1, help="Untimed rounds per case")
+        parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Run only these cases")
+        parser.add_argument("--output", type=str, help="Write results to this JSON file")
+        parser.add_argument("--compare", type=str, help="Baseline JSON from an earlier run to compare against")
+        parser.add_argument(
+            "--fail-threshold",
+            type=float,
+            help="With --compare, exit with an error if any median is this many percent slower"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            first_month = datetime.strptime(options["first_month"], "%Y-%m").date()
+        except ValueError:
+            raise CommandError("--first-month must be YYYY-MM")
+        names = options["only"] or list(BENCHMARKS)
+
+        results = []
+        with transaction.atomic():
+            dataset = generate_dataset(
+                employees=options["employees"], months=options["months"],
+                first_month=first_month, seed=options["seed"],
+            )
+            self.stdout.write(f"Generated {dataset.counts}")
+            for name in names:
+                result = run_case(name, dataset, rounds=options["rounds"], warmup=options["warmup"])
+                results.append(result)
+                throughput = f"  {result['rows_per_sec']:>9} rows/s" if result.get('rows_per_sec') else ""
+                self.stdout.write(
+                    f"{name:<28} median {result['median_ms']:>10.2f} ms  "
+                    f"min {result['min_ms']:>10.2f} ms  {result['queries']:>6} queries{throughput}"
+                )
+            transaction.set_rollback(True)
+
+        report = {
+            "meta": {
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "commit": self._git_commit(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "employees": options["employees"],
+                "months": options["months"],
+                "first_month": options["first_month"],
+                "seed": options["seed"],
+                "rounds": options["rounds"],
+            },
+            "results": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options["compare"]:
+            self._compare(results, options["compare"], options["fail_threshold"])
+
+    def _git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _compare(self, results, baseline_path, fail_threshold):
+        with open(baseline_path) as f:
+            baseline = {r["name"]: r for r in json.load(f)["results"]}
+
+        regressions = []
+        self.stdout.write(f"\nCompared with {baseline_path}:")
+        for result in results:
+            before = baseline.get(result["name"])
+            if before is None:
+                self.stdout.write(f"{result['name']:<28} (not in baseline)")
+                continue
+            change = (result["median_ms"] - before["median_ms"]) / before["median_ms"] * 100 if before["median_ms"] else 0.0
+            self.stdout.write(
+                f"{result['name']:<28} {before['median_ms']:>10.2f} -> {result['median_ms']:>10.2f} ms "
+                f"({change:+.1f}%)  queries {before['queries']} -> {result['queries']}"
+            )
+            if fail_threshold is not None and change > fail_threshold:
+                regressions.append(result["name"])
+
+        if regressions:
+            raise CommandError(f"Slower than baseline by more than {fail_threshold}%: {', '.join(regressions)}")
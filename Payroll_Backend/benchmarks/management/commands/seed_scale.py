@@ -0,0 +1,154 @@
+# benchmarks/management/commands/seed_scale.py
+
+import calendar
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from attendance.models import Attendance, AttendancePunch
+from benchmarks.datagen import (
+    ATTENDANCE_COLUMNS, LEAVE_REQUEST_COLUMNS, PERFORMANCE_WEIGHTS,
+    bulk_load, iter_scale_attendance, leave_days, leave_request_rows, make_employees, month_starts, plan_leaves,
+)
+from employee.models import Employee
+from leave_requests.models import LeaveRequest
+from leavedetails.models import LeaveDetails
+from payroll.models import Payroll
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a production-scale synthetic dataset: employees grouped under managers, years of "
+        "attendance, leave requests with approvals and payroll history. The same --seed always "
+        "produces the same rows. Uses COPY on PostgreSQL and bulk_create elsewhere."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--employees", type=int, default=1000, help="Employees to create, managers included (default 1000)")
+        parser.add_argument("--team-size", type=int, default=12, help="Employees per manager (default 12)")
+        parser.add_argument("--years", type=int, default=3, help="Years of attendance history (default 3)")
+        parser.add_argument("--end", type=str, help="Last day of history, YYYY-MM-DD (default: end of last month)")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed")
+        parser.add_argument("--batch-size", type=int, default=10000, help="Rows per bulk_create batch")
+        parser.add_argument(
+            "--payroll-months", type=int, default=3,
+            help="Most recent months to compute LeaveDetails and Payroll for through the models (default 3)"
+        )
+        parser.add_argument("--prefix", type=str, default="S", help="Employee id prefix (default 'S')")
+        parser.add_argument("--clear", action="store_true", help="Delete earlier rows with the same id prefix first")
+
+    def handle(self, *args, **options):
+        if options["end"]:
+            try:
+                end = date.fromisoformat(options["end"])
+            except ValueError:
+                raise CommandError("--end must be YYYY-MM-DD")
+        else:
+            end = date.today().replace(day=1) - timedelta(days=1)
+        if options["years"] < 1 or options["employees"] < 1 or options["team_size"] < 1:
+            raise CommandError("--years, --employees and --team-size must be positive")
+        start = date(end.year - options["years"], end.month, 1) + timedelta(days=32)
+        start = start.replace(day=1)
+
+        prefix = options["prefix"]
+        existing = Employee.objects.filter(id__startswith=prefix)
+        if existing.exists():
+            if not options["clear"]:
+                raise CommandError(f"Employees with id prefix '{prefix}' already exist; pass --clear to replace them")
+            self._phase("Cleared previous data", lambda: self._clear(existing))
+
+        rng = random.Random(options["seed"])
+        self.stdout.write(f"Seeding {options['employees']} employees from {start} to {end} (seed {options['seed']})")
+        with transaction.atomic():
+            employees = self._phase(
+                "Employees", lambda: self._create_employees(options["employees"], options["team_size"], prefix, start, end, rng)
+            )
+            plans = {emp.id: plan_leaves(max(start, emp.date_joined), end, rng) for emp in employees}
+            now = timezone.now()
+
+            self._phase("Leave requests", lambda: bulk_load(
+                LeaveRequest, LEAVE_REQUEST_COLUMNS,
+                (row for emp in employees for row in leave_request_rows(emp, plans[emp.id], now)),
+                options["batch_size"],
+            ))
+            self._phase("Attendance", lambda: bulk_load(
+                Attendance, ATTENDANCE_COLUMNS,
+                (
+                    row for emp in employees
+                    for row in iter_scale_attendance(
+                        emp.id, max(start, emp.date_joined), end, leave_days(plans[emp.id]), rng, now
+                    )
+                ),
+                options["batch_size"],
+            ))
+
+        months = month_starts(start, 12 * options["years"])[-options["payroll_months"]:] if options["payroll_months"] > 0 else []
+        self._phase("Payroll history", lambda: self._payroll_history(employees, months, rng))
+
+    def _phase(self, label, func):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        count = len(result) if isinstance(result, list) else result
+        self.stdout.write(f"{label:<18} {count if count is not None else '':>10} rows  {elapsed:8.1f} s")
+        return result
+
+    def _clear(self, employees):
+        ids = list(employees.values_list("id", flat=True))
+        with transaction.atomic():
+            for model in (Payroll, LeaveDetails, Attendance, AttendancePunch):
+                model.objects.filter(employee_id__in=ids).delete()
+            LeaveRequest.objects.filter(requester_id__in=ids).delete()
+            employees.delete()
+        return len(ids)
+
+    def _create_employees(self, count, team_size, prefix, start, end, rng):
+        employees = make_employees(count, rng, id_prefix=prefix)
+        span = (end - start).days
+        manager = None
+        for n, emp in enumerate(employees):
+            emp.name = f"Scale Employee {n + 1}"
+            # about 30% join during the generated range, the rest before it
+            if rng.random() < 0.3:
+                emp.date_joined = start + timedelta(days=rng.randrange(span))
+            else:
+                emp.date_joined = start - timedelta(days=rng.randrange(1, 5 * 365))
+            if n % (team_size + 1) == 0:
+                emp.role = 'manager'
+                emp.designation = 'Manager'
+                emp.date_joined = min(emp.date_joined, start)
+                manager = emp
+            else:
+                emp.supervisor = manager.name
+                emp.supervisor_email = manager.email
+        Employee.objects.bulk_create(employees, batch_size=1000)
+        return employees
+
+    def _payroll_history(self, employees, months, rng):
+        """
+        LeaveDetails and Payroll through their save() methods, oldest month
+        first, so carried-forward leave balances chain like they do in production.
+        """
+        categories = list(PERFORMANCE_WEIGHTS)
+        weights = list(PERFORMANCE_WEIGHTS.values())
+        count = 0
+        for month in months:
+            # like payroll.runner.month_employees: everyone who joined by the month end
+            month_end = month.replace(day=calendar.monthrange(month.year, month.month)[1])
+            with transaction.atomic():
+                for emp in employees:
+                    if emp.date_joined > month_end:
+                        continue
+                    leave = LeaveDetails(employee=emp, month=month)
+                    leave.save()
+                    Payroll(
+                        employee=emp, month=month, perform_category=rng.choices(categories, weights)[0],
+                        reimbursement=Decimal(rng.choice([0, 0, 0, 500, 1200])),
+                    ).save()
+                    count += 1
+        return count
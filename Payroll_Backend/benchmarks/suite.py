@@ -0,0 +1,203 @@
+# benchmarks/suite.py
+"""
+Benchmark cases for the payroll, leave and attendance hot paths.
+
+A case is registered with @benchmark(name). It receives the generated
+Dataset, does its setup (not timed) and returns a zero-argument callable that
+is timed; the callable must be safe to run repeatedly. A callable that returns
+the number of rows it processed also gets a rows/second figure.
+"""
+import statistics
+import time
+from datetime import timedelta
+
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from attendance.utils import apply_approved_leave, mark_holidays_and_weekends
+from leave_requests.models import LeaveRequest
+from leave_requests.views import leave_balance
+from leavedetails.models import LeaveDetails
+from payroll.models import Payroll, financial_year
+from payroll.register import iter_register_csv, register_rows
+from payroll.tds import tds_quarter_totals, tds_statement_rows
+from payroll.utils import render_payslip_pdf
+from payroll.views import monthly_employees_view
+from payroll_management_system.middleware import RequestCost
+
+# name -> setup(dataset) returning the timed callable; in registration order
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+def run_case(name, dataset, rounds=5, warmup=1):
+    """
+    Times one case. Returns wall-clock stats in milliseconds and the number of
+    SQL queries of the last round.
+    """
+    func = BENCHMARKS[name](dataset)
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    queries = 0
+    rows = None
+    for _ in range(rounds):
+        # counted with an execute_wrapper: connection.queries is capped at 9000 entries
+        cost = RequestCost()
+        with connection.execute_wrapper(cost):
+            started = time.perf_counter()
+            rows = func()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = cost.queries
+
+    result = {
+        "name": name,
+        "rounds": rounds,
+        "min_ms": round(min(timings), 3),
+        "max_ms": round(max(timings), 3),
+        "mean_ms": round(statistics.mean(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "stddev_ms": round(statistics.stdev(timings), 3) if rounds > 1 else 0.0,
+        "queries": queries,
+    }
+    if isinstance(rows, int):
+        result["rows"] = rows
+        result["rows_per_sec"] = round(rows / (result["median_ms"] / 1000)) if result["median_ms"] else None
+    return result
+
+
+def _last_month(dataset):
+    return dataset.months[-1]
+
+
+def _month_end(month):
+    return (month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def _ensure_month_records(dataset, employee):
+    month = _last_month(dataset)
+    leave, _ = LeaveDetails.objects.get_or_create(employee=employee, month=month)
+    payroll, _ = Payroll.objects.get_or_create(
+        employee=employee, month=month, defaults={'perform_category': '2'}
+    )
+    return leave, payroll
+
+
+@benchmark('leavedetails_save')
+def leavedetails_save(dataset):
+    leave, _ = _ensure_month_records(dataset, dataset.employees[0])
+    return leave.save
+
+
+@benchmark('payroll_save')
+def payroll_save(dataset):
+    _, payroll = _ensure_month_records(dataset, dataset.employees[0])
+    return payroll.save
+
+
+@benchmark('apply_approved_leave')
+def apply_approved_leave_case(dataset):
+    month = _last_month(dataset)
+    # a week-long request across a weekend, re-applied every round
+    request = LeaveRequest(
+        requester=dataset.employees[0], start_date=month + timedelta(days=2),
+        end_date=month + timedelta(days=8), leave_type='sick', status='approved',
+    )
+    return lambda: apply_approved_leave(request)
+
+
+@benchmark('mark_holidays_and_weekends')
+def mark_holidays_case(dataset):
+    month = _last_month(dataset)
+    return lambda: mark_holidays_and_weekends(month, _month_end(month))
+
+
+@benchmark('payslip_render')
+def payslip_render(dataset):
+    leave, payroll = _ensure_month_records(dataset, dataset.employees[0])
+    return lambda: render_payslip_pdf(payroll, leave, renderer='platypus')
+
+
+@benchmark('payslip_render_canvas')
+def payslip_render_canvas(dataset):
+    leave, payroll = _ensure_month_records(dataset, dataset.employees[0])
+    return lambda: render_payslip_pdf(payroll, leave, renderer='canvas')
+
+
+@benchmark('leave_balance')
+def leave_balance_case(dataset):
+    month = _last_month(dataset)
+    factory = APIRequestFactory()
+
+    def run():
+        request = factory.get('/api/leave-requests/balance/', {'month': month.month, 'year': month.year})
+        force_authenticate(request, user=dataset.employees[0])
+        leave_balance(request)
+    return run
+
+
+@benchmark('monthly_employees_view')
+def monthly_employees_case(dataset):
+    month = _last_month(dataset)
+    for emp in dataset.employees:
+        _ensure_month_records(dataset, emp)
+    factory = APIRequestFactory()
+
+    def run():
+        request = factory.get('/api/payroll/monthly-employees/', {'month': month.strftime('%Y-%m')})
+        force_authenticate(request, user=dataset.admin)
+        monthly_employees_view(request).render()
+    return run
+
+
+@benchmark('monthly_employees_page')
+def monthly_employees_page_case(dataset):
+    month = _last_month(dataset)
+    for emp in dataset.employees:
+        _ensure_month_records(dataset, emp)
+    factory = APIRequestFactory()
+
+    def run():
+        request = factory.get('/api/payroll/monthly-employees/', {'month': month.strftime('%Y-%m'), 'page': 1})
+        force_authenticate(request, user=dataset.admin)
+        monthly_employees_view(request).render()
+    return run
+
+
+@benchmark('payroll_register_csv')
+def payroll_register_csv_case(dataset):
+    for emp in dataset.employees:
+        _ensure_month_records(dataset, emp)
+    first, last = dataset.months[0], _last_month(dataset)
+
+    def run():
+        count = 0
+
+        def counted(rows):
+            nonlocal count
+            for row in rows:
+                count += 1
+                yield row
+        for _ in iter_register_csv(counted(register_rows(first, last))):
+            pass
+        return count
+    return run
+
+
+@benchmark('tds_quarter_report')
+def tds_quarter_report_case(dataset):
+    for emp in dataset.employees:
+        _ensure_month_records(dataset, emp)
+    year = financial_year(_last_month(dataset))
+
+    def run():
+        tds_quarter_totals(year)
+        return sum(1 for _ in tds_statement_rows(year))
+    return run
@@ -0,0 +1,65 @@
+from datetime import date
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+
+from attendance.models import Attendance
+from employee.models import Employee
+from leave_requests.models import LeaveRequest
+from payroll.models import Payroll
+from payroll.runner import month_employees
+from .datagen import generate_dataset
+from .suite import BENCHMARKS, run_case
+
+
+class BenchmarkSuiteTests(TestCase):
+
+    def test_every_case_runs_on_a_small_dataset(self):
+        dataset = generate_dataset(employees=2, months=1, first_month=date(2025, 4, 1), seed=1)
+        self.assertEqual(dataset.counts['attendance'], 60)
+        for name in BENCHMARKS:
+            result = run_case(name, dataset, rounds=1, warmup=0)
+            self.assertEqual(result['rounds'], 1, name)
+        self.assertGreater(run_case('leavedetails_save', dataset, rounds=1)['queries'], 0)
+
+    def test_generator_is_deterministic(self):
+        def generate():
+            with transaction.atomic():
+                generate_dataset(employees=3, months=2, seed=7)
+                rows = list(Attendance.objects.order_by('employee_id', 'date').values_list('employee_id', 'date', 'status'))
+                transaction.set_rollback(True)
+            return rows
+
+        self.assertEqual(generate(), generate())
+
+
+class SeedScaleTests(TestCase):
+
+    def test_seeds_teams_history_and_payroll(self):
+        call_command(
+            'seed_scale', employees=14, team_size=6, years=1, end='2025-06-30',
+            payroll_months=12, seed=3, stdout=StringIO(),
+        )
+        employees = Employee.objects.filter(id__startswith='S')
+        self.assertEqual(employees.count(), 14)
+        self.assertEqual(employees.filter(role='manager').count(), 2)
+        self.assertFalse(employees.filter(role='employee', supervisor_email__isnull=True).exists())
+        self.assertTrue(LeaveRequest.objects.filter(status='approved').exists())
+        # each month covers the employees a payroll run would, mid-month joiners included
+        months = Payroll.objects.values_list('month', flat=True).distinct()
+        self.assertEqual(len(months), 12)
+        for month in months:
+            self.assertEqual(
+                set(Payroll.objects.filter(month=month).values_list('employee_id', flat=True)),
+                set(month_employees(month).values_list('id', flat=True)),
+                month,
+            )
+        # approved leave shows up in attendance
+        leave = LeaveRequest.objects.filter(status='approved', leave_type='sick').first()
+        if leave:
+            self.assertEqual(
+                Attendance.objects.get(employee_id=leave.requester_id, date=leave.start_date).status, 'Sick Leave'
+            )
@@ -1,4 +1,5 @@
 from django.contrib import admin
-from .models import Employee
+from .models import CompensationHistory, Employee
 
 admin.site.register(Employee)
+admin.site.register(CompensationHistory)
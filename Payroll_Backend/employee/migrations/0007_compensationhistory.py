@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee', '0006_alter_employee_role'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompensationHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fee_per_month', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('pay_structure', models.CharField(choices=[('fixed', 'Fixed Pay'), ('variable', 'Variable Pay')], max_length=10)),
+                ('effective_from', models.DateField()),
+                ('note', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compensation_history', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['employee', '-effective_from'],
+                'unique_together': {('employee', 'effective_from')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee', '0007_compensationhistory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='account_number',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+    ]
@@ -48,6 +48,7 @@ class Employee(AbstractBaseUser, PermissionsMixin):
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES, default='M')
     account_type = models.CharField(max_length=10, choices=ACCOUNT_TYPE_CHOICES, default='SBI')
     account_name = models.CharField(max_length=50, null=True, blank=True)
+    account_number = models.CharField(max_length=20, null=True, blank=True)
     ifsc_code = models.CharField(max_length=15, null=True, blank=True)
     pan_no = models.CharField(max_length=20, null=True, blank=True)
     phone_no = models.CharField(max_length=15, null=True, blank=True)
@@ -74,4 +75,27 @@ class Employee(AbstractBaseUser, PermissionsMixin):
     REQUIRED_FIELDS = ['id']  # Require the employee ID when creating a user
 
     def __str__(self):
-        return f"{self.id} - {self.name or self.email}"
\ No newline at end of file
+        return f"{self.id} - {self.name or self.email}"
+
+class CompensationHistory(models.Model):
+    """
+    Effective-dated fee and pay structure of an employee. A payroll month
+    uses the latest entry effective on or before the first day of that
+    month, so a change dated mid-month applies from the following month.
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='compensation_history')
+    fee_per_month = models.DecimalField(max_digits=10, decimal_places=2)
+    pay_structure = models.CharField(max_length=10, choices=Employee.PAY_STRUCTURE_CHOICES)
+    effective_from = models.DateField()
+    note = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        Employee, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('employee', 'effective_from')
+        ordering = ['employee', '-effective_from']
+
+    def __str__(self):
+        return f"{self.employee_id}: {self.fee_per_month} ({self.pay_structure}) from {self.effective_from}"
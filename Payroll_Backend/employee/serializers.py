@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Employee
+from .models import CompensationHistory, Employee
 from django.contrib.auth.hashers import make_password  # ✅ Import the function
 
 class EmployeeSerializer(serializers.ModelSerializer):
@@ -21,4 +21,13 @@ class EmployeeSerializer(serializers.ModelSerializer):
         if password:
             instance.password = make_password(password)
         instance.save()
-        return instance
\ No newline at end of file
+        return instance
+
+
+class CompensationHistorySerializer(serializers.ModelSerializer):
+    created_by = serializers.StringRelatedField(read_only=True)
+
+    class Meta:
+        model = CompensationHistory
+        fields = ['id', 'employee', 'fee_per_month', 'pay_structure', 'effective_from', 'note', 'created_by', 'created_at']
+        read_only_fields = ['employee', 'created_by', 'created_at']
@@ -0,0 +1,73 @@
+# employee/utils.py
+"""Effective-dated compensation: recording fee changes and resolving the fee of a month."""
+from datetime import date
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import CompensationHistory, Employee
+
+
+def compensation_annotations(month, employee_ref='pk'):
+    """
+    Annotations resolving the fee and pay structure in effect for `month`:
+    the latest CompensationHistory entry effective on or before its first
+    day, else the live Employee values. employee_ref names the employee id
+    in the annotated queryset ('pk' on Employee, 'employee_id' elsewhere);
+    the live fallback assumes an `employee` relation outside Employee.
+    """
+    entries = CompensationHistory.objects.filter(
+        employee_id=OuterRef(employee_ref), effective_from__lte=month.replace(day=1)
+    ).order_by('-effective_from')
+    live = '' if employee_ref == 'pk' else 'employee__'
+    return {
+        'effective_fee': Coalesce(Subquery(entries.values('fee_per_month')[:1]), F(f'{live}fee_per_month')),
+        'effective_pay_structure': Coalesce(Subquery(entries.values('pay_structure')[:1]), F(f'{live}pay_structure')),
+    }
+
+
+def resolve_compensation(employee_ids, month):
+    """{employee_id: (fee_per_month, pay_structure)} in effect for `month`, in one query."""
+    rows = Employee.objects.filter(id__in=employee_ids).annotate(
+        **compensation_annotations(month)
+    ).values_list('id', 'effective_fee', 'effective_pay_structure')
+    return {employee_id: (fee, structure) for employee_id, fee, structure in rows}
+
+
+def record_compensation_change(employee, fee_per_month, pay_structure, effective_from, user=None, note='',
+                               previous=None):
+    """
+    Records a fee/pay structure change effective from `effective_from` and,
+    if it is the entry in effect today, mirrors it onto the Employee row.
+    The first time, the employee's earlier values (`previous` as (fee,
+    pay_structure), else the stored row) become a baseline entry from
+    the joining month, so earlier months keep resolving to them. Returns the new
+    CompensationHistory entry.
+    """
+    with transaction.atomic():
+        if not employee.compensation_history.exists():
+            baseline = previous or Employee.objects.values_list('fee_per_month', 'pay_structure').get(pk=employee.pk)
+            # from the joining month's first day, so that month resolves to it too
+            joined_month = employee.date_joined.replace(day=1)
+            if effective_from > joined_month:
+                CompensationHistory.objects.create(
+                    employee=employee, fee_per_month=baseline[0], pay_structure=baseline[1],
+                    effective_from=joined_month, note="Compensation before the first recorded change",
+                    created_by=user,
+                )
+        entry, _ = CompensationHistory.objects.update_or_create(
+            employee=employee, effective_from=effective_from,
+            defaults={
+                'fee_per_month': fee_per_month, 'pay_structure': pay_structure,
+                'note': note, 'created_by': user,
+            },
+        )
+        current = employee.compensation_history.filter(effective_from__lte=date.today()).first()
+        if current is not None and (employee.fee_per_month, employee.pay_structure) != (current.fee_per_month, current.pay_structure):
+            employee.fee_per_month = current.fee_per_month
+            employee.pay_structure = current.pay_structure
+            Employee.objects.filter(pk=employee.pk).update(
+                fee_per_month=current.fee_per_month, pay_structure=current.pay_structure
+            )
+    return entry
@@ -1,6 +1,12 @@
 from rest_framework import viewsets
+from datetime import date, datetime
 from .models import Employee
-from .serializers import EmployeeSerializer
+from .serializers import CompensationHistorySerializer, EmployeeSerializer
+from .utils import record_compensation_change
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from django.db import transaction
+from jobs.utils import enqueue_job
 from django.contrib.auth import authenticate
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
@@ -18,6 +24,10 @@ class EmployeeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         employee = serializer.save()
         user = self.request.user
+        record_compensation_change(
+            employee, employee.fee_per_month, employee.pay_structure, employee.date_joined.replace(day=1),
+            user=user if user.is_authenticated else None, note="Compensation at joining",
+        )
         employee_logger.info(
             f"New employee added: ID:{employee.id}, Name:{employee.name}, "
             f"Email:{employee.email}, Role:{employee.role}, Added by: {user.id if user.is_authenticated else 'Anonymous'}"
@@ -26,9 +36,20 @@ class EmployeeViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         instance = self.get_object()  # Old instance before update
         old_data = EmployeeSerializer(instance).data 
+        old_compensation = (instance.fee_per_month, instance.pay_structure)
         user = self.request.user
-
-        updated_employee = serializer.save()
+        # Fee edits apply from the current month unless back-dated explicitly;
+        # validated before anything is saved
+        effective_from = self._effective_from(self.request.data.get('compensation_effective_from'))
+
+        # the new fee and its history row (Payroll.save reads the fee from it) commit together
+        with transaction.atomic():
+            updated_employee = serializer.save()
+            if (updated_employee.fee_per_month, updated_employee.pay_structure) != old_compensation:
+                self._record_compensation(
+                    updated_employee, updated_employee.fee_per_month, updated_employee.pay_structure,
+                    effective_from, previous=old_compensation,
+                )
         new_data = EmployeeSerializer(updated_employee).data
         # Compare old and new fields
         changes = []
@@ -45,6 +66,55 @@ class EmployeeViewSet(viewsets.ModelViewSet):
             )
         
 
+    def _effective_from(self, value):
+        """The date a compensation change applies from: `value` (YYYY-MM-DD) or the current month."""
+        if not value:
+            return date.today().replace(day=1)
+        try:
+            return datetime.strptime(str(value), '%Y-%m-%d').date()
+        except ValueError:
+            raise ValidationError({"compensation_effective_from": "Invalid date. Use YYYY-MM-DD."})
+
+    def _record_compensation(self, employee, fee, pay_structure, effective_from, note='', previous=None):
+        """Records the change; a date before the current month queues an arrears recompute. Returns the job or None."""
+        user = self.request.user
+        record_compensation_change(employee, fee, pay_structure, effective_from, user=user, note=note, previous=previous)
+        employee_logger.info(
+            f"Compensation of {employee.id} set to {fee} ({pay_structure}) from {effective_from} by {user.id}"
+        )
+        if effective_from < date.today().replace(day=1):
+            return enqueue_job('recompute_arrears', {
+                "employee_id": employee.id, "effective_from": effective_from.isoformat(),
+            }, user=user)
+        return None
+
+    @action(detail=True, methods=['get', 'post'], url_path='compensation')
+    def compensation(self, request, pk=None):
+        """
+        GET: the employee's compensation history, newest first. POST
+        (admin only): fee_per_month, pay_structure, effective_from
+        (YYYY-MM-DD) and an optional note; back-dated changes queue a
+        `recompute_arrears` job whose id is returned.
+        """
+        employee = self.get_object()
+        if request.method == 'GET':
+            return Response(CompensationHistorySerializer(employee.compensation_history.all(), many=True).data)
+
+        if request.user.role != 'admin':
+            return Response({"error": "Only admins can change compensation."}, status=status.HTTP_403_FORBIDDEN)
+        serializer = CompensationHistorySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        with transaction.atomic():
+            job = self._record_compensation(
+                employee, data['fee_per_month'], data['pay_structure'], data['effective_from'],
+                note=data.get('note', ''),
+            )
+        return Response({
+            "history": CompensationHistorySerializer(employee.compensation_history.all(), many=True).data,
+            "arrears_job_id": job.id if job else None,
+        }, status=status.HTTP_201_CREATED)
+
     def perform_destroy(self, instance):
         user = self.request.user
         employee_logger.info(
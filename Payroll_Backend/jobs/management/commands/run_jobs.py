@@ -0,0 +1,45 @@
+# jobs/management/commands/run_jobs.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.utils import requeue_stale_jobs, run_next_job, worker_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs (backup, restore, payroll and payslip generation). "
+        "Several workers can run side by side; rows are claimed with FOR UPDATE SKIP LOCKED."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run until the queue is empty, then exit")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds to sleep when the queue is empty")
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=900,
+            help="Requeue running jobs with no heartbeat for this many seconds (default 900)"
+        )
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        requeued = requeue_stale_jobs(options["stale_after"])
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s).")
+        self.stdout.write(f"Job worker {worker} started.")
+
+        while True:
+            close_old_connections()
+            job = run_next_job(worker)
+            if job is not None:
+                self.stdout.write(f"Job {job.id} ({job.kind}): {job.status}")
+                continue
+            if options["once"]:
+                break
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                break
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when the job was cancelled through the API."""
+    pass
+
+
+class Job(models.Model):
+    """
+    A long-running operation queued from the API and executed by the
+    `run_jobs` worker command. Workers claim queued rows with
+    SELECT ... FOR UPDATE SKIP LOCKED, so Postgres is the only broker.
+    """
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+    FINISHED_STATUSES = {'succeeded', 'failed', 'cancelled'}
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    progress = models.PositiveSmallIntegerField(default=0)  # percent
+    progress_message = models.CharField(max_length=255, blank=True)
+    cancel_requested = models.BooleanField(default=False)
+
+    result = models.JSONField(null=True, blank=True)
+    artifact = models.FileField(upload_to='job_artifacts/', null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs'
+    )
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='job_status_idx'),
+        ]
+
+    def report_progress(self, progress, message=''):
+        """
+        Stores progress (0-100) and refreshes the heartbeat. Raises JobCancelled
+        if a cancel was requested meanwhile, so handlers stop at a safe point.
+        """
+        self.progress = max(0, min(100, int(progress)))
+        self.progress_message = message[:255]
+        self.heartbeat_at = timezone.now()
+        Job.objects.filter(pk=self.pk).update(
+            progress=self.progress, progress_message=self.progress_message, heartbeat_at=self.heartbeat_at
+        )
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if Job.objects.filter(pk=self.pk, cancel_requested=True).exists():
+            raise JobCancelled()
+
+    def __str__(self):
+        return f"{self.kind} job #{self.pk} ({self.status})"
@@ -0,0 +1,19 @@
+from rest_framework import serializers
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    artifact_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'status', 'progress', 'progress_message', 'cancel_requested',
+            'result', 'error', 'artifact_url', 'created_by', 'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = fields
+
+    def get_artifact_url(self, obj):
+        if not obj.artifact:
+            return None
+        return f"/api/jobs/{obj.id}/artifact/"
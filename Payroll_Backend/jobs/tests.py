@@ -0,0 +1,94 @@
+import gzip
+import json
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+from unittest import mock
+
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from employee.models import Employee
+from .models import Job
+from .utils import JOB_HANDLERS, claim_next_job, requeue_stale_jobs, run_job, run_next_job
+
+
+class JobQueueTests(TransactionTestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.admin = Employee.objects.create_user(
+            id='900600', email='jobs@example.com', password='pass',
+            name='Jobs Admin', role='admin', date_joined=date(2024, 1, 1),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_async_backup_runs_on_worker_and_leaves_artifact(self):
+        response = self.client.post('/api/backup_restore/backup/?async=1')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['job_id']
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}/').data['status'], 'queued')
+
+        job = run_next_job()
+        self.assertEqual(job.id, job_id)
+        self.assertEqual(job.status, 'succeeded', job.error)
+        self.assertIsNone(run_next_job())
+
+        data = self.client.get(f'/api/jobs/{job_id}/').data
+        self.assertEqual(data['progress'], 100)
+        artifact = self.client.get(data['artifact_url'])
+        records = json.loads(gzip.decompress(b"".join(artifact.streaming_content)))
+        self.assertIn('employee.employee', {r['model'] for r in records})
+        self.assertNotIn('jobs.job', {r['model'] for r in records})
+
+    def test_cancel_queued_and_running_jobs(self):
+        queued = self.client.post('/api/backup_restore/backup/', {'async': 'true'}, format='json').data['job_id']
+        running = self.client.post('/api/backup_restore/backup/', {'async': 'true'}, format='json').data['job_id']
+
+        self.client.post(f'/api/jobs/{queued}/cancel/')
+        self.assertEqual(Job.objects.get(pk=queued).status, 'cancelled')
+
+        job = claim_next_job()
+        self.assertEqual(job.id, running)
+        self.client.post(f'/api/jobs/{running}/cancel/')
+        run_job(job)
+        self.assertEqual(Job.objects.get(pk=running).status, 'cancelled')
+
+    def test_other_users_cannot_see_job(self):
+        job_id = self.client.post('/api/backup_restore/backup/?async=1').data['job_id']
+        other = Employee.objects.create_user(
+            id='900601', email='other@example.com', password='pass',
+            name='Other', date_joined=date(2024, 1, 1),
+        )
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}/').status_code, 404)
+
+    def test_running_job_keeps_its_heartbeat_and_stale_restores_are_not_rerun(self):
+        beats = []
+
+        def slow(job):
+            claimed = Job.objects.get(pk=job.pk).heartbeat_at
+            time.sleep(0.3)
+            beats.append(Job.objects.get(pk=job.pk).heartbeat_at > claimed)
+            return {}
+
+        with mock.patch.dict(JOB_HANDLERS, {'slow': slow}), mock.patch('jobs.utils.JOB_HEARTBEAT_INTERVAL', 0.05):
+            job = Job.objects.create(kind='slow', params={})
+            run_next_job()
+        self.assertEqual(beats, [True])
+        self.assertEqual(Job.objects.get(pk=job.pk).status, 'succeeded')
+
+        long_ago = timezone.now() - timedelta(hours=1)
+        backup = Job.objects.create(kind='backup', params={}, status='running', heartbeat_at=long_ago)
+        restore = Job.objects.create(kind='restore', params={}, status='running', heartbeat_at=long_ago)
+        self.assertEqual(requeue_stale_jobs(900), 1)
+        self.assertEqual(Job.objects.get(pk=backup.pk).status, 'queued')
+        self.assertEqual(Job.objects.get(pk=restore.pk).status, 'failed')
@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import job_list, job_detail, job_cancel, job_artifact
+
+urlpatterns = [
+    path('', job_list, name='job-list'),
+    path('<int:pk>/', job_detail, name='job-detail'),
+    path('<int:pk>/cancel/', job_cancel, name='job-cancel'),
+    path('<int:pk>/artifact/', job_artifact, name='job-artifact'),
+]
@@ -0,0 +1,193 @@
+# jobs/utils.py
+import logging
+import os
+import socket
+import threading
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Job, JobCancelled
+
+payroll_logger = logging.getLogger('payroll_operations')
+
+# kind -> handler(job); filled by the @job_handler decorators in <app>/jobs.py
+JOB_HANDLERS = {}
+
+# kinds that must not run twice: a stale one is failed instead of requeued
+NO_RETRY_KINDS = set()
+
+JOB_INPUT_DIR = 'job_inputs'
+
+# seconds between heartbeats of a running job; keep well under run_jobs --stale-after
+JOB_HEARTBEAT_INTERVAL = 60
+
+
+def job_handler(kind, retry=True):
+    """
+    Registers `func(job)` as the handler for jobs of `kind`. The handler reads
+    job.params, calls job.report_progress() at safe points, may save a file to
+    job.artifact, and returns a JSON-serializable result. retry=False keeps
+    requeue_stale_jobs from starting the job a second time.
+    """
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        if not retry:
+            NO_RETRY_KINDS.add(kind)
+        return func
+    return decorator
+
+
+def wants_async(request):
+    """True when the client asked for a background job (`async=1/true/yes`)."""
+    value = request.query_params.get('async') or request.data.get('async') or ''
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def enqueue_job(kind, params=None, user=None, files=()):
+    """
+    Queues a job. Uploaded `files` are copied to MEDIA_ROOT/job_inputs/ first
+    (the request's temporary files are gone by the time a worker runs) and
+    their storage names are passed to the handler as params['files'].
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind '{kind}'")
+    params = dict(params or {})
+    if files:
+        folder = f"{JOB_INPUT_DIR}/{uuid.uuid4().hex}"
+        params['files'] = [
+            default_storage.save(f"{folder}/{os.path.basename(f.name)}", f) for f in files
+        ]
+    return Job.objects.create(kind=kind, params=params, created_by=user)
+
+
+def job_accepted_response(job):
+    """202 answer for an API call that was moved onto the job queue."""
+    return Response({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/jobs/{job.id}/",
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_next_job(worker=None):
+    """
+    Atomically moves the oldest queued job to 'running' and returns it, or
+    None when the queue is empty. Rows locked by another worker are skipped.
+    """
+    with transaction.atomic():
+        job = (
+            Job.objects.filter(status='queued')
+            .order_by('id')
+            .select_for_update(skip_locked=True)
+            .first()
+        )
+        if job is None:
+            return None
+        now = timezone.now()
+        job.status = 'running'
+        job.started_at = job.heartbeat_at = now
+        job.worker = worker or worker_name()
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at', 'worker'])
+    return job
+
+
+def requeue_stale_jobs(stale_after):
+    """
+    Puts 'running' jobs whose heartbeat is older than `stale_after` seconds
+    (their worker died) back in the queue, except NO_RETRY_KINDS, which are
+    marked failed. Returns the number requeued.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', heartbeat_at__lt=now - timedelta(seconds=stale_after))
+    failed = stale.filter(kind__in=NO_RETRY_KINDS).update(
+        status='failed', finished_at=now, progress_message='Worker timeout',
+        error='The worker stopped sending heartbeats. This kind of job is not retried automatically; '
+              'check what it changed before submitting it again.',
+    )
+    if failed:
+        payroll_logger.warning(f"{failed} stale job(s) that are not safe to re-run were marked failed.")
+    return stale.exclude(kind__in=NO_RETRY_KINDS).update(
+        status='queued', worker='', progress=0, progress_message='Requeued after worker timeout'
+    )
+
+
+def _send_heartbeats(job, stop):
+    """
+    Refreshes job.heartbeat_at every JOB_HEARTBEAT_INTERVAL seconds until
+    `stop` is set. Runs in its own thread, hence on its own connection, so a
+    handler spending a long time inside one transaction (a restore) still
+    shows as alive to requeue_stale_jobs.
+    """
+    try:
+        while not stop.wait(JOB_HEARTBEAT_INTERVAL):
+            try:
+                Job.objects.filter(pk=job.pk, status='running').update(heartbeat_at=timezone.now())
+            except DatabaseError as e:
+                payroll_logger.warning(f"Job {job.id}: heartbeat failed: {e}")
+    finally:
+        connection.close()
+
+
+def _finish(job, status_value, **fields):
+    job.status = status_value
+    job.finished_at = timezone.now()
+    for name, value in fields.items():
+        setattr(job, name, value)
+    job.save(update_fields=['status', 'finished_at', 'progress', 'progress_message', 'artifact', *fields])
+
+
+def _cleanup_inputs(job):
+    for name in job.params.get('files', []):
+        try:
+            default_storage.delete(name)
+        except OSError as e:
+            payroll_logger.warning(f"Job {job.id}: could not remove input '{name}': {e}")
+
+
+def run_job(job):
+    """Runs a claimed job through its handler and records the outcome."""
+    handler = JOB_HANDLERS.get(job.kind)
+    stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=_send_heartbeats, args=(job, stop), name=f'job-{job.id}-heartbeat', daemon=True
+    )
+    heartbeat.start()
+    try:
+        if handler is None:
+            raise ValueError(f"No handler registered for job kind '{job.kind}'")
+        job.check_cancelled()
+        result = handler(job)
+    except JobCancelled:
+        _finish(job, 'cancelled', progress_message='Cancelled')
+        payroll_logger.info(f"Job {job.id} ({job.kind}) cancelled.")
+    except Exception as e:
+        _finish(job, 'failed', error=f"{e}\n\n{traceback.format_exc()}")
+        payroll_logger.error(f"Job {job.id} ({job.kind}) failed: {e}")
+    else:
+        job.progress = 100
+        _finish(job, 'succeeded', result=result)
+        payroll_logger.info(f"Job {job.id} ({job.kind}) succeeded.")
+    finally:
+        stop.set()
+        heartbeat.join()
+        _cleanup_inputs(job)
+    return job
+
+
+def run_next_job(worker=None):
+    """Claims and runs one job. Returns it, or None if nothing was queued."""
+    job = claim_next_job(worker)
+    if job is not None:
+        run_job(job)
+    return job
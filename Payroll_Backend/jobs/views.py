@@ -0,0 +1,73 @@
+import os
+
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .models import Job
+from .serializers import JobSerializer
+
+RECENT_JOBS_LIMIT = 50
+
+
+def _visible_jobs(user):
+    """Admins see every job, other users only the ones they started."""
+    jobs = Job.objects.all()
+    if user.role != 'admin':
+        jobs = jobs.filter(created_by=user)
+    return jobs
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def job_list(request):
+    """Most recent jobs, optionally filtered by ?kind= and ?status=."""
+    jobs = _visible_jobs(request.user)
+    for field in ('kind', 'status'):
+        value = request.query_params.get(field)
+        if value:
+            jobs = jobs.filter(**{field: value})
+    jobs = jobs.order_by('-id')[:RECENT_JOBS_LIMIT]
+    return Response(JobSerializer(jobs, many=True).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def job_detail(request, pk):
+    """Status polling endpoint."""
+    job = get_object_or_404(_visible_jobs(request.user), pk=pk)
+    return Response(JobSerializer(job).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def job_cancel(request, pk):
+    """
+    Cancels a queued job at once; a running job is flagged and stops at the
+    handler's next progress report.
+    """
+    job = get_object_or_404(_visible_jobs(request.user), pk=pk)
+    if job.status in Job.FINISHED_STATUSES:
+        return Response({"error": f"Job is already {job.status}."}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Conditional updates, so a worker claiming the job concurrently is not overwritten
+    if not Job.objects.filter(pk=job.pk, status='queued').update(
+        status='cancelled', cancel_requested=True, finished_at=timezone.now(), progress_message='Cancelled'
+    ):
+        Job.objects.filter(pk=job.pk).update(cancel_requested=True)
+    job.refresh_from_db()
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def job_artifact(request, pk):
+    """Downloads the file produced by a finished job (backup, payslip PDF)."""
+    job = get_object_or_404(_visible_jobs(request.user), pk=pk)
+    if not job.artifact:
+        return Response({"error": "This job has no artifact."}, status=status.HTTP_404_NOT_FOUND)
+    return FileResponse(job.artifact.open('rb'), as_attachment=True, filename=os.path.basename(job.artifact.name))
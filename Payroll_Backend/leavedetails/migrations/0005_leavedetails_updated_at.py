@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leavedetails', '0004_leavedetails_applied_unpaid_leaves_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leavedetails',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
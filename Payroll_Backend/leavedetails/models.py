@@ -1,3 +1,4 @@
+from django.apps import apps
 from django.db import models
 import calendar
 from datetime import datetime
@@ -6,11 +7,102 @@ from attendance.models import Attendance
 from decimal import Decimal
 from datetime import timedelta
 from math import ceil
+from collections import Counter
 
 class NoAttendanceRecordsError(Exception):
     """Custom exception raised when no attendance records are found for the month."""
     pass
 
+class MonthClosedError(Exception):
+    """Raised when leave details or payroll of a closed payroll month would be recomputed."""
+    pass
+
+PAID_LEAVE_ENTITLEMENT = 9
+SICK_LEAVE_ENTITLEMENT = 2
+
+
+def compute_leave_details(month, date_joined, attendance_map, previous_balance=None):
+    """
+    The computed LeaveDetails fields of one employee for one month, without
+    touching the database.
+
+    attendance_map is {date: status} for the month's attendance rows and
+    previous_balance the (total_paid_leaves_left, total_sick_leaves_left) of
+    the latest earlier LeaveDetails row, or None when there is none.
+    """
+    year = month.year
+    _, num_days = calendar.monthrange(year, month.month)
+    first_day = month.replace(day=1)
+    last_day = month.replace(day=num_days)
+
+    STATUS_PAID_LEAVE = 'Paid Leave'
+    STATUS_UNPAID_LEAVE = 'UnPaid Leave'
+
+    if date_joined.year == year:
+        months_remaining = 12 - date_joined.month + 1
+        prorated_paidleaves = ceil((PAID_LEAVE_ENTITLEMENT * months_remaining) / 12)
+    else:
+        prorated_paidleaves = PAID_LEAVE_ENTITLEMENT
+
+    def is_sandwiched(holiday_block):
+        # A holiday block between two leave days counts as unpaid leave;
+        # only checked when both neighbours are inside the current month
+        prev_date = holiday_block[0] - timedelta(days=1)
+        next_date = holiday_block[-1] + timedelta(days=1)
+        if first_day <= prev_date <= last_day and first_day <= next_date <= last_day:
+            return (attendance_map.get(prev_date) in [STATUS_PAID_LEAVE, STATUS_UNPAID_LEAVE]
+                    and attendance_map.get(next_date) in [STATUS_PAID_LEAVE, STATUS_UNPAID_LEAVE])
+        return False
+
+    sandwich_holidays_unpaidleaves = 0
+    holiday_block = []
+    for day in sorted(attendance_map):
+        if attendance_map[day] == 'Holiday':
+            holiday_block.append(day)
+        else:
+            if holiday_block and is_sandwiched(holiday_block):
+                sandwich_holidays_unpaidleaves += len(holiday_block)
+            holiday_block = []
+    # Month ending with a holiday block
+    if holiday_block and is_sandwiched(holiday_block):
+        sandwich_holidays_unpaidleaves += len(holiday_block)
+
+    counts = Counter(attendance_map.values())
+    holidays = counts['Holiday']
+
+    working_days = num_days - holidays
+    paid_leaves = Decimal(counts['Paid Leave']) + Decimal('0.5') * Decimal(counts['Half Paid Leave'])
+    applied_unpaid_leaves = Decimal(counts['UnPaid Leave']) + Decimal('0.5') * Decimal(counts['Half UnPaid Leave'])
+    sandwich_unpaid_leaves = Decimal(sandwich_holidays_unpaidleaves)
+    unpaid_leaves = applied_unpaid_leaves + sandwich_unpaid_leaves
+    sick_leaves = counts['Sick Leave']
+    total_leaves_taken = paid_leaves + unpaid_leaves + sick_leaves
+    absent_days = Decimal(counts['Absent']) + Decimal('0.5') * Decimal(counts['Half Absent'])
+
+    if previous_balance:
+        paid_left, sick_left = previous_balance
+        total_paid_leaves_left = max(Decimal('0'), paid_left - paid_leaves)
+        total_sick_leaves_left = max(Decimal('0'), sick_left - sick_leaves)
+    else:
+        # First month of the year or first record
+        total_paid_leaves_left = max(Decimal('0'), Decimal(prorated_paidleaves) - paid_leaves)
+        total_sick_leaves_left = max(Decimal('0'), Decimal(SICK_LEAVE_ENTITLEMENT) - sick_leaves)
+
+    return {
+        'working_days': working_days,
+        'paid_leaves': paid_leaves,
+        'sick_leaves': sick_leaves,
+        'applied_unpaid_leaves': applied_unpaid_leaves,
+        'sandwich_unpaid_leaves': sandwich_unpaid_leaves,
+        'unpaid_leaves': unpaid_leaves,
+        'total_leaves_taken': total_leaves_taken,
+        'absent_days': absent_days,
+        'days_worked': working_days - total_leaves_taken - absent_days,
+        'total_paid_leaves_left': total_paid_leaves_left,
+        'total_sick_leaves_left': total_sick_leaves_left,
+    }
+
+
 class LeaveDetails(models.Model):
 
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='leave_details')
@@ -26,126 +118,57 @@ class LeaveDetails(models.Model):
     days_worked = models.DecimalField(max_digits=5, decimal_places=2, default=0)
     total_paid_leaves_left = models.DecimalField(max_digits=5, decimal_places=2, default=9)   # Typically max 9 per year
     total_sick_leaves_left = models.DecimalField(max_digits=5, decimal_places=2, default=2)   # Typically max 2 per year
+    # Change tracking for incremental backups; bulk paths set it explicitly
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     
     class Meta:
         unique_together = ('employee', 'month')
 
-    def save(self, *args, **kwargs):
+    def _check_month_open(self):
+        # payroll.models imports this module, so the event model is looked up lazily
+        if apps.get_model('payroll', 'PayrollMonthEvent').is_closed(self.month):
+            raise MonthClosedError(
+                f"Payroll for {self.month.strftime('%B %Y')} is closed; reopen the month to change it."
+            )
 
-        # Get month start and end dates
+    def save(self, *args, **kwargs):
+        self._check_month_open()
         year = self.month.year
         month = self.month.month
         _, num_days = calendar.monthrange(year, month)
         first_day = datetime(year, month, 1).date()
         last_day = datetime(year, month, num_days).date()
 
-        STATUS_PAID_LEAVE = 'Paid Leave'
-        STATUS_UNPAID_LEAVE = 'UnPaid Leave'
-
-        PAID_LEAVE_ENTITLEMENT = 9
-        join_date = self.employee.date_joined
-        if join_date.year == year:
-            months_remaining = 12 - join_date.month + 1
-            prorated_paidleaves = ceil((PAID_LEAVE_ENTITLEMENT * months_remaining) / 12)
-        else:
-            prorated_paidleaves = PAID_LEAVE_ENTITLEMENT
-
-        # Filter employee's attendance for this month
-        records = Attendance.objects.filter(employee=self.employee, date__range=(first_day, last_day))
+        # Employee's attendance for this month, fetched once
+        attendance_map = dict(
+            Attendance.objects.filter(employee=self.employee, date__range=(first_day, last_day))
+            .values_list('date', 'status')
+        )
         # --- VALIDATION: Check if attendance records exist ---
-        if not records.exists():
+        if not attendance_map:
             raise NoAttendanceRecordsError(
                 f"No attendance record found for employee {self.employee.id} - {self.employee.name} "
                 f"for {self.month.strftime('%B %Y')}. Payroll cannot be generated."
             )
         # --- End Validation ---
 
-        # Convert queryset to a dictionary for fast access
-        attendance_map = {att.date: att.status for att in records}
-
-        sandwich_holidays_unpaidleaves = 0
-        
-
-        holiday_block = []
-
-        sorted_records = sorted(records, key=lambda r: r.date)
-
-        for i, record in enumerate(sorted_records):
-            if record.status == 'Holiday':
-                holiday_block.append(record)
-            else:
-                if holiday_block:
-                    first_holiday_date = holiday_block[0].date
-                    last_holiday_date = holiday_block[-1].date
-
-                    prev_date = first_holiday_date - timedelta(days=1)
-                    next_date = last_holiday_date + timedelta(days=1)
-
-                    #  Only check if both dates are inside the current month
-                    if first_day <= prev_date <= last_day and first_day <= next_date <= last_day:
-                        prev_status = attendance_map.get(prev_date)
-                        next_status = attendance_map.get(next_date)
-
-                        if prev_status in [STATUS_PAID_LEAVE,STATUS_UNPAID_LEAVE] and next_status in [STATUS_PAID_LEAVE,STATUS_UNPAID_LEAVE]:
-                            sandwich_holidays_unpaidleaves += len(holiday_block)
-
-                    holiday_block = []
-
-        # Check if the month ends with a holiday block (handle trailing holidays)
-        if holiday_block:
-            first_holiday_date = holiday_block[0].date
-            last_holiday_date = holiday_block[-1].date
-
-            prev_date = first_holiday_date - timedelta(days=1)
-            next_date = last_holiday_date + timedelta(days=1)
-
-            if first_day <= prev_date <= last_day and first_day <= next_date <= last_day:
-                prev_status = attendance_map.get(prev_date)
-                next_status = attendance_map.get(next_date)
-
-                if prev_status in [STATUS_PAID_LEAVE,STATUS_UNPAID_LEAVE] and next_status in [STATUS_PAID_LEAVE,STATUS_UNPAID_LEAVE]:
-                    sandwich_holidays_unpaidleaves += len(holiday_block)
-
-
-        sandwich_holidays_unpaidleaves = Decimal(sandwich_holidays_unpaidleaves)
-
-        present_days = records.filter(status='Present').count()
-        half_absents = records.filter(status='Half Absent').count()
-        absents = records.filter(status='Absent').count()
-        PaidLeaves = records.filter(status='Paid Leave').count()
-        HalfPaidLeaves = records.filter(status='Half Paid Leave').count()
-        UnPaidLeaves = records.filter(status='UnPaid Leave').count()
-        HalfUnPaidLeaves = records.filter(status='Half UnPaid Leave').count()
-        sick_leaves = records.filter(status='Sick Leave').count()
-        holidays = records.filter(status='Holiday').count()
-        
-        self.working_days = num_days - holidays
-        self.paid_leaves = Decimal(PaidLeaves) + Decimal('0.5') * Decimal(HalfPaidLeaves)
-        self.applied_unpaid_leaves = Decimal(UnPaidLeaves) + Decimal('0.5') * Decimal(HalfUnPaidLeaves)
-        self.sandwich_unpaid_leaves = sandwich_holidays_unpaidleaves
-        self.unpaid_leaves = self.applied_unpaid_leaves + self.sandwich_unpaid_leaves
-        self.sick_leaves = sick_leaves
-        self.total_leaves_taken = self.paid_leaves + self.unpaid_leaves + self.sick_leaves
-        self.absent_days = Decimal(absents) + Decimal('0.5') * Decimal(half_absents)
-        self.days_worked = self.working_days - self.total_leaves_taken - self.absent_days
-
         # Get previous month's leave balance
         prev_record = LeaveDetails.objects.filter(
             employee=self.employee,
             month__lt=self.month
-        ).order_by('-month').first()
+        ).order_by('-month').values_list('total_paid_leaves_left', 'total_sick_leaves_left').first()
 
-        
-        if prev_record:
-            self.total_paid_leaves_left = max(Decimal('0'), prev_record.total_paid_leaves_left - self.paid_leaves)
-            self.total_sick_leaves_left = max(Decimal('0'), prev_record.total_sick_leaves_left - self.sick_leaves)
-        else:
-            # First month of the year or first record
-            self.total_paid_leaves_left = max(Decimal('0'), Decimal(prorated_paidleaves) - self.paid_leaves)
-            self.total_sick_leaves_left = max(Decimal('0'), Decimal('2') - self.sick_leaves)
+        for field, value in compute_leave_details(
+            self.month, self.employee.date_joined, attendance_map, prev_record
+        ).items():
+            setattr(self, field, value)
 
         super().save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        self._check_month_open()
+        return super().delete(*args, **kwargs)
+
     def __str__(self):
         return f"Leave Details: {self.employee.id} - {self.month.strftime('%B %Y')}"
@@ -1,11 +1,17 @@
-from rest_framework import viewsets
-from .models import LeaveDetails
+from rest_framework import status, viewsets
+from rest_framework.response import Response
+from .models import LeaveDetails, MonthClosedError
 from .serializers import LeaveDetailsSerializer
 
 class LeaveDetailsViewSet(viewsets.ModelViewSet):
     queryset = LeaveDetails.objects.all()
     serializer_class = LeaveDetailsSerializer
 
+    def handle_exception(self, exc):
+        if isinstance(exc, MonthClosedError):
+            return Response({"error": str(exc)}, status=status.HTTP_409_CONFLICT)
+        return super().handle_exception(exc)
+
     def get_queryset(self):
         """
         Optionally restricts the returned leave details to a given employee and month,
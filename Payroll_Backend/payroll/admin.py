@@ -1,4 +1,9 @@
 from django.contrib import admin
-from .models import Payroll
+from .models import Payroll, PayrollMonthEvent, PayrollSnapshot, PayrollYearTotals, TdsQuarterSummary, YearEndStatement
 
-admin.site.register(Payroll)
\ No newline at end of file
+admin.site.register(Payroll)
+admin.site.register(PayrollMonthEvent)
+admin.site.register(PayrollSnapshot)
+admin.site.register(PayrollYearTotals)
+admin.site.register(TdsQuarterSummary)
+admin.site.register(YearEndStatement)
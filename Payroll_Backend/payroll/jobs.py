@@ -0,0 +1,125 @@
+# payroll/jobs.py
+"""Background job handlers for payroll and payslip generation (see the jobs app)."""
+import json
+import os
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+
+from employee.models import Employee
+from jobs.utils import job_handler
+from leavedetails.models import LeaveDetails
+from leavedetails.serializers import LeaveDetailsSerializer
+from .models import Payroll
+from .serializers import PayrollSerializer
+from .payouts import generate_payout_files
+from .statements import run_year_end_statements
+from .snapshots import active_snapshot, close_payroll_month, read_snapshot_payslip
+from .utils import generate_payroll, issue_payslip, recompute_arrears
+
+
+@job_handler('generate_payroll')
+def run_generate_payroll(job):
+    """params: employee_id, month, perform_category, reimbursement, performed_by, files (proof)."""
+    params = job.params
+    job.report_progress(0, f"Generating payroll for {params['employee_id']}")
+
+    proof = None
+    if params.get('files'):
+        name = params['files'][0]
+        proof = File(default_storage.open(name, 'rb'), name=os.path.basename(name))
+    try:
+        leave_record, payroll = generate_payroll(
+            params['employee_id'], params['month'], params['perform_category'],
+            Decimal(params.get('reimbursement') or 0),
+            reimbursement_proof=proof, performed_by_user=params.get('performed_by', 'Anonymous'),
+        )
+    except Employee.DoesNotExist:
+        raise ValueError("Employee not found.")
+    finally:
+        if proof is not None:
+            proof.close()
+
+    return {
+        "leave_details": LeaveDetailsSerializer(leave_record).data,
+        "payroll": PayrollSerializer(payroll).data,
+    }
+
+
+@job_handler('generate_payslip')
+def run_generate_payslip(job):
+    """params: employee_id, month. The PDF is kept as the job artifact."""
+    employee_id = job.params['employee_id']
+    month_str = job.params['month']
+    month_date = datetime.strptime(month_str, "%Y-%m").date().replace(day=1)
+    try:
+        payroll = Payroll.objects.get(employee__id=employee_id, month=month_date)
+        leave = LeaveDetails.objects.get(employee__id=employee_id, month=month_date)
+    except Payroll.DoesNotExist:
+        raise ValueError("Payroll not found")
+    except LeaveDetails.DoesNotExist:
+        raise ValueError("Leave details not found")
+
+    job.report_progress(10, "Rendering payslip")
+    snapshot = active_snapshot(employee_id, month_date)
+    result = issue_payslip(
+        payroll, leave, employee_id, month_str, pdf=read_snapshot_payslip(snapshot) if snapshot else None
+    )
+    job.artifact.save(f"payslip_{employee_id}_{month_str}.pdf", ContentFile(result["pdf"]), save=False)
+    return {
+        "message": result["message"],
+        "saved_path": result["saved_path"],
+        "email_failed": result["email_failed"],
+    }
+
+
+@job_handler('close_payroll_month')
+def run_close_payroll_month(job):
+    """params: month, reason. Snapshots and closes the month."""
+    month_date = datetime.strptime(job.params['month'], "%Y-%m").date()
+
+    def progress(done, total):
+        job.report_progress(done * 100 // total, f"Rendered {done} of {total} payslips")
+
+    event = close_payroll_month(month_date, user=job.created_by, reason=job.params.get('reason', ''), progress=progress)
+    return {"month": job.params['month'], "snapshot_count": event.snapshot_count}
+
+
+@job_handler('recompute_arrears')
+def run_recompute_arrears(job):
+    """params: employee_id, effective_from (YYYY-MM-DD)."""
+    effective_from = datetime.strptime(job.params['effective_from'], "%Y-%m-%d").date()
+
+    def progress(done, total):
+        job.report_progress(done * 100 // total, f"Recomputed {done} of {total} months")
+
+    summary = recompute_arrears(job.params['employee_id'], effective_from, progress=progress)
+    # amounts are Decimals; the result column is plain JSON
+    return json.loads(json.dumps(summary, cls=DjangoJSONEncoder))
+
+
+@job_handler('payout_files')
+def run_payout_files(job):
+    """params: month. Writes the bank payout files of a closed month."""
+    month_date = datetime.strptime(job.params['month'], "%Y-%m").date()
+
+    def progress(done, total):
+        job.report_progress(done * 100 // total, f"Processed {done} of {total} payees")
+
+    return generate_payout_files(month_date, progress=progress)
+
+
+@job_handler('year_end_statements')
+def run_year_end_statements_job(job):
+    """params: financial_year, force, workers. Renders the year-end statements."""
+    def progress(done, total):
+        job.report_progress(done * 100 // total, f"Rendered {done} of {total} statements")
+
+    return run_year_end_statements(
+        int(job.params['financial_year']), workers=int(job.params.get('workers') or 1),
+        force=bool(job.params.get('force')), progress=progress,
+    )
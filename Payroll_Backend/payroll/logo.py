@@ -0,0 +1,35 @@
+# payroll/logo.py
+"""
+The company logo as drawn on payslips and statements.
+
+The source JPEG is far larger than the 10 mm square it is printed in, and
+every PDF embeds the image it is given, so it is downsampled to the printed
+size at PAYSLIP_LOGO_DPI once per process and the small JPEG is embedded
+instead.
+"""
+import io
+import os
+from functools import lru_cache
+
+from django.conf import settings
+from PIL import Image
+from reportlab.lib.units import inch, mm
+
+LOGO_SIZE = 10 * mm
+
+
+def logo_path():
+    return os.path.join(settings.BASE_DIR, "static/images/jivass_technologies_logo.jpeg")
+
+
+@lru_cache(maxsize=1)
+def logo_jpeg():
+    """The logo as JPEG bytes, at most LOGO_SIZE x PAYSLIP_LOGO_DPI pixels across."""
+    pixels = round(LOGO_SIZE / inch * settings.PAYSLIP_LOGO_DPI)
+    with Image.open(logo_path()) as image:
+        image = image.convert('RGB')
+        if image.width > pixels or image.height > pixels:
+            image.thumbnail((pixels, pixels), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, 'JPEG', quality=90, optimize=True)
+    return output.getvalue()
@@ -0,0 +1,97 @@
+# payroll/management/commands/payslip_size_report.py
+
+import os
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+
+from leavedetails.models import LeaveDetails
+from payroll.models import Payroll
+from payroll.utils import render_payslip_pdf
+
+
+def _stored_sizes(folder):
+    """{(employee_id, 'YYYY-MM'): bytes} of the newest stored payslip of each employee and month."""
+    sizes = {}
+    if not os.path.isdir(folder):
+        return sizes
+    for filename in sorted(os.listdir(folder)):
+        # payslip_<employee>_<YYYY-MM>_gen-<date>,<time>.pdf; sorted, so the newest wins
+        parts = filename.split('_')
+        if len(parts) == 4 and parts[0] == 'payslip' and filename.endswith('.pdf'):
+            sizes[(parts[1], parts[2])] = os.path.getsize(os.path.join(folder, filename))
+    return sizes
+
+
+def _folder_bytes(folder):
+    if not os.path.isdir(folder):
+        return 0, 0
+    sizes = [entry.stat().st_size for entry in os.scandir(folder) if entry.is_file() and entry.name.endswith('.pdf')]
+    return len(sizes), sum(sizes)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the average size of the payslips stored in PAYSLIP_STORAGE_DIR with the same payslips "
+        "rendered under the current settings, and estimate what re-issuing them would save."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--month", type=str, help="Payroll month, YYYY-MM (default: the latest with payroll)")
+        parser.add_argument("--limit", type=int, default=200, help="Payslips to render (default 200)")
+
+    def handle(self, *args, **options):
+        if options["month"]:
+            try:
+                month = datetime.strptime(options["month"], '%Y-%m').date()
+            except ValueError:
+                raise CommandError("--month must be YYYY-MM")
+        else:
+            month = Payroll.objects.aggregate(latest=Max('month'))['latest']
+            if month is None:
+                raise CommandError("No payroll to report on.")
+
+        payrolls = list(
+            Payroll.objects.filter(month=month).select_related('employee').order_by('employee_id')[:options["limit"]]
+        )
+        leaves = {
+            leave.employee_id: leave
+            for leave in LeaveDetails.objects.filter(month=month, employee_id__in=[p.employee_id for p in payrolls])
+        }
+        stored = _stored_sizes(settings.PAYSLIP_STORAGE_DIR)
+        label = month.strftime('%Y-%m')
+
+        rendered, before, after = 0, [], []
+        for payroll in payrolls:
+            leave = leaves.get(payroll.employee_id)
+            if leave is None:
+                continue
+            size = len(render_payslip_pdf(payroll, leave).getvalue())
+            rendered += size
+            if (payroll.employee_id, label) in stored:
+                before.append(stored[(payroll.employee_id, label)])
+                after.append(size)
+        count = sum(1 for p in payrolls if p.employee_id in leaves)
+        if not count:
+            raise CommandError(f"No payroll with leave details for {label}.")
+
+        self.stdout.write(
+            f"{label}: {count} payslips rendered with the {settings.PAYSLIP_RENDERER} renderer, "
+            f"average {rendered / count:,.0f} bytes"
+        )
+        if before:
+            average_before, average_after = sum(before) / len(before), sum(after) / len(after)
+            self.stdout.write(
+                f"{len(before)} of them are stored: average {average_before:,.0f} bytes stored, "
+                f"{average_after:,.0f} bytes now ({(average_after - average_before) / average_before:+.1%})"
+            )
+            for name, folder in (("Storage", settings.PAYSLIP_STORAGE_DIR), ("Archive", settings.PAYSLIP_ARCHIVE_DIR)):
+                files, total = _folder_bytes(folder)
+                self.stdout.write(
+                    f"{name}: {files} payslips, {total:,} bytes; about "
+                    f"{total * average_after / average_before:,.0f} bytes at the new size"
+                )
+        else:
+            self.stdout.write("None of them are stored in PAYSLIP_STORAGE_DIR to compare against.")
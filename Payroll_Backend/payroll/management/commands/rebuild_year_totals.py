@@ -0,0 +1,60 @@
+# payroll/management/commands/rebuild_year_totals.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from payroll.models import Payroll, PayrollYearTotals, TdsQuarterSummary
+from payroll.ytd import financial_quarter_expression, financial_year_expression
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the per-employee financial year payroll totals and quarterly TDS summaries from the "
+        "Payroll table. Payroll.save keeps them current; run this once after upgrading, or after "
+        "writing payroll with bulk queries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--financial-year", type=int, help="Only this financial year (e.g. 2025 for 2025-26)")
+
+    def handle(self, *args, **options):
+        year = options["financial_year"]
+        # one grouped query per table instead of a refresh per employee and period
+        payrolls = Payroll.objects.annotate(fy=financial_year_expression(), fq=financial_quarter_expression())
+        if year is not None:
+            payrolls = payrolls.filter(fy=year)
+
+        years = payrolls.values('employee_id', 'fy').annotate(
+            row_count=Count('id'), fee_total=Sum('fee_earned'), tds_total=Sum('tds'),
+            reimbursement_total=Sum('reimbursement'), net_total=Sum('net_fee_earned'),
+        ).order_by()
+        year_rows = [
+            PayrollYearTotals(
+                employee_id=g['employee_id'], financial_year=g['fy'], months=g['row_count'],
+                fee_earned=g['fee_total'], tds=g['tds_total'], reimbursement=g['reimbursement_total'],
+                net_fee_earned=g['net_total'],
+            )
+            for g in years
+        ]
+        quarters = payrolls.values('employee_id', 'fy', 'fq').annotate(
+            row_count=Count('id'), fee_total=Sum('fee_earned'), tds_total=Sum('tds'),
+        ).order_by()
+        quarter_rows = [
+            TdsQuarterSummary(
+                employee_id=g['employee_id'], financial_year=g['fy'], quarter=g['fq'], months=g['row_count'],
+                amount_paid=g['fee_total'], tds=g['tds_total'],
+            )
+            for g in quarters
+        ]
+
+        with transaction.atomic():
+            for model, rows in ((PayrollYearTotals, year_rows), (TdsQuarterSummary, quarter_rows)):
+                existing = model.objects.all()
+                if year is not None:
+                    existing = existing.filter(financial_year=year)
+                existing.delete()
+                model.objects.bulk_create(rows, batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(year_rows)} employee financial year totals and {len(quarter_rows)} quarterly TDS summaries."
+        ))
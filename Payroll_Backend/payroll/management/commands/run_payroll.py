@@ -0,0 +1,71 @@
+# payroll/management/commands/run_payroll.py
+
+import os
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from leavedetails.models import MonthClosedError
+from payroll.models import Payroll
+from payroll.runner import run_payroll_partitioned
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate or recompute the payroll of every employee for a month, split into employee id "
+        "ranges processed by parallel worker processes. Existing payroll keeps its performance "
+        "category and reimbursement."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("month", type=str, help="Month to run, YYYY-MM")
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Worker processes (default: CPU count; 1 runs in this process)"
+        )
+        parser.add_argument("--partitions", type=int, help="Employee id ranges (default: 4 per worker)")
+        parser.add_argument(
+            "--perform-category", type=str, default="NA", choices=[c for c, _ in Payroll.PERFORMANCE_CHOICES],
+            help="Performance category for employees without payroll this month (default NA)"
+        )
+        parser.add_argument(
+            "--skip-locked", action="store_true",
+            help="Skip employees another run is computing right now instead of waiting for it"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            month = datetime.strptime(options["month"], "%Y-%m").date()
+        except ValueError:
+            raise CommandError("month must be YYYY-MM")
+        workers = max(1, options["workers"])
+        partitions = options["partitions"] or workers * 4
+
+        def report(result):
+            self.stdout.write(
+                f"{result['first_id']:>6}..{result['last_id']:<6} {result['generated']:>6} generated  "
+                f"{result['locked']:>4} locked  {result['no_attendance']:>4} no attendance  "
+                f"{len(result['failed']):>4} failed  {result['seconds']:8.2f} s"
+            )
+
+        started = time.perf_counter()
+        try:
+            results = run_payroll_partitioned(
+                month, workers=workers, partitions=partitions, default_category=options["perform_category"],
+                wait=not options["skip_locked"], progress=report,
+            )
+        except MonthClosedError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        for result in results:
+            for failure in result["failed"]:
+                self.stderr.write(f"{failure['employee_id']}: {failure['error']}")
+        totals = {key: sum(r[key] for r in results) for key in ("generated", "locked", "no_attendance")}
+        failed = sum(len(r["failed"]) for r in results)
+        self.stdout.write(self.style.SUCCESS(
+            f"{month:%Y-%m}: {totals['generated']} generated, {totals['locked']} skipped as locked, "
+            f"{totals['no_attendance']} without attendance, {failed} failed "
+            f"in {elapsed:.1f} s ({len(results)} partitions, {workers} workers)"
+        ))
@@ -0,0 +1,39 @@
+# payroll/management/commands/year_end_statements.py
+
+import os
+
+from django.core.management.base import BaseCommand
+
+from payroll.statements import run_year_end_statements
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the year-end earnings statement PDF of every employee with payroll in a financial "
+        "year, across parallel worker processes. Employees whose statement is already indexed are "
+        "skipped, so an interrupted run can simply be started again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("financial_year", type=int, help="Start year of the financial year, e.g. 2025 for 2025-26")
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Worker processes (default: CPU count; 1 renders in this process)"
+        )
+        parser.add_argument("--batch-size", type=int, default=25, help="Employees per worker task (default 25)")
+        parser.add_argument("--force", action="store_true", help="Re-render statements that already exist")
+
+    def handle(self, *args, **options):
+        def report(done, total):
+            self.stdout.write(f"{done:>7} / {total} statements")
+
+        summary = run_year_end_statements(
+            options["financial_year"], workers=max(1, options["workers"]), force=options["force"],
+            batch_size=max(1, options["batch_size"]), progress=report,
+        )
+        for failure in summary["failed"]:
+            self.stderr.write(f"{failure['employee_id']}: {failure['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"FY {summary['financial_year']}: {summary['rendered']} rendered, {summary['skipped']} already done, "
+            f"{len(summary['failed'])} failed in {summary['seconds']:.1f} s"
+        ))
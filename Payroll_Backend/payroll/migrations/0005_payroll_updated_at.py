@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0004_payroll_generated_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payroll',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:11
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0005_payroll_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollMonthEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(db_index=True, help_text='Month and year')),
+                ('action', models.CharField(choices=[('close', 'Close'), ('reopen', 'Reopen')], max_length=10)),
+                ('reason', models.TextField(blank=True)),
+                ('snapshot_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('performed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payroll_month_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PayrollSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='Month and year')),
+                ('payroll', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('leave_details', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('net_fee_earned', models.IntegerField()),
+                ('payslip', models.FileField(upload_to='payslip_snapshots/')),
+                ('payslip_sha256', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payroll_snapshots', to=settings.AUTH_USER_MODEL)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='snapshots', to='payroll.payrollmonthevent')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['employee', 'month'], name='payroll_snapshot_emp_month')],
+                'unique_together': {('event', 'employee')},
+            },
+        ),
+    ]
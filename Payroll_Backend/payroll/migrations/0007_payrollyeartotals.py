@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0006_payrollmonthevent_payrollsnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollYearTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('financial_year', models.PositiveSmallIntegerField(help_text='Start year: 2025 covers April 2025 to March 2026')),
+                ('months', models.PositiveSmallIntegerField(default=0)),
+                ('fee_earned', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('tds', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('reimbursement', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('net_fee_earned', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payroll_year_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('employee', 'financial_year')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0007_payrollyeartotals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TdsQuarterSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('financial_year', models.PositiveSmallIntegerField(help_text='Start year: 2025 covers April 2025 to March 2026')),
+                ('quarter', models.PositiveSmallIntegerField(help_text='1 = April-June ... 4 = January-March')),
+                ('months', models.PositiveSmallIntegerField(default=0)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('tds', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tds_quarter_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['financial_year', 'quarter'], name='tds_quarter_year_quarter')],
+                'unique_together': {('employee', 'financial_year', 'quarter')},
+            },
+        ),
+    ]
@@ -1,8 +1,85 @@
+from collections import defaultdict
+from datetime import date
+from decimal import ROUND_HALF_UP
+
 from django.db import models
-from leavedetails.models import LeaveDetails
+from django.utils import timezone
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from leavedetails.models import LeaveDetails, MonthClosedError
 from employee.models import Employee
+from employee.utils import resolve_compensation
 from decimal import Decimal
 
+# Share of the variable pay paid out per performance category
+PERFORMANCE_MULTIPLIERS = {'1': 1.10, '2': 0.75, '3': 0.50, '4': 0, 'NA': 0}
+TDS_RATE = Decimal('0.1')
+# Each absent day costs this share of a day's base pay on top of not being paid
+ABSENT_PENALTY_FACTOR = Decimal('0.5')
+# The financial year runs April to March
+FINANCIAL_YEAR_START_MONTH = 4
+
+
+def financial_year(month):
+    """Start year of the financial year containing `month`: 2025 for April 2025 to March 2026."""
+    return month.year if month.month >= FINANCIAL_YEAR_START_MONTH else month.year - 1
+
+
+def financial_year_bounds(year):
+    """(first month, first month of the next year) of financial year `year`."""
+    return date(year, FINANCIAL_YEAR_START_MONTH, 1), date(year + 1, FINANCIAL_YEAR_START_MONTH, 1)
+
+
+def financial_quarter(month):
+    """Quarter 1-4 of the financial year: Q1 is April to June, Q4 January to March."""
+    return (month.month - FINANCIAL_YEAR_START_MONTH) % 12 // 3 + 1
+
+
+def financial_quarter_bounds(year, quarter):
+    """(first month, first month after) of `quarter` of financial year `year`."""
+    start, _ = financial_year_bounds(year)
+    first = start.month + 3 * (quarter - 1)
+    start = date(start.year + (first - 1) // 12, (first - 1) % 12 + 1, 1)
+    after = start.month + 3
+    return start, date(start.year + (after - 1) // 12, (after - 1) % 12 + 1, 1)
+
+
+def compute_payroll(fee_per_month, pay_structure, leave_details, perform_category, reimbursement,
+                    multipliers=PERFORMANCE_MULTIPLIERS, tds_rate=TDS_RATE, absent_penalty=ABSENT_PENALTY_FACTOR):
+    """
+    The computed Payroll fields for one month, without touching the database.
+    leave_details is the month's LeaveDetails row, or any object with its
+    working_days, days_worked, paid_leaves, sick_leaves and absent_days.
+    """
+    if pay_structure == "fixed":
+        base_pay = fee_per_month
+        variable_pay = 0
+    else:
+        base_pay = fee_per_month * Decimal('0.75')
+        variable_pay = fee_per_month * Decimal('0.25')
+
+    working_days = leave_details.working_days
+    payable_days = (leave_details.days_worked) + (leave_details.paid_leaves) + (leave_details.sick_leaves)
+    absent_days = leave_details.absent_days
+    base_pay_per_day = base_pay / working_days
+    penalty_per_absent = base_pay_per_day * absent_penalty
+    total_absent_penalty = absent_days * penalty_per_absent
+    base_pay_earned = (base_pay_per_day * payable_days) - total_absent_penalty
+    multiplier = multipliers.get(perform_category, 0)
+    perform_comp_payable = variable_pay * Decimal(multiplier)
+    fee_earned = base_pay_earned + perform_comp_payable
+    tds = fee_earned * tds_rate
+    return {
+        'base_pay': base_pay,
+        'variable_pay': variable_pay,
+        'base_pay_earned': base_pay_earned,
+        'perform_comp_payable': perform_comp_payable,
+        'fee_earned': fee_earned,
+        'tds': tds,
+        'net_fee_earned': round(fee_earned - tds + reimbursement),
+    }
+
+
 class Payroll(models.Model):
 
     PERFORMANCE_CHOICES = [
@@ -33,43 +110,309 @@ class Payroll(models.Model):
         blank=True,
         help_text="Upload PDF proof for reimbursement"
     )
+    # Change tracking for incremental backups; bulk paths set it explicitly
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         unique_together = ('employee', 'month')
 
 
+    # what PayrollYearTotals and TdsQuarterSummary add up
+    ROLLUP_FIELDS = ('employee_id', 'month', 'fee_earned', 'tds', 'reimbursement', 'net_fee_earned')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(field in field_names for field in cls.ROLLUP_FIELDS):
+            instance._rolled_up = instance._rollup()
+        return instance
+
+    def _rollup(self):
+        return tuple(getattr(self, field) for field in self.ROLLUP_FIELDS)
+
+    def _rolled_up_before(self):
+        """The figures the totals hold for this row: as loaded, else read back; None for a new row."""
+        if hasattr(self, '_rolled_up'):
+            return self._rolled_up
+        if self.pk is None:
+            return None
+        return Payroll.objects.filter(pk=self.pk).values_list(*self.ROLLUP_FIELDS).first()
+
     def save(self, *args, **kwargs):
+        if PayrollMonthEvent.is_closed(self.month):
+            raise MonthClosedError(
+                f"Payroll for {self.month.strftime('%B %Y')} is closed; reopen the month to change it."
+            )
         if self.employee:
-            self.fee_per_month = self.employee.fee_per_month
-            self.pay_structure = self.employee.pay_structure
+            # the compensation in effect for this month, not today's
+            self.fee_per_month, self.pay_structure = resolve_compensation([self.employee_id], self.month)[self.employee_id]
             self.calculate_payroll()
+        # round as the column does, so the totals add exactly what is stored
+        for name in ('fee_earned', 'tds', 'reimbursement'):
+            places = Decimal(1).scaleb(-self._meta.get_field(name).decimal_places)
+            setattr(self, name, Decimal(getattr(self, name)).quantize(places, rounding=ROUND_HALF_UP))
+        previous = self._rolled_up_before()
         super().save(*args, **kwargs)
+        self._rolled_up = self._rollup()
+        update_payroll_totals(previous, self._rolled_up)
 
-    def calculate_payroll(self):
+    def delete(self, *args, **kwargs):
+        if PayrollMonthEvent.is_closed(self.month):
+            raise MonthClosedError(
+                f"Payroll for {self.month.strftime('%B %Y')} is closed; reopen the month to change it."
+            )
+        previous = self._rolled_up_before()
+        result = super().delete(*args, **kwargs)
+        self._rolled_up = None
+        update_payroll_totals(previous, None)
+        return result
 
-        if self.pay_structure == "fixed":
-            self.base_pay = self.fee_per_month
-            self.variable_pay = 0
-        else:
-            self.base_pay = self.fee_per_month * Decimal('0.75')
-            self.variable_pay = self.fee_per_month * Decimal('0.25') 
-        
+    def calculate_payroll(self):
         leave_details_record = LeaveDetails.objects.filter(employee=self.employee, month=self.month).first()
-        working_days = leave_details_record.working_days
-        payable_days = (leave_details_record.days_worked) + (leave_details_record.paid_leaves) + (leave_details_record.sick_leaves)
-        absent_days = leave_details_record.absent_days
-        base_pay_per_day = self.base_pay / working_days
-        penalty_per_absnet = base_pay_per_day * Decimal('0.5')
-        total_absent_penalty = absent_days * penalty_per_absnet
-        self.base_pay_earned = (base_pay_per_day * payable_days) - total_absent_penalty
-        multipliers = {'1': 1.10, '2': 0.75, '3': 0.50, '4': 0, 'NA': 0}
-        multiplier = multipliers.get(self.perform_category, 0)
-        self.perform_comp_payable = self.variable_pay * Decimal(multiplier)
-        self.fee_earned = self.base_pay_earned + self.perform_comp_payable
-        self.tds = self.fee_earned * Decimal('0.1')
-        self.net_fee_earned = round(self.fee_earned - self.tds + self.reimbursement)
+        for field, value in compute_payroll(
+            self.fee_per_month, self.pay_structure, leave_details_record, self.perform_category, self.reimbursement
+        ).items():
+            setattr(self, field, value)
 
     def __str__(self):
         return f"Payroll for {self.employee.id} ({self.employee.name}) - {self.month.strftime('%B %Y')}"
 
 
+
+
+class PayrollYearTotals(models.Model):
+    """
+    An employee's payroll totals for one April-March financial year. Every
+    Payroll save and delete adds its change to the row (see
+    update_payroll_totals), so YTD reports read a single row per employee.
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='payroll_year_totals')
+    financial_year = models.PositiveSmallIntegerField(help_text="Start year: 2025 covers April 2025 to March 2026")
+    months = models.PositiveSmallIntegerField(default=0)
+    fee_earned = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    tds = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    reimbursement = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    net_fee_earned = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('employee', 'financial_year')
+
+    @classmethod
+    def refresh(cls, employee_id, year):
+        """Re-sums the employee's payroll of financial year `year`; returns the row, or None once it has no payroll."""
+        start, end = financial_year_bounds(year)
+        totals = Payroll.objects.filter(employee_id=employee_id, month__gte=start, month__lt=end).aggregate(
+            months=models.Count('id'),
+            fee_earned=models.Sum('fee_earned'),
+            tds=models.Sum('tds'),
+            reimbursement=models.Sum('reimbursement'),
+            net_fee_earned=models.Sum('net_fee_earned'),
+        )
+        if not totals['months']:
+            cls.objects.filter(employee_id=employee_id, financial_year=year).delete()
+            return None
+        row, _ = cls.objects.update_or_create(employee_id=employee_id, financial_year=year, defaults=totals)
+        return row
+
+    def __str__(self):
+        return f"FY {self.financial_year}-{(self.financial_year + 1) % 100:02d} totals: {self.employee_id}"
+
+
+class TdsQuarterSummary(models.Model):
+    """
+    Fee earned and TDS deducted for one employee in one quarter of the
+    financial year, kept current on every Payroll save and delete like
+    PayrollYearTotals. The quarterly TDS statement groups these rows by PAN.
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='tds_quarter_summaries')
+    financial_year = models.PositiveSmallIntegerField(help_text="Start year: 2025 covers April 2025 to March 2026")
+    quarter = models.PositiveSmallIntegerField(help_text="1 = April-June ... 4 = January-March")
+    months = models.PositiveSmallIntegerField(default=0)
+    amount_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    tds = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('employee', 'financial_year', 'quarter')
+        indexes = [
+            models.Index(fields=['financial_year', 'quarter'], name='tds_quarter_year_quarter'),
+        ]
+
+    @classmethod
+    def refresh(cls, employee_id, month):
+        """Re-sums the employee's payroll of the quarter containing `month`; returns the row or None."""
+        year, quarter = financial_year(month), financial_quarter(month)
+        start, end = financial_quarter_bounds(year, quarter)
+        totals = Payroll.objects.filter(employee_id=employee_id, month__gte=start, month__lt=end).aggregate(
+            months=models.Count('id'),
+            amount_paid=models.Sum('fee_earned'),
+            tds=models.Sum('tds'),
+        )
+        if not totals['months']:
+            cls.objects.filter(employee_id=employee_id, financial_year=year, quarter=quarter).delete()
+            return None
+        row, _ = cls.objects.update_or_create(
+            employee_id=employee_id, financial_year=year, quarter=quarter, defaults=totals
+        )
+        return row
+
+    def __str__(self):
+        return f"TDS FY {self.financial_year} Q{self.quarter}: {self.employee_id}"
+
+
+def _add_to_totals(model, lookup, changes):
+    """Adds `changes` to the totals row matching `lookup` in one UPDATE; False when there is no row."""
+    rows = model.objects.filter(**lookup)
+    if not rows.update(updated_at=timezone.now(), **{f: models.F(f) + value for f, value in changes.items()}):
+        return False
+    if changes['months'] < 0:
+        rows.filter(months=0).delete()
+    return True
+
+
+def update_payroll_totals(previous, current):
+    """
+    Moves one payroll row's figures in PayrollYearTotals and TdsQuarterSummary
+    from `previous` to `current` (Payroll.ROLLUP_FIELDS tuples, None for no
+    row). Unchanged figures cost nothing and a change is an UPDATE per
+    period; a period without its totals row yet is re-summed from Payroll,
+    which also repairs totals left behind by bulk writes.
+    """
+    years, quarters = defaultdict(lambda: defaultdict(int)), defaultdict(lambda: defaultdict(int))
+    for sign, rollup in ((-1, previous), (1, current)):
+        if rollup is None:
+            continue
+        employee_id, month, fee_earned, tds, reimbursement, net_fee_earned = rollup
+        year = years[(employee_id, financial_year(month))]
+        quarter = quarters[(employee_id, financial_year(month), financial_quarter(month))]
+        for totals, changes in (
+            (year, {'months': 1, 'fee_earned': fee_earned, 'tds': tds,
+                    'reimbursement': reimbursement, 'net_fee_earned': net_fee_earned}),
+            (quarter, {'months': 1, 'amount_paid': fee_earned, 'tds': tds}),
+        ):
+            for field, value in changes.items():
+                totals[field] += sign * value
+
+    for (employee_id, year), changes in years.items():
+        if any(changes.values()) and not _add_to_totals(
+            PayrollYearTotals, {'employee_id': employee_id, 'financial_year': year}, changes
+        ):
+            PayrollYearTotals.refresh(employee_id, year)
+    for (employee_id, year, quarter), changes in quarters.items():
+        if any(changes.values()) and not _add_to_totals(
+            TdsQuarterSummary, {'employee_id': employee_id, 'financial_year': year, 'quarter': quarter}, changes
+        ):
+            TdsQuarterSummary.refresh(employee_id, financial_quarter_bounds(year, quarter)[0])
+
+
+class YearEndStatement(models.Model):
+    """
+    Index of the year-end earnings statements: the rendered PDF of one
+    employee's financial year with the totals printed on it. A statement
+    run skips employees already listed here, so an interrupted run resumes
+    where it stopped.
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='year_end_statements')
+    financial_year = models.PositiveSmallIntegerField(help_text="Start year: 2025 covers April 2025 to March 2026")
+    pdf = models.FileField(upload_to='year_end_statements/')
+    pdf_sha256 = models.CharField(max_length=64)
+    months = models.PositiveSmallIntegerField(default=0)
+    fee_earned = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    tds = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    reimbursement = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    net_fee_earned = models.IntegerField(default=0)
+    generated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('employee', 'financial_year')
+
+    def __str__(self):
+        return f"Year-end statement FY {self.financial_year}: {self.employee_id}"
+
+
+class PayrollMonthEvent(models.Model):
+    """
+    Audit trail of closing and reopening payroll months. A month is closed
+    while its latest event is a close; the snapshots of that event are then
+    what payslips and reports serve.
+    """
+    ACTION_CHOICES = [('close', 'Close'), ('reopen', 'Reopen')]
+
+    month = models.DateField(help_text="Month and year", db_index=True)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    performed_by = models.ForeignKey(
+        Employee, on_delete=models.SET_NULL, null=True, blank=True, related_name='payroll_month_events'
+    )
+    reason = models.TextField(blank=True)
+    snapshot_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+
+    @classmethod
+    def latest_for(cls, month):
+        return cls.objects.filter(month=month.replace(day=1)).order_by('-created_at', '-id').first()
+
+    @classmethod
+    def is_closed(cls, month):
+        latest = cls.latest_for(month)
+        return latest is not None and latest.action == 'close'
+
+    def __str__(self):
+        return f"{self.get_action_display()} {self.month.strftime('%B %Y')}"
+
+
+class PayrollSnapshotQuerySet(models.QuerySet):
+    # snapshots are the record of what was paid: no bulk changes either
+
+    def delete(self):
+        raise ValidationError("Payroll snapshots are immutable.")
+
+    def update(self, **kwargs):
+        raise ValidationError("Payroll snapshots are immutable.")
+
+    def active(self):
+        """Snapshots of months that are closed right now (their close is the latest event)."""
+        latest_event = PayrollMonthEvent.objects.filter(
+            month=models.OuterRef('month')
+        ).order_by('-created_at', '-id').values('id')[:1]
+        return self.filter(event_id=models.Subquery(latest_event), event__action='close')
+
+
+class PayrollSnapshot(models.Model):
+    """
+    Frozen payroll and leave details of one employee for a closed month, with
+    the payslip PDF rendered at close time. Rows are never updated or
+    deleted, one at a time or through querysets, and an employee with
+    snapshots cannot be deleted; reopening and closing again creates new ones.
+    """
+    event = models.ForeignKey(PayrollMonthEvent, on_delete=models.PROTECT, related_name='snapshots')
+    employee = models.ForeignKey(Employee, on_delete=models.PROTECT, related_name='payroll_snapshots')
+    month = models.DateField(help_text="Month and year")
+    payroll = models.JSONField(encoder=DjangoJSONEncoder)
+    leave_details = models.JSONField(encoder=DjangoJSONEncoder)
+    net_fee_earned = models.IntegerField()
+    payslip = models.FileField(upload_to='payslip_snapshots/')
+    payslip_sha256 = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = PayrollSnapshotQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('event', 'employee')
+        indexes = [
+            models.Index(fields=['employee', 'month'], name='payroll_snapshot_emp_month'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("Payroll snapshots are immutable.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValidationError("Payroll snapshots are immutable.")
+
+    def __str__(self):
+        return f"Snapshot: {self.employee_id} - {self.month.strftime('%B %Y')}"
@@ -0,0 +1,28 @@
+# payroll/partition_worker.py
+"""
+Entry points of the spawned processes used by payroll.runner and
+payroll.statements. A spawned process imports this module before anything
+else, so it must not import models at module level: django.setup() has to
+run first.
+"""
+
+
+def init_worker():
+    import django
+    django.setup()
+
+
+def run_partition(*args):
+    from django.db import connections
+    from .runner import run_partition as run
+
+    try:
+        return run(*args)
+    finally:
+        connections.close_all()
+
+
+def render_statements(year, batch):
+    from .statements import render_batch
+
+    return render_batch(year, batch)
@@ -0,0 +1,197 @@
+# payroll/payouts.py
+"""
+Bank payout files for a closed payroll month.
+
+The net pay frozen in the month's snapshots is split by the payee's account
+type in a single streaming pass: SBI accounts go to a fixed-width
+intra-bank transfer file, other banks to a NEFT CSV. Each file is written
+through a hashing writer, so its row count, total and SHA-256 are known when
+the pass ends; the fixed-width file also carries them in its trailer.
+Payees whose bank details fail validation are reported, not paid.
+"""
+import csv
+import hashlib
+import io
+import json
+import logging
+import re
+import tempfile
+from datetime import date
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .models import PayrollMonthEvent, PayrollSnapshot
+
+payroll_logger = logging.getLogger('payroll_operations')
+
+IFSC_PATTERN = re.compile(r'^[A-Z]{4}0[A-Z0-9]{6}$')
+SBI_BANK_CODE = 'SBIN'
+# SBI fixed-width layout; every record is RECORD_LENGTH characters
+RECORD_LENGTH = 100
+NEFT_HEADER = ['Employee ID', 'Beneficiary name', 'Account number', 'IFSC', 'Amount', 'Narration']
+ITERATOR_CHUNK_SIZE = 2000
+
+
+@lru_cache(maxsize=4)
+def load_ifsc_codes(path):
+    """
+    The IFSC codes listed in `path` as a frozenset, read once per process:
+    one code per line, or a CSV whose header has an IFSC column.
+    """
+    with open(path, newline='') as f:
+        first = f.readline()
+        f.seek(0)
+        if ',' in first:
+            reader = csv.DictReader(f)
+            column = next(name for name in reader.fieldnames if name.strip().upper() == 'IFSC')
+            return frozenset(row[column].strip().upper() for row in reader if row[column])
+        return frozenset(line.strip().upper() for line in f if line.strip())
+
+
+def payee_problem(account_type, account_number, account_name, ifsc, amount, known_ifsc=None):
+    """Why the payee cannot be paid, or None."""
+    if amount <= 0:
+        return "nothing to pay"
+    if not account_number or not account_number.isdigit():
+        return "missing or non-numeric account number"
+    if account_type == 'SBI' and len(account_number) > 17:
+        return "SBI account number longer than 17 digits"
+    if not account_name:
+        return "missing account holder name"
+    if not ifsc or not IFSC_PATTERN.match(ifsc):
+        return f"invalid IFSC code '{ifsc or ''}'"
+    if known_ifsc is not None and ifsc not in known_ifsc:
+        return f"unknown IFSC code '{ifsc}'"
+    if account_type == 'SBI' and not ifsc.startswith(SBI_BANK_CODE):
+        return f"IFSC code '{ifsc}' is not an SBI branch"
+    return None
+
+
+def _record(*fields):
+    line = ''.join(fields)
+    if len(line) != RECORD_LENGTH:
+        raise ValueError(f"Payout record is {len(line)} characters, expected {RECORD_LENGTH}")
+    return line + '\r\n'
+
+
+class PayoutWriter:
+    """Writes one payout file to a temporary file, counting, totalling and hashing as it goes."""
+
+    def __init__(self, account_type, fmt, month):
+        self.account_type = account_type
+        self.format = fmt
+        self.month = month
+        self.rows = 0
+        self.total = 0
+        # hash total of the account numbers, a control figure banks check
+        self.account_hash = 0
+        self.sha256 = hashlib.sha256()
+        self.file = tempfile.TemporaryFile()
+        if fmt == 'csv':
+            self._line = io.StringIO()
+            self._csv = csv.writer(self._line)
+            self._write_csv(NEFT_HEADER)
+        else:
+            self._write(_record('H', f"{month:%Y%m}", f"{date.today():%Y%m%d}", ' ' * (RECORD_LENGTH - 15)))
+
+    def _write(self, text):
+        data = text.encode('ascii', 'replace')
+        self.sha256.update(data)
+        self.file.write(data)
+
+    def _write_csv(self, row):
+        self._line.seek(0)
+        self._line.truncate()
+        self._csv.writerow(row)
+        self._write(self._line.getvalue())
+
+    def add(self, employee_id, name, account_number, ifsc, amount, narration):
+        self.rows += 1
+        self.total += amount
+        self.account_hash = (self.account_hash + int(account_number[-15:])) % 10 ** 18
+        if self.format == 'csv':
+            self._write_csv([employee_id, name, account_number, ifsc, f"{amount}.00", narration])
+        else:
+            self._write(_record(
+                'D', account_number.ljust(17), f"{amount * 100:015d}", name.upper()[:35].ljust(35),
+                employee_id.ljust(6), narration[:26].ljust(26),
+            ))
+
+    def finish(self):
+        if self.format != 'csv':
+            self._write(_record(
+                'T', f"{self.rows:09d}", f"{self.total * 100:018d}", f"{self.account_hash:018d}",
+                ' ' * (RECORD_LENGTH - 46),
+            ))
+        self.file.seek(0)
+        return self.file
+
+
+FILE_FORMATS = {'SBI': 'fixed', 'NonSBI': 'csv'}
+
+
+def generate_payout_files(month, progress=None):
+    """
+    Writes the payout files of a closed month to storage under
+    payout_files/<YYYY-MM>/ next to a JSON manifest, and returns the manifest:
+    per file its account type, storage name, rows, total (rupees), account
+    number hash total and SHA-256, plus the rejected payees with reasons.
+    Raises ValueError if the month is not closed. progress(done, total) is
+    called every ITERATOR_CHUNK_SIZE payees.
+    """
+    month = month.replace(day=1)
+    if not PayrollMonthEvent.is_closed(month):
+        raise ValueError(f"Payroll for {month.strftime('%B %Y')} must be closed before payout files are generated.")
+
+    known_ifsc = load_ifsc_codes(settings.PAYOUT_IFSC_FILE) if settings.PAYOUT_IFSC_FILE else None
+    narration = f"{settings.PAYOUT_NARRATION} {month:%b %Y}".upper()
+    writers = {}
+    rejected = []
+    payees = PayrollSnapshot.objects.active().filter(month=month).values_list(
+        'employee_id', 'employee__account_type', 'employee__account_number', 'employee__account_name',
+        'employee__ifsc_code', 'net_fee_earned',
+    ).order_by('employee_id')
+    total = payees.count() if progress else None
+    for done, (employee_id, account_type, account_number, name, ifsc, amount) in enumerate(
+            payees.iterator(chunk_size=ITERATOR_CHUNK_SIZE), 1):
+        account_number = (account_number or '').replace(' ', '')
+        ifsc = (ifsc or '').strip().upper()
+        problem = payee_problem(account_type, account_number, name, ifsc, amount, known_ifsc)
+        if problem:
+            rejected.append({"employee_id": employee_id, "reason": problem})
+        else:
+            if account_type not in writers:
+                writers[account_type] = PayoutWriter(account_type, FILE_FORMATS.get(account_type, 'csv'), month)
+            writers[account_type].add(employee_id, name, account_number, ifsc, amount, narration)
+        if progress and done % ITERATOR_CHUNK_SIZE == 0:
+            progress(done, total)
+
+    folder = f"payout_files/{month:%Y-%m}"
+    files = []
+    for account_type, writer in sorted(writers.items()):
+        extension = 'csv' if writer.format == 'csv' else 'txt'
+        with writer.finish() as f:
+            name = default_storage.save(f"{folder}/payout_{account_type}_{month:%Y-%m}.{extension}", File(f))
+        files.append({
+            "account_type": account_type, "format": writer.format, "name": name, "rows": writer.rows,
+            "total": writer.total, "account_hash_total": writer.account_hash, "sha256": writer.sha256.hexdigest(),
+        })
+    manifest = {
+        "month": month.strftime('%Y-%m'),
+        "files": files,
+        "rows": sum(f["rows"] for f in files),
+        "total": sum(f["total"] for f in files),
+        "rejected": rejected,
+    }
+    default_storage.save(
+        f"{folder}/manifest_{month:%Y-%m}.json", ContentFile(json.dumps(manifest, indent=2).encode())
+    )
+    payroll_logger.info(
+        f"Payout files for {month:%Y-%m}: {manifest['rows']} payees, total {manifest['total']}, "
+        f"{len(rejected)} rejected"
+    )
+    return manifest
@@ -0,0 +1,171 @@
+# payroll/payslip_canvas.py
+"""
+The payslip drawn straight onto a ReportLab canvas.
+
+The platypus payslip in payroll.utils is a fixed one-page layout, so its
+table geometry never changes: this module draws the same text, rules and
+logo at the coordinates the platypus layout produces, skipping the
+Paragraph/Table wrap and split passes that dominate its render time.
+Values are drawn on one line; unlike Paragraph cells they do not wrap.
+Select it with PAYSLIP_RENDERER = 'canvas'.
+"""
+import io
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from .logo import LOGO_SIZE, logo_jpeg
+
+REGULAR = 'Helvetica'
+BOLD = 'Helvetica-Bold'
+COMPANY_ADDRESS = 'F1, Ashwamedha, No 121, Velachery Main Road, Chennai – 600032,'
+COMPANY_CONTACT = 'Phone: 9840694738 Email: contact@jivass.com'
+
+# Bottom-left corners of the four tables, as laid out by SimpleDocTemplate
+# (30pt margins, 6pt frame padding, 500pt wide tables centred on A4)
+LEFT = (A4[0] - 500) / 2
+TOP = A4[1] - 36
+HEADER_Y = TOP - 64
+INFO_Y = HEADER_Y - 116
+FEE_Y = INFO_Y - 15 - 155
+LEAVE_Y = FEE_Y - 15 - 84 + 3
+
+
+class PayslipCanvas(canvas.Canvas):
+    """Canvas that remembers its current font, so runs of text in one font set it once."""
+
+    def setFont(self, psfontname, size, leading=None):
+        super().setFont(psfontname, size, leading)
+        self.current_font = (psfontname, size)
+
+
+def _text(c, x, y, text, font=REGULAR, size=9, align='left'):
+    if getattr(c, 'current_font', None) != (font, size):
+        c.setFont(font, size)
+    if align == 'center':
+        c.drawCentredString(x, y, text)
+    elif align == 'right':
+        c.drawRightString(x, y, text)
+    else:
+        c.drawString(x, y, text)
+
+
+def _lines(c, width, color, segments, x0, y0):
+    c.setLineWidth(width)
+    c.setStrokeColor(color)
+    c.lines([(x0 + x1, y0 + y1, x0 + x2, y0 + y2) for x1, y1, x2, y2 in segments])
+
+
+def _box(c, x, y, width, height):
+    c.setLineWidth(1)
+    c.setStrokeColor(colors.black)
+    c.rect(x, y, width, height)
+
+
+def _header(c, payroll):
+    x, y = LEFT, HEADER_Y
+    # the downsampled JPEG is embedded as is, without re-encoding
+    c.drawImage(ImageReader(io.BytesIO(logo_jpeg())), x + 6, y + 64 - 5 - LOGO_SIZE, width=LOGO_SIZE, height=LOGO_SIZE)
+    _text(c, x + 200, y + 40, 'Jivass Technologies', BOLD, 14, 'center')
+    _text(c, x + 200, y + 26, COMPANY_ADDRESS, BOLD, 8, 'center')
+    _text(c, x + 200, y + 14, COMPANY_CONTACT, BOLD, 8, 'center')
+    _text(c, x + 430, y + 36, 'Consultant Pay Slip', BOLD, 12, 'center')
+    _text(c, x + 430, y + 20, payroll.month.strftime('%B %Y'), BOLD, 12, 'center')
+    _box(c, x, y, 360, 64)
+    _box(c, x + 360, y, 140, 64)
+
+
+def _employee_info(c, employee):
+    x, y = LEFT, INFO_Y
+    rows = [
+        ('Consultant ID:', str(employee.id), BOLD),
+        ('Name:', employee.name or '', REGULAR),
+        ('Designation:', employee.designation or "N/A", REGULAR),
+        ('PAN:', employee.pan_no or "N/A", REGULAR),
+        ('Mobile:', employee.phone_no or "N/A", REGULAR),
+        ('Email:', employee.email or "N/A", REGULAR),
+    ]
+    for (label, value, font), baseline in zip(rows, (103, 84, 65, 46, 27, 8)):
+        _text(c, x + 5, y + baseline, label, BOLD)
+        _text(c, x + 93, y + baseline, value, font)
+    _text(c, x + 307, y + 103, 'Date of Joining:', BOLD)
+    _text(c, x + 380, y + 103, employee.date_joined.strftime('%d/%m/%Y'), BOLD)
+    _lines(c, 0.35, colors.lightgrey, [(0, h, 500, h) for h in (97, 78, 59, 40, 21)], x, y)
+    _box(c, x, y, 500, 116)
+
+
+def _fee_details(c, payroll, leave):
+    x, y = LEFT, FEE_Y
+    _text(c, x + 250, y + 141, 'Consultant Fee Details', BOLD, 10, 'center')
+    _text(c, x + 460, y + 123, 'Total', BOLD, 9, 'center')
+
+    month_label = 'Month : '
+    _text(c, x + 5, y + 104, month_label)
+    _text(c, x + 5 + stringWidth(month_label, REGULAR, 9), y + 104, payroll.month.strftime("%B"), BOLD)
+    rows = [
+        (104, None, 'Base Pay Earned :', payroll.base_pay_earned),
+        (85, f'Working Days : {leave.working_days}', 'Variable Pay Earned :', payroll.perform_comp_payable),
+        (66, f'Days Worked : {leave.days_worked}', 'Fee Earned :', payroll.fee_earned),
+        (47, f'Absent Days : {leave.absent_days}', 'Reimbursement :', payroll.reimbursement),
+    ]
+    for baseline, left, label, value in rows:
+        if left is not None:
+            _text(c, x + 5, y + baseline, left)
+        _text(c, x + 125, y + baseline, label)
+        _text(c, x + 275, y + baseline, f"{value:,.2f}", align='right')
+
+    _text(c, x + 285, y + 66, 'TDS Deducted :')
+    _text(c, x + 415, y + 66, f"{payroll.tds:,.2f}", align='right')
+    _text(c, x + 495, y + 66, f"{(payroll.fee_earned - payroll.tds):,.2f}", align='right')
+    _text(c, x + 495, y + 47, f"{payroll.reimbursement:,.2f}", align='right')
+
+    _text(c, x + 60, y + 28, 'Total', BOLD, 9, 'center')
+    _text(c, x + 275, y + 28, f"{(payroll.fee_earned + payroll.reimbursement):,.2f}", align='right')
+    _text(c, x + 415, y + 28, f"{payroll.tds:,.2f}", align='right')
+    _text(c, x + 495, y + 28, f"{(payroll.fee_earned - payroll.tds + payroll.reimbursement):,.2f}", align='right')
+
+    _text(c, x + 60, y + 7, 'Net Fee Earned :', BOLD, 10, 'center')
+    _text(c, x + 125, y + 7, f"{payroll.net_fee_earned}", BOLD, 10)
+    generated = f"Generated On : {payroll.generated_on.strftime('%d/%m/%Y')},{payroll.generated_time.strftime('%H:%M:%S')}"
+    _text(c, x + 392.5, y + 8, generated, align='center')
+
+    _lines(c, 0.35, colors.lightgrey, [(0, h, 500, h) for h in (98, 79, 60)], x, y)
+    _lines(c, 0.75, colors.black, [(v, 22, v, 136) for v in (120, 280, 420)], x, y)
+    _lines(c, 0.75, colors.black, [(0, h, 500, h) for h in (117, 41, 22)], x, y)
+    _lines(c, 1, colors.black, [(0, 136, 500, 136)], x, y)
+    _box(c, x, y, 500, 155)
+
+
+def _leave_details(c, leave):
+    x, y = LEFT, LEAVE_Y
+    centres = (42.5, 127.5, 212.5, 307.5)
+    _text(c, x + 180, y + 64, 'Leave Details', BOLD, 10, 'center')
+    headers = ('Paid Leaves', 'Sick Leaves', 'Unpaid Leaves', 'Total leaves Taken')
+    values = (leave.paid_leaves, leave.sick_leaves, leave.unpaid_leaves, leave.total_leaves_taken)
+    for centre, header, value in zip(centres, headers, values):
+        _text(c, x + centre, y + 46, header, BOLD, 9, 'center')
+        _text(c, x + centre, y + 27, str(value), align='center')
+    _text(c, x + 85, y + 8, f"Leave Balance : {leave.total_paid_leaves_left} Days", BOLD, 9, 'center')
+    _text(c, x + 265, y + 8, f"Sick Leave Balance : {leave.total_sick_leaves_left} Days", BOLD, 9, 'center')
+
+    _lines(c, 0.5, colors.black, [(0, 40, 360, 40), (0, 21, 360, 21), (170, 0, 170, 59)]
+           + [(v, 21, v, 59) for v in (85, 255)], x, y)
+    _lines(c, 1, colors.black, [(0, 59, 360, 59)], x, y)
+    _box(c, x, y, 360, 78)
+
+
+def render_payslip_canvas(payroll, leave):
+    """The payslip PDF of render_payslip_pdf, drawn at fixed coordinates; a BytesIO at offset 0."""
+    buffer = io.BytesIO()
+    c = PayslipCanvas(buffer, pagesize=A4, pageCompression=1)
+    _header(c, payroll)
+    _employee_info(c, payroll.employee)
+    _fee_details(c, payroll, leave)
+    _leave_details(c, leave)
+    c.showPage()
+    c.save()
+    buffer.seek(0)
+    return buffer
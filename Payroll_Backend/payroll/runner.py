@@ -0,0 +1,128 @@
+# payroll/runner.py
+"""
+Month-wide payroll run split into employee id ranges.
+
+Partitions run in worker processes, each with its own database connection,
+and every (employee, month) is computed under the advisory lock from
+payroll.utils.acquire_payroll_lock, so overlapping runs and the generate
+endpoint wait for (or skip) each other instead of computing a row twice.
+They also hold the month lock shared, so closing the month waits for them.
+Each employee goes through the same LeaveDetails.save and Payroll.save as
+a serial run, so the stored rows do not depend on the worker count.
+"""
+import calendar
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.db import transaction
+
+from employee.models import Employee
+from leavedetails.models import LeaveDetails, MonthClosedError, NoAttendanceRecordsError
+from payroll_management_system.metrics import PAYROLL_GENERATED
+from . import partition_worker
+from .models import Payroll, PayrollMonthEvent
+from .utils import acquire_month_lock, acquire_payroll_lock
+
+
+def month_employees(month):
+    """Employees who joined by the end of `month`, ordered by id."""
+    month_end = month.replace(day=calendar.monthrange(month.year, month.month)[1])
+    return Employee.objects.filter(date_joined__lte=month_end).order_by('id')
+
+
+def plan_partitions(month, partitions):
+    """
+    Splits the month's employee ids into up to `partitions` contiguous,
+    roughly equal (first_id, last_id) ranges.
+    """
+    ids = list(month_employees(month).values_list('id', flat=True))
+    if not ids:
+        return []
+    partitions = max(1, min(partitions, len(ids)))
+    size, extra = divmod(len(ids), partitions)
+    ranges, start = [], 0
+    for n in range(partitions):
+        end = start + size + (1 if n < extra else 0)
+        ranges.append((ids[start], ids[end - 1]))
+        start = end
+    return ranges
+
+
+def run_employee_payroll(employee, month, default_category='NA', wait=True):
+    """
+    Recomputes one employee's LeaveDetails and Payroll for `month`, keeping an
+    existing payroll's performance category and reimbursement. Returns
+    'generated', 'locked' (wait=False and another run holds the row) or
+    'no_attendance'.
+    """
+    try:
+        with transaction.atomic():
+            if not acquire_month_lock(month, shared=True, wait=wait):
+                return 'locked'
+            if not acquire_payroll_lock(employee.id, month, wait=wait):
+                return 'locked'
+            leave_record, leave_created = LeaveDetails.objects.get_or_create(employee=employee, month=month)
+            if not leave_created:
+                leave_record.save()
+            payroll, created = Payroll.objects.get_or_create(
+                employee=employee, month=month, defaults={'perform_category': default_category}
+            )
+            if not created:
+                payroll.save()
+    except NoAttendanceRecordsError:
+        return 'no_attendance'
+    PAYROLL_GENERATED.inc(action='created' if created else 'updated')
+    return 'generated'
+
+
+def run_partition(month, first_id, last_id, default_category='NA', wait=True):
+    """Runs every employee in [first_id, last_id]; returns counts and timing."""
+    started = time.perf_counter()
+    result = {
+        "first_id": first_id, "last_id": last_id,
+        "generated": 0, "locked": 0, "no_attendance": 0, "failed": [],
+    }
+    for employee in month_employees(month).filter(id__gte=first_id, id__lte=last_id):
+        try:
+            outcome = run_employee_payroll(employee, month, default_category, wait)
+        except Exception as e:
+            result["failed"].append({"employee_id": employee.id, "error": str(e)})
+            continue
+        result[outcome] += 1
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def run_payroll_partitioned(month, workers=1, partitions=None, default_category='NA', wait=True, progress=None):
+    """
+    Runs the month's payroll over id-range partitions; with workers > 1 the
+    partitions are spread over that many spawned processes. Returns the
+    per-partition results in id order. progress(result) is called as each
+    partition finishes. Raises MonthClosedError for a closed month.
+    """
+    month = month.replace(day=1)
+    if PayrollMonthEvent.is_closed(month):
+        raise MonthClosedError(f"Payroll for {month.strftime('%B %Y')} is closed; reopen the month to run it.")
+    ranges = plan_partitions(month, partitions or workers)
+    if workers <= 1:
+        results = []
+        for first_id, last_id in ranges:
+            results.append(run_partition(month, first_id, last_id, default_category, wait))
+            if progress:
+                progress(results[-1])
+        return results
+
+    # spawned, not forked: a forked child would share the parent's DB socket
+    context = multiprocessing.get_context('spawn')
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=partition_worker.init_worker) as pool:
+        futures = [
+            pool.submit(partition_worker.run_partition, month, first_id, last_id, default_category, wait)
+            for first_id, last_id in ranges
+        ]
+        for future in as_completed(futures):
+            results.append(future.result())
+            if progress:
+                progress(results[-1])
+    return sorted(results, key=lambda r: r["first_id"])
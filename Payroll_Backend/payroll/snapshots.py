@@ -0,0 +1,160 @@
+# payroll/snapshots.py
+"""
+Closing and reopening payroll months.
+
+Closing freezes every Payroll row of the month, with its LeaveDetails and
+the payslip PDF rendered from them, into PayrollSnapshot rows. While a
+month is closed LeaveDetails.save and Payroll.save refuse to recompute it,
+and payslips are served from the snapshots, so later fee or attendance
+changes cannot alter what was paid.
+"""
+import hashlib
+import logging
+
+from django.core.files.base import ContentFile
+from django.db import models, transaction
+
+from leavedetails.models import LeaveDetails
+from .models import Payroll, PayrollMonthEvent, PayrollSnapshot
+from .utils import acquire_month_lock, render_payslip_pdf
+
+payroll_logger = logging.getLogger('payroll_operations')
+
+def _field_values(instance):
+    values = {}
+    for field in instance._meta.concrete_fields:
+        value = getattr(instance, field.attname)
+        if isinstance(field, models.FileField):
+            value = value.name or None
+        values[field.attname] = value
+    return values
+
+
+def _month_rows(month):
+    """[(payroll, leave)] of the month by employee; ValueError when there is no payroll or a leave row is missing."""
+    payrolls = list(Payroll.objects.filter(month=month).select_related('employee').order_by('employee_id'))
+    if not payrolls:
+        raise ValueError(f"There is no payroll for {month.strftime('%B %Y')} to close.")
+    leaves = {leave.employee_id: leave for leave in LeaveDetails.objects.filter(month=month)}
+    missing = [p.employee_id for p in payrolls if p.employee_id not in leaves]
+    if missing:
+        raise ValueError(f"Leave details are missing for: {', '.join(missing)}")
+    return [(payroll, leaves[payroll.employee_id]) for payroll in payrolls]
+
+
+def _render_payslips(rows, progress=None):
+    """{employee_id: ((payroll values, leave values), pdf bytes)}; ValueError naming every payslip that failed."""
+    rendered, failed = {}, []
+    for done, (payroll, leave) in enumerate(rows, 1):
+        try:
+            pdf = render_payslip_pdf(payroll, leave).getvalue()
+        except Exception as e:
+            failed.append(f"{payroll.employee_id} ({e})")
+        else:
+            rendered[payroll.employee_id] = ((_field_values(payroll), _field_values(leave)), pdf)
+        if progress:
+            progress(done, len(rows))
+    if failed:
+        raise ValueError(f"Payslips could not be rendered for: {', '.join(failed)}")
+    return rendered
+
+
+def close_payroll_month(month, user=None, reason='', progress=None):
+    """
+    Snapshots the month's payroll and marks it closed. Returns the close
+    event. Raises ValueError when the month is already closed, has no payroll,
+    a payroll row has no LeaveDetails or a payslip fails to render.
+    progress(done, total) is called after each payslip.
+
+    The payslips are rendered first, without locks or a transaction. Only
+    the snapshot itself runs under the exclusive month lock: it re-reads the
+    month, re-renders the few rows recomputed in the meantime, then writes
+    the files and inserts the snapshots, so payroll runs wait for that part
+    only.
+    """
+    month = month.replace(day=1)
+    if PayrollMonthEvent.is_closed(month):
+        raise ValueError(f"Payroll for {month.strftime('%B %Y')} is already closed.")
+    rendered = _render_payslips(_month_rows(month), progress)
+
+    saved = []
+    try:
+        with transaction.atomic():
+            # serialises concurrent close/reopen calls for the same month and
+            # waits for payroll runs already recomputing it
+            acquire_month_lock(month)
+            if PayrollMonthEvent.is_closed(month):
+                raise ValueError(f"Payroll for {month.strftime('%B %Y')} is already closed.")
+
+            rows = _month_rows(month)
+            stale = [
+                (payroll, leave) for payroll, leave in rows
+                if payroll.employee_id not in rendered
+                or rendered[payroll.employee_id][0] != (_field_values(payroll), _field_values(leave))
+            ]
+            rendered.update(_render_payslips(stale))
+
+            event = PayrollMonthEvent.objects.create(
+                month=month, action='close', performed_by=user, reason=reason, snapshot_count=len(rows),
+            )
+            snapshots = []
+            for payroll, leave in rows:
+                pdf = rendered[payroll.employee_id][1]
+                snapshot = PayrollSnapshot(
+                    event=event, employee=payroll.employee, month=month,
+                    payroll=_field_values(payroll), leave_details=_field_values(leave),
+                    net_fee_earned=payroll.net_fee_earned, payslip_sha256=hashlib.sha256(pdf).hexdigest(),
+                )
+                snapshot.payslip.save(
+                    f"payslip_{payroll.employee_id}_{month:%Y-%m}_close-{event.id}.pdf", ContentFile(pdf), save=False
+                )
+                saved.append(snapshot.payslip.name)
+                snapshots.append(snapshot)
+            PayrollSnapshot.objects.bulk_create(snapshots, batch_size=500)
+    except Exception:
+        # the snapshots were rolled back; do not leave their files behind
+        for name in saved:
+            PayrollSnapshot.payslip.field.storage.delete(name)
+        raise
+
+    payroll_logger.info(
+        f"Payroll month {month:%Y-%m} CLOSED by {user.id if user else 'system'}: "
+        f"{len(rows)} payroll rows snapshotted"
+        + (f" ({len(stale)} re-rendered after changing during the close)" if stale else "")
+        + f". Reason: {reason or '-'}"
+    )
+    return event
+
+
+def reopen_payroll_month(month, user=None, reason=''):
+    """
+    Reopens a closed month so its payroll can be recomputed. A reason is
+    required; the snapshots stay as the record of the earlier close.
+    """
+    month = month.replace(day=1)
+    if not reason:
+        raise ValueError("A reason is required to reopen a payroll month.")
+    with transaction.atomic():
+        acquire_month_lock(month)
+        if not PayrollMonthEvent.is_closed(month):
+            raise ValueError(f"Payroll for {month.strftime('%B %Y')} is not closed.")
+        event = PayrollMonthEvent.objects.create(month=month, action='reopen', performed_by=user, reason=reason)
+
+    payroll_logger.warning(
+        f"Payroll month {month:%Y-%m} REOPENED by {user.id if user else 'system'}. Reason: {reason}"
+    )
+    return event
+
+
+def active_snapshot(employee_id, month):
+    """The snapshot serving this employee's payslip for a closed month, or None."""
+    return PayrollSnapshot.objects.active().filter(employee_id=employee_id, month=month.replace(day=1)).first()
+
+
+def read_snapshot_payslip(snapshot):
+    """The frozen payslip PDF bytes; raises ValueError if the file no longer matches its hash."""
+    with snapshot.payslip.open('rb') as f:
+        pdf = f.read()
+    if hashlib.sha256(pdf).hexdigest() != snapshot.payslip_sha256:
+        raise ValueError(f"Payslip file of {snapshot} does not match its recorded hash.")
+    return pdf
@@ -0,0 +1,226 @@
+# payroll/statements.py
+"""
+Year-end earnings statements: one PDF per employee summarising their
+payroll months of an April-March financial year.
+
+The year's payroll rows are loaded in one query (payroll.ytd.ytd_payslips,
+so closed months show their snapshot figures) and rendered in batches,
+across spawned worker processes when workers > 1. Rendering needs no
+database, so workers receive plain dicts; this process saves each finished
+batch to storage and to the YearEndStatement index straight away, and a
+later run skips everyone already indexed.
+"""
+import hashlib
+import io
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from django.core.files.base import ContentFile
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from employee.models import Employee
+from . import partition_worker
+from .logo import LOGO_SIZE, logo_jpeg
+from .models import YearEndStatement, financial_year_bounds
+from .ytd import ytd_payslips
+
+payroll_logger = logging.getLogger('payroll_operations')
+
+EMPLOYEE_FIELDS = ('id', 'name', 'designation', 'pan_no', 'date_joined')
+
+
+def year_end_data(year, force=False):
+    """
+    [(employee dict, [month dicts])] of everyone with payroll in financial
+    year `year`, by employee id; without `force`, only those who have no
+    indexed statement for the year yet. Two queries.
+    """
+    start, end = financial_year_bounds(year)
+    employees = Employee.objects.filter(payrolls__month__gte=start, payrolls__month__lt=end).distinct()
+    if not force:
+        employees = employees.exclude(year_end_statements__financial_year=year)
+
+    months = {}
+    for row in ytd_payslips(year=year, employees=employees.values('id')):
+        months.setdefault(row['employee_id'], []).append(row)
+    details = Employee.objects.filter(id__in=list(months)).values(*EMPLOYEE_FIELDS)
+    return [
+        (employee, sorted(months[employee['id']], key=lambda row: row['month']))
+        for employee in sorted(details, key=lambda e: e['id'])
+    ]
+
+
+def statement_totals(months):
+    return {
+        'months': len(months),
+        'fee_earned': sum(row['fee_earned'] for row in months),
+        'tds': sum(row['tds'] for row in months),
+        'reimbursement': sum(row['reimbursement'] for row in months),
+        'net_fee_earned': sum(row['net_fee_earned'] for row in months),
+    }
+
+
+def render_year_end_statement(year, employee, months):
+    """The statement PDF (bytes) for `employee` (dict of EMPLOYEE_FIELDS) and their month rows."""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, pageCompression=1, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
+
+    styles = getSampleStyleSheet()
+    normal = styles["Normal"]
+    bold = ParagraphStyle("Bold", parent=normal, fontName="Helvetica-Bold", fontSize=10)
+    centered = ParagraphStyle(name='Centered', parent=normal, leading=12, alignment=1)
+    title_style = ParagraphStyle(name='Title', parent=bold, alignment=1, fontSize=12, leading=16)
+    label_style = ParagraphStyle(name='Label', parent=bold, fontSize=9)
+    text_style = ParagraphStyle(name='Text', parent=normal, fontSize=9)
+    header_style = ParagraphStyle(name='Header', parent=bold, fontSize=9, alignment=1)
+    value_style = ParagraphStyle(name='Value', parent=normal, fontSize=9, alignment=2)
+    total_style = ParagraphStyle(name='Total', parent=bold, fontSize=9, alignment=2)
+
+    elements = []
+    company = [
+        Paragraph('<font size="14" face="Helvetica-Bold">Jivass Technologies</font>', centered),
+        Spacer(1, 8),
+        Paragraph(
+            '<font size="8" face="Helvetica-Bold">F1, Ashwamedha, No 121, Velachery Main Road, Chennai – 600032,<br/>'
+            'Phone: 9840694738 Email: contact@jivass.com</font>',
+            centered,
+        ),
+    ]
+    header_table = Table([[
+        Image(io.BytesIO(logo_jpeg()), width=LOGO_SIZE, height=LOGO_SIZE),
+        company,
+        Paragraph(f"<b>Year-End Earnings Statement</b><br/> FY {year}-{(year + 1) % 100:02d}", title_style),
+    ]], colWidths=[40, 320, 140])
+    header_table.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('BOX', (0, 0), (1, 0), 1, colors.black),
+        ('BOX', (2, 0), (2, 0), 1, colors.black),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+    ]))
+    elements.append(header_table)
+
+    info_table = Table([
+        [Paragraph('Consultant ID:', label_style), Paragraph(str(employee['id']), label_style),
+         Paragraph('Date of Joining:', label_style), Paragraph(employee['date_joined'].strftime('%d/%m/%Y'), label_style)],
+        [Paragraph('Name:', label_style), Paragraph(employee['name'] or "N/A", text_style), '', ''],
+        [Paragraph('Designation:', label_style), Paragraph(employee['designation'] or "N/A", text_style), '', ''],
+        [Paragraph('PAN:', label_style), Paragraph(employee['pan_no'] or "N/A", text_style), '', ''],
+    ], colWidths=[88, 214, 78, 120])
+    info_table.setStyle(TableStyle([
+        ('BOX', (0, 0), (-1, -1), 1, colors.black),
+        ('LINEBELOW', (0, 0), (-1, 2), 0.35, colors.lightgrey),
+        ('SPAN', (1, 1), (-1, 1)),
+        ('SPAN', (1, 2), (-1, 2)),
+        ('SPAN', (1, 3), (-1, 3)),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+    elements.append(info_table)
+    elements.append(Spacer(1, 15))
+
+    totals = statement_totals(months)
+    rows = [[Paragraph(label, header_style) for label in
+             ('Month', 'Fee Earned', 'TDS Deducted', 'Reimbursement', 'Net Fee Earned')]]
+    for row in months:
+        rows.append([
+            Paragraph(row['month'].strftime('%B %Y'), text_style),
+            Paragraph(f"{row['fee_earned']:,.2f}", value_style),
+            Paragraph(f"{row['tds']:,.2f}", value_style),
+            Paragraph(f"{row['reimbursement']:,.2f}", value_style),
+            Paragraph(f"{row['net_fee_earned']:,}", value_style),
+        ])
+    rows.append([
+        Paragraph('Total', label_style),
+        Paragraph(f"{totals['fee_earned']:,.2f}", total_style),
+        Paragraph(f"{totals['tds']:,.2f}", total_style),
+        Paragraph(f"{totals['reimbursement']:,.2f}", total_style),
+        Paragraph(f"{totals['net_fee_earned']:,}", total_style),
+    ])
+    months_table = Table(rows, colWidths=[120, 95, 95, 95, 95], repeatRows=1)
+    months_table.setStyle(TableStyle([
+        ('BOX', (0, 0), (-1, -1), 1, colors.black),
+        ('GRID', (0, 0), (-1, -1), 0.35, colors.lightgrey),
+        ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
+        ('LINEABOVE', (0, -1), (-1, -1), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+    elements.append(months_table)
+    elements.append(Spacer(1, 10))
+    elements.append(Paragraph(f"Generated On : {datetime.now().strftime('%d/%m/%Y,%H:%M:%S')}", text_style))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def render_batch(year, batch):
+    """[(employee_id, pdf bytes or None, error or None)] for a batch of (employee, months)."""
+    results = []
+    for employee, months in batch:
+        try:
+            results.append((employee['id'], render_year_end_statement(year, employee, months), None))
+        except Exception as e:
+            results.append((employee['id'], None, str(e)))
+    return results
+
+
+def save_statement(year, employee_id, pdf, months):
+    """Stores the PDF and indexes it, replacing an earlier statement of the year."""
+    existing = YearEndStatement.objects.filter(employee_id=employee_id, financial_year=year).first()
+    statement = existing or YearEndStatement(employee_id=employee_id, financial_year=year)
+    if existing is not None and existing.pdf:
+        existing.pdf.delete(save=False)
+    for field, value in statement_totals(months).items():
+        setattr(statement, field, value)
+    statement.pdf_sha256 = hashlib.sha256(pdf).hexdigest()
+    statement.pdf.save(f"statement_{employee_id}_FY{year}.pdf", ContentFile(pdf), save=False)
+    statement.save()
+    return statement
+
+
+def run_year_end_statements(year, workers=1, force=False, batch_size=25, progress=None):
+    """
+    Renders and indexes the year-end statements of financial year `year`;
+    without `force` employees already indexed are skipped. Batches of
+    `batch_size` employees are spread over `workers` spawned processes.
+    progress(done, total) is called as batches are saved. Returns a summary.
+    """
+    started = time.perf_counter()
+    skipped = 0 if force else YearEndStatement.objects.filter(financial_year=year).count()
+    data = year_end_data(year, force=force)
+    months_by_employee = {employee['id']: months for employee, months in data}
+    batches = [data[i:i + batch_size] for i in range(0, len(data), batch_size)]
+    summary = {"financial_year": year, "rendered": 0, "skipped": skipped, "failed": []}
+
+    def save(results):
+        for employee_id, pdf, error in results:
+            if error is not None:
+                summary["failed"].append({"employee_id": employee_id, "error": error})
+                continue
+            save_statement(year, employee_id, pdf, months_by_employee[employee_id])
+            summary["rendered"] += 1
+        if progress:
+            progress(summary["rendered"] + len(summary["failed"]), len(data))
+
+    if workers <= 1:
+        for batch in batches:
+            save(render_batch(year, batch))
+    else:
+        # spawned, not forked: a forked child would share the parent's DB socket
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=partition_worker.init_worker) as pool:
+            futures = [pool.submit(partition_worker.render_statements, year, batch) for batch in batches]
+            for future in as_completed(futures):
+                save(future.result())
+
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    payroll_logger.info(
+        f"Year-end statements FY {year}: {summary['rendered']} rendered, {summary['skipped']} already done, "
+        f"{len(summary['failed'])} failed in {summary['seconds']} s"
+    )
+    return summary
@@ -0,0 +1,74 @@
+# payroll/tds.py
+"""
+Quarterly TDS statements.
+
+The figures come from TdsQuarterSummary, which Payroll.save keeps current,
+grouped by PAN in the database: a year across 10k employees is at most
+40k summary rows instead of 120k payroll rows, and each report is a single
+GROUP BY query. Employees without a PAN are reported one by one under
+MISSING_PAN, the way the quarterly return expects them.
+"""
+from decimal import Decimal
+
+from django.db.models import Case, CharField, Count, F, Min, Q, Sum, Value, When
+from django.db.models.functions import Concat, Trim, Upper
+
+from .models import TdsQuarterSummary
+from .register import ITERATOR_CHUNK_SIZE
+from .utils import CENT
+
+MISSING_PAN = 'PANNOTAVBL'
+STATEMENT_HEADER = [
+    'Financial year', 'Quarter', 'PAN', 'Employee ID', 'Name', 'Employee records', 'Months',
+    'Amount paid', 'TDS deducted',
+]
+
+
+def _no_pan():
+    return Q(employee__pan_no__isnull=True) | Q(employee__pan_no='')
+
+
+def _pan_key():
+    # without a PAN each employee is a deductee of their own
+    return Case(
+        When(_no_pan(), then=Concat(Value(f'{MISSING_PAN}:'), F('employee_id'))),
+        default=Upper(Trim('employee__pan_no')),
+        output_field=CharField(),
+    )
+
+
+def tds_quarter_totals(year):
+    """Per quarter of financial year `year`: deductees, amount paid, TDS and employees without a PAN."""
+    rows = TdsQuarterSummary.objects.filter(financial_year=year).values('quarter').annotate(
+        employees=Count('employee_id'),
+        deductees=Count(_pan_key(), distinct=True),
+        missing_pan=Count('id', filter=_no_pan()),
+        amount_paid=Sum('amount_paid'),
+        tds=Sum('tds'),
+    ).order_by('quarter')
+    return list(rows)
+
+
+def tds_statement_rows(year, quarter=None):
+    """
+    Deductee rows (tuples in STATEMENT_HEADER order) for financial year
+    `year`, or one quarter of it, by quarter and PAN. Streamed with
+    .iterator(); an employee id and name stand for each PAN.
+    """
+    summaries = TdsQuarterSummary.objects.filter(financial_year=year)
+    if quarter is not None:
+        summaries = summaries.filter(quarter=quarter)
+    rows = summaries.annotate(pan_key=_pan_key()).values('quarter', 'pan_key').annotate(
+        first_employee=Min('employee_id'),
+        name=Min('employee__name'),
+        employees=Count('employee_id'),
+        month_count=Sum('months'),
+        paid=Sum('amount_paid'),
+        deducted=Sum('tds'),
+    ).order_by('quarter', 'pan_key')
+    for row in rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        pan = MISSING_PAN if row['pan_key'].startswith(f'{MISSING_PAN}:') else row['pan_key']
+        yield (
+            year, f"Q{row['quarter']}", pan, row['first_employee'], row['name'], row['employees'],
+            row['month_count'], Decimal(row['paid']).quantize(CENT), Decimal(row['deducted']).quantize(CENT),
+        )
@@ -1,3 +1,680 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import re
+import shutil
+import tempfile
+import zlib
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.db.models import ProtectedError
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from attendance.models import Attendance
+from employee.models import Employee
+from employee.utils import record_compensation_change
+from leavedetails.models import LeaveDetails, MonthClosedError
+from .models import Payroll, PayrollMonthEvent, PayrollSnapshot, PayrollYearTotals, TdsQuarterSummary, YearEndStatement
+from .payslip_canvas import render_payslip_canvas
+from .runner import plan_partitions, run_payroll_partitioned
+from .snapshots import close_payroll_month
+from .statements import run_year_end_statements
+from .utils import generate_payroll, recompute_arrears, render_payslip_pdf
+from .ytd import ytd_payslips
+
+
+class MonthlyEmployeesViewTests(TestCase):
+
+    def setUp(self):
+        self.admin = Employee.objects.create_user(
+            id='A00001', email='admin@example.com', password='pw', role='admin', date_joined=date(2020, 1, 1)
+        )
+        # joined in December of the previous year: must be listed for a March month
+        self.dec = Employee.objects.create_user(
+            id='E00001', email='dec@example.com', password='pw', date_joined=date(2024, 12, 10),
+            fee_per_month=Decimal('30000'),
+        )
+        self.late = Employee.objects.create_user(
+            id='E00002', email='late@example.com', password='pw', date_joined=date(2025, 3, 31)
+        )
+        Employee.objects.create_user(
+            id='E00003', email='future@example.com', password='pw', date_joined=date(2025, 4, 1)
+        )
+        Payroll.objects.bulk_create([Payroll(
+            employee=self.dec, month=date(2025, 3, 1), fee_per_month=Decimal('30000'), pay_structure='fixed',
+            perform_category='2', reimbursement=Decimal('500'),
+        )])
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_lists_employees_joined_by_month_end_with_their_payroll(self):
+        response = self.client.get('/api/payroll/monthly-employees/', {'month': '2025-03'})
+        self.assertEqual(response.status_code, 200)
+        employees = {row['id']: row for row in response.data['employees']}
+        self.assertEqual(set(employees), {'A00001', 'E00001', 'E00002'})
+        self.assertEqual(employees['E00001']['perform_category'], '2')
+        self.assertEqual(employees['E00001']['reimbursement'], 500.0)
+        self.assertEqual(employees['E00002']['perform_category'], '')
+        self.assertTrue(response.data['payroll_exists'])
+        self.assertEqual(len(response.data['payroll_data']), 1)
+        self.assertNotIn('count', response.data)
+
+    def test_pagination_is_opt_in(self):
+        response = self.client.get('/api/payroll/monthly-employees/', {'month': '2025-03', 'page': 2, 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([row['id'] for row in response.data['employees']], ['E00002'])
+        self.assertEqual(response.data['payroll_data'], [])
+        self.assertTrue(response.data['payroll_exists'])
+
+
+class PayrollPreviewTests(TestCase):
+
+    def setUp(self):
+        self.admin = Employee.objects.create_user(
+            id='A00001', email='admin@example.com', password='pw', role='admin', date_joined=date(2020, 1, 1)
+        )
+        self.employee = Employee.objects.create_user(
+            id='E00001', email='emp@example.com', password='pw', date_joined=date(2024, 1, 1),
+            fee_per_month=Decimal('30000'), pay_structure='variable',
+        )
+        statuses = ['Present'] * 30
+        statuses[4] = 'Paid Leave'      # Friday 5th
+        statuses[5] = statuses[6] = 'Holiday'
+        statuses[7] = 'UnPaid Leave'    # Monday 8th: the weekend is sandwiched
+        statuses[9] = 'Half Absent'
+        Attendance.objects.bulk_create([
+            Attendance(employee=self.employee, date=date(2025, 9, day + 1), status=status)
+            for day, status in enumerate(statuses)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_preview_matches_saved_payroll_and_writes_nothing(self):
+        response = self.client.get('/api/payroll/preview/', {'month': '2025-09', 'perform_category': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(LeaveDetails.objects.exists())
+        self.assertFalse(Payroll.objects.exists())
+        self.assertEqual([row['employee_id'] for row in response.data['skipped']], ['A00001'])
+        preview = response.data['employees'][0]
+
+        leave = LeaveDetails(employee=self.employee, month=date(2025, 9, 1))
+        leave.save()
+        payroll = Payroll(employee=self.employee, month=date(2025, 9, 1), perform_category='1')
+        payroll.save()
+        payroll.refresh_from_db()
+        self.assertEqual(leave.sandwich_unpaid_leaves, 2)
+        self.assertEqual(preview['net_fee_earned'], payroll.net_fee_earned)
+        self.assertEqual(preview['fee_earned'], str(payroll.fee_earned))
+        self.assertEqual(response.data['totals']['net_fee_earned'], payroll.net_fee_earned)
+
+    def test_single_dry_run_returns_generate_shape(self):
+        response = self.client.post('/api/payroll/generate/', {
+            'employee_id': 'E00001', 'month': '2025-09', 'perform_category': '2', 'dry_run': 'true',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['dry_run'])
+        self.assertEqual(response.data['payroll']['perform_category'], '2')
+        self.assertIsNone(response.data['payroll']['id'])
+        self.assertFalse(Payroll.objects.exists())
+
+        response = self.client.post('/api/payroll/generate/', {
+            'employee_id': 'E00001', 'month': '2025-10', 'perform_category': '2', 'dry_run': 'true',
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_preview_is_admin_only(self):
+        self.client.force_authenticate(self.employee)
+        response = self.client.get('/api/payroll/preview/', {'month': '2025-09'})
+        self.assertEqual(response.status_code, 403)
+
+
+class PayrollSimulationTests(TestCase):
+
+    def setUp(self):
+        self.admin = Employee.objects.create_user(
+            id='A00001', email='admin@example.com', password='pw', role='admin', date_joined=date(2020, 1, 1)
+        )
+        self.engineer = Employee.objects.create_user(
+            id='E00001', email='eng@example.com', password='pw', date_joined=date(2024, 1, 1),
+            fee_per_month=Decimal('40000'), pay_structure='variable', designation='Engineer',
+        )
+        self.analyst = Employee.objects.create_user(
+            id='E00002', email='analyst@example.com', password='pw', date_joined=date(2024, 1, 1),
+            fee_per_month=Decimal('30000'), pay_structure='fixed', designation='Analyst',
+        )
+        for emp in (self.engineer, self.analyst):
+            Attendance.objects.bulk_create([
+                Attendance(employee=emp, date=date(2025, 9, day), status='Absent' if day == 3 else 'Present')
+                for day in range(1, 31)
+            ])
+            LeaveDetails(employee=emp, month=date(2025, 9, 1)).save()
+            Payroll(employee=emp, month=date(2025, 9, 1), perform_category='2').save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def simulate(self, **scenario):
+        return self.client.post('/api/payroll/simulate/', {'month': '2025-09', **scenario}, format='json')
+
+    def test_empty_scenario_reproduces_stored_payroll(self):
+        response = self.simulate()
+        self.assertEqual(response.status_code, 200)
+        stored = sum(Payroll.objects.values_list('net_fee_earned', flat=True))
+        self.assertEqual(response.data['totals']['baseline']['net_fee_earned'], stored)
+        self.assertEqual(response.data['totals']['delta']['net_fee_earned'], 0)
+        self.assertFalse(any(row['delta'] for row in response.data['employees']))
+
+    def test_raise_multipliers_and_tds(self):
+        response = self.simulate(
+            designation_fee_changes={'Engineer': {'percent': 10}},
+            fee_changes={'E00002': {'amount': 3000}},
+            tds_rate='0', absent_penalty=0,
+        )
+        self.assertEqual(response.status_code, 200)
+        rows = {row['employee_id']: row for row in response.data['employees']}
+        self.assertEqual(rows['E00001']['scenario_fee_per_month'], '44000.00')
+        self.assertEqual(rows['E00002']['scenario_fee_per_month'], '33000.00')
+        # no TDS and no absence penalty: the fixed-pay analyst gets 29 of 30 days of the new fee
+        self.assertEqual(rows['E00002']['scenario_net_fee_earned'], 31900)
+
+        response = self.simulate(performance_distribution={'1': 1})
+        rows = {row['employee_id']: row for row in response.data['employees']}
+        self.assertGreater(rows['E00001']['delta'], 0)
+        self.assertEqual(rows['E00002']['delta'], 0)
+        self.assertEqual(Payroll.objects.get(employee=self.engineer).perform_category, '2')
+
+    def test_invalid_scenario(self):
+        self.assertEqual(self.simulate(multipliers={'9': 1}).status_code, 400)
+        self.assertEqual(self.simulate(tds_rate='abc').status_code, 400)
+        self.assertEqual(self.simulate(fee_changes={'E00001': {'bonus': 5}}).status_code, 400)
+        self.assertEqual(self.client.post(
+            '/api/payroll/simulate/', {'month': '2025-10'}, format='json').status_code, 404)
+
+
+class PartitionedPayrollRunTests(TestCase):
+
+    def setUp(self):
+        for n in range(1, 8):
+            emp = Employee.objects.create_user(
+                id=f'E0000{n}', email=f'e{n}@example.com', password='pw', date_joined=date(2024, 1, 1),
+                fee_per_month=Decimal(20000 + n * 1000), pay_structure='variable' if n % 2 else 'fixed',
+            )
+            if n == 7:
+                continue  # no attendance
+            Attendance.objects.bulk_create([
+                Attendance(employee=emp, date=date(2025, 9, day),
+                           status='Sick Leave' if day == n else 'Holiday' if day in (6, 7) else 'Present')
+                for day in range(1, 31)
+            ])
+
+    def test_partitions_cover_every_employee_once(self):
+        ranges = plan_partitions(date(2025, 9, 1), 3)
+        self.assertEqual(ranges, [('E00001', 'E00003'), ('E00004', 'E00005'), ('E00006', 'E00007')])
+        self.assertEqual(len(plan_partitions(date(2025, 9, 1), 50)), 7)
+
+    def test_partitioned_run_matches_generate_payroll(self):
+        generate_payroll('E00002', '2025-09', '1', Decimal('750'))
+        results = run_payroll_partitioned(date(2025, 9, 1), workers=1, partitions=3, default_category='2')
+        self.assertEqual(sum(r['generated'] for r in results), 6)
+        self.assertEqual(sum(r['no_attendance'] for r in results), 1)
+
+        fields = ('perform_category', 'reimbursement', 'fee_earned', 'tds', 'net_fee_earned')
+        partitioned = list(Payroll.objects.order_by('employee_id').values_list('employee_id', *fields))
+        # the existing payroll kept its category and reimbursement
+        self.assertEqual(partitioned[1][1:3], ('1', Decimal('750')))
+
+        Payroll.objects.all().delete()
+        LeaveDetails.objects.all().delete()
+        for employee_id, category, reimbursement, *_ in partitioned:
+            generate_payroll(employee_id, '2025-09', category, reimbursement)
+        serial = list(Payroll.objects.order_by('employee_id').values_list('employee_id', *fields))
+        self.assertEqual(partitioned, serial)
+
+
+class MonthCloseTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.admin = Employee.objects.create_user(
+            id='A00001', email='admin@example.com', password='pw', role='admin', date_joined=date(2020, 1, 1)
+        )
+        self.employee = Employee.objects.create_user(
+            id='E00001', email='emp@example.com', password='pw', name='Emp', date_joined=date(2024, 1, 1),
+            fee_per_month=Decimal('30000'),
+        )
+        Attendance.objects.bulk_create([
+            Attendance(employee=self.employee, date=date(2025, 9, day), status='Present') for day in range(1, 31)
+        ])
+        generate_payroll('E00001', '2025-09', '2', Decimal('0'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_close_freezes_payroll_until_reopened(self):
+        response = self.client.post('/api/payroll/months/2025-09/close/', {'reason': 'paid'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['snapshot_count'], 1)
+        snapshot = PayrollSnapshot.objects.active().get()
+        self.assertEqual(snapshot.net_fee_earned, 27000)
+
+        # recomputation is refused; later fee changes do not reach the month
+        self.employee.fee_per_month = Decimal('45000')
+        self.employee.save()
+        with self.assertRaises(MonthClosedError):
+            Payroll.objects.get().save()
+        response = self.client.post('/api/payroll/generate/', {
+            'employee_id': 'E00001', 'month': '2025-09', 'perform_category': '1',
+        })
+        self.assertEqual(response.status_code, 409)
+
+        # reads come from the snapshot even if the live row drifts
+        Payroll.objects.update(net_fee_earned=1)
+        self.client.force_authenticate(self.employee)
+        self.assertEqual(self.client.get('/api/payroll/my_payslips/').data[0]['net_fee_earned'], 27000)
+        response = self.client.get('/api/payroll/download_payslip/', {'employee_id': 'E00001', 'month': '2025-09'})
+        self.assertEqual(hashlib.sha256(b''.join(response.streaming_content)).hexdigest(), snapshot.payslip_sha256)
+
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.post('/api/payroll/months/2025-09/reopen/', {}, format='json').status_code, 400)
+        response = self.client.post('/api/payroll/months/2025-09/reopen/', {'reason': 'fee correction'}, format='json')
+        self.assertFalse(response.data['closed'])
+        generate_payroll('E00001', '2025-09', '2', Decimal('0'))
+        self.assertEqual(Payroll.objects.get().net_fee_earned, 40500)
+        self.assertIsNone(PayrollSnapshot.objects.active().first())
+
+        history = self.client.get('/api/payroll/months/2025-09/').data
+        self.assertEqual([e['action'] for e in history['events']], ['reopen', 'close'])
+
+    def test_tampered_frozen_payslip_is_reported(self):
+        close_payroll_month(date(2025, 9, 1), user=self.admin)
+        snapshot = PayrollSnapshot.objects.active().get()
+        with default_storage.open(snapshot.payslip.name, 'wb') as f:
+            f.write(b'%PDF-tampered')
+        for url in ('/api/payroll/download_payslip/', '/api/payroll/generate_payslip/'):
+            response = self.client.get(url, {'employee_id': 'E00001', 'month': '2025-09'})
+            self.assertEqual(response.status_code, 500)
+            self.assertIn('recorded hash', response.data['error'])
+
+    def test_closed_month_rows_cannot_be_deleted_or_edited(self):
+        close_payroll_month(date(2025, 9, 1), user=self.admin)
+        payroll, leave = Payroll.objects.get(), LeaveDetails.objects.get()
+
+        self.assertEqual(self.client.delete(f'/api/payroll/payroll/{payroll.id}/').status_code, 409)
+        self.assertEqual(self.client.delete(f'/api/leavedetails/leavedetails/{leave.id}/').status_code, 409)
+        response = self.client.patch(f'/api/leavedetails/leavedetails/{leave.id}/', {'paid_leaves': 1}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(Payroll.objects.exists())
+        self.assertTrue(LeaveDetails.objects.exists())
+        self.assertEqual(PayrollYearTotals.objects.get(employee=self.employee).months, 1)
+
+        # the snapshots themselves survive bulk deletes and updates, and their employee
+        with self.assertRaises(ValidationError):
+            PayrollSnapshot.objects.all().delete()
+        with self.assertRaises(ValidationError):
+            PayrollSnapshot.objects.update(net_fee_earned=0)
+        with self.assertRaises(ProtectedError):
+            self.employee.delete()
+        self.assertEqual(PayrollSnapshot.objects.get().net_fee_earned, 27000)
+
+    def test_close_renders_before_locking_and_catches_later_changes(self):
+        def recompute_during_render(done, total):
+            # a payroll run landing between the render and the snapshot
+            Payroll.objects.update(net_fee_earned=12345)
+
+        with mock.patch('payroll.snapshots.render_payslip_pdf', wraps=render_payslip_pdf) as renderer:
+            close_payroll_month(date(2025, 9, 1), user=self.admin, progress=recompute_during_render)
+        self.assertEqual(PayrollSnapshot.objects.get().net_fee_earned, 12345)
+        self.assertEqual(renderer.call_count, 2)
+        self.assertEqual(renderer.call_args.args[0].net_fee_earned, 12345)
+
+    def test_close_reports_every_failed_render_and_changes_nothing(self):
+        with mock.patch('payroll.snapshots.render_payslip_pdf', side_effect=TypeError('no name')):
+            with self.assertRaisesRegex(ValueError, r'E00001 \(no name\)'):
+                close_payroll_month(date(2025, 9, 1), user=self.admin)
+        self.assertFalse(PayrollMonthEvent.objects.exists())
+        self.assertFalse(PayrollSnapshot.objects.exists())
+
+    def test_close_twice_is_rejected(self):
+        self.client.post('/api/payroll/months/2025-09/close/', {}, format='json')
+        response = self.client.post('/api/payroll/months/2025-09/close/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class CompensationHistoryTests(TestCase):
+
+    def setUp(self):
+        self.admin = Employee.objects.create_user(
+            id='A00001', email='admin@example.com', password='pw', role='admin', date_joined=date(2020, 1, 1)
+        )
+        self.employee = Employee.objects.create_user(
+            id='E00001', email='emp@example.com', password='pw', name='Emp', date_joined=date(2025, 1, 1),
+            fee_per_month=Decimal('30000'),
+        )
+        for month in (7, 8, 9):
+            Attendance.objects.bulk_create([
+                Attendance(employee=self.employee, date=date(2025, month, day), status='Present') for day in range(1, 29)
+            ])
+            generate_payroll('E00001', f'2025-{month:02d}', '2', Decimal('0'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_backdated_raise_recomputes_affected_months_only(self):
+        response = self.client.post('/api/employee/employees/E00001/compensation/', {
+            'fee_per_month': '40000', 'pay_structure': 'fixed', 'effective_from': '2025-08-01',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([e['effective_from'] for e in response.data['history']], ['2025-08-01', '2025-01-01'])
+
+        summary = recompute_arrears('E00001', date(2025, 8, 1))
+        self.assertEqual([row['month'] for row in summary['recomputed']], ['2025-08', '2025-09'])
+        self.assertEqual(summary['total_delta'], Decimal('18000'))
+        nets = dict(Payroll.objects.values_list('month', 'net_fee_earned'))
+        self.assertEqual(nets[date(2025, 8, 1)], 36000)
+
+        # a later full recompute keeps July on the fee it was earned at
+        generate_payroll('E00001', '2025-07', '2', Decimal('0'))
+        self.assertEqual(Payroll.objects.get(month=date(2025, 7, 1)).net_fee_earned, 27000)
+
+    def test_closed_month_reports_arrears(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root):
+            close_payroll_month(date(2025, 8, 1), user=self.admin)
+            record_compensation_change(self.employee, Decimal('40000'), 'fixed', date(2025, 8, 1))
+            summary = recompute_arrears('E00001', date(2025, 8, 1))
+        self.assertEqual([row['month'] for row in summary['closed']], ['2025-08'])
+        self.assertEqual(summary['total_arrears'], Decimal('9000'))
+        self.assertEqual(Payroll.objects.get(month=date(2025, 8, 1)).net_fee_earned, 27000)
+
+    def test_bad_effective_date_leaves_fee_unchanged(self):
+        response = self.client.patch('/api/employee/employees/E00001/', {
+            'fee_per_month': '40000', 'compensation_effective_from': '2025-13-01',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.employee.refresh_from_db()
+        self.assertEqual(self.employee.fee_per_month, Decimal('30000'))
+        self.assertFalse(self.employee.compensation_history.exists())
+
+
+class YearToDateTests(TestCase):
+
+    def setUp(self):
+        self.admin = Employee.objects.create_user(
+            id='A00001', email='admin@example.com', password='pw', role='admin', date_joined=date(2020, 1, 1)
+        )
+        self.employee = Employee.objects.create_user(
+            id='E00001', email='emp@example.com', password='pw', name='Emp', date_joined=date(2024, 1, 1),
+            fee_per_month=Decimal('30000'),
+        )
+        # February and March 2025 close FY 2024; April opens FY 2025
+        for year, month in ((2025, 2), (2025, 3), (2025, 4)):
+            Attendance.objects.bulk_create([
+                Attendance(employee=self.employee, date=date(year, month, day), status='Present') for day in range(1, 29)
+            ])
+            generate_payroll('E00001', f'{year}-{month:02d}', '2', Decimal('500'))
+        self.client = APIClient()
+
+    def test_running_totals_reset_at_financial_year(self):
+        with self.assertNumQueries(1):
+            rows = ytd_payslips(employee_id='E00001')
+        self.assertEqual([(r['month'], r['financial_year']) for r in rows], [
+            (date(2025, 4, 1), 2025), (date(2025, 3, 1), 2024), (date(2025, 2, 1), 2024),
+        ])
+        self.assertEqual([r['ytd_net_fee_earned'] for r in rows], [27500, 55000, 27500])
+        self.assertEqual([r['ytd_tds'] for r in rows], [3000, 6000, 3000])
+
+        self.client.force_authenticate(self.employee)
+        response = self.client.get('/api/payroll/my_payslips/', {'financial_year': 2024})
+        self.assertEqual([r['month'] for r in response.data], ['2025-03', '2025-02'])
+        self.assertEqual(self.client.get('/api/payroll/ytd-totals/').status_code, 403)
+
+    def test_year_totals_follow_saves_and_deletes(self):
+        totals = PayrollYearTotals.objects.get(employee=self.employee, financial_year=2024)
+        self.assertEqual((totals.months, totals.net_fee_earned, totals.reimbursement), (2, 55000, 1000))
+
+        payroll = Payroll.objects.get(month=date(2025, 2, 1))
+        payroll.reimbursement = Decimal('0')
+        payroll.save()
+        totals.refresh_from_db()
+        self.assertEqual((totals.months, totals.net_fee_earned, totals.reimbursement), (2, 54500, 500))
+        quarter = TdsQuarterSummary.objects.get(employee=self.employee, financial_year=2024, quarter=4)
+        self.assertEqual((quarter.months, quarter.tds), (2, 6000))
+
+        Payroll.objects.get(month=date(2025, 3, 1)).delete()
+        totals.refresh_from_db()
+        self.assertEqual((totals.months, totals.net_fee_earned), (1, 27000))
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/payroll/ytd-totals/', {'financial_year': 2025})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['net_fee_earned'], 27500)
+
+
+class PayrollRegisterExportTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.admin = Employee.objects.create_user(
+            id='A00001', email='admin@example.com', password='pw', role='admin', date_joined=date(2020, 1, 1)
+        )
+        self.employee = Employee.objects.create_user(
+            id='E00001', email='emp@example.com', password='pw', name='Emp', date_joined=date(2024, 1, 1),
+            fee_per_month=Decimal('30000'),
+        )
+        for month in (8, 9):
+            Attendance.objects.bulk_create([
+                Attendance(employee=self.employee, date=date(2025, month, day), status='Present') for day in range(1, 29)
+            ])
+            generate_payroll('E00001', f'2025-{month:02d}', '2', Decimal('0'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _register(self, **params):
+        response = self.client.get('/api/payroll/register/', params)
+        self.assertEqual(response.status_code, 200)
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_csv_joins_leave_details_and_reads_closed_months_from_snapshots(self):
+        close_payroll_month(date(2025, 8, 1), user=self.admin)
+        Payroll.objects.filter(month=date(2025, 8, 1)).update(net_fee_earned=1)
+
+        rows = self._register(start='2025-08', end='2025-09')
+        header = rows[0]
+        self.assertEqual([r[header.index('Month')] for r in rows[1:]], ['2025-08', '2025-09'])
+        self.assertEqual([r[header.index('Net fee earned')] for r in rows[1:]], ['27000', '27000'])
+        days_worked = LeaveDetails.objects.get(month=date(2025, 9, 1)).days_worked
+        self.assertEqual(Decimal(rows[2][header.index('Days worked')]), days_worked)
+        self.assertEqual(rows[1][header.index('Fee per month')], '30000.00')
+
+    def test_rejects_bad_parameters(self):
+        self.assertEqual(self.client.get('/api/payroll/register/').status_code, 400)
+        response = self.client.get('/api/payroll/register/', {'month': '2025-09', 'file_type': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(self.employee)
+        self.assertEqual(self.client.get('/api/payroll/register/', {'month': '2025-09'}).status_code, 403)
+
+
+class PayoutFileTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root, PAYOUT_IFSC_FILE='')
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.admin = Employee.objects.create_user(
+            id='A00001', email='admin@example.com', password='pw', role='admin', date_joined=date(2020, 1, 1)
+        )
+        bank_details = {
+            'E00001': ('SBI', '12345678901', 'SBIN0001234'),
+            'E00002': ('NonSBI', '998877665544', 'HDFC0000123'),
+            'E00003': ('NonSBI', '55555555', 'HDFC123'),
+        }
+        for n, (employee_id, (account_type, number, ifsc)) in enumerate(bank_details.items(), 1):
+            employee = Employee.objects.create_user(
+                id=employee_id, email=f'e{n}@example.com', password='pw', name=f'Emp {n}',
+                date_joined=date(2024, 1, 1), fee_per_month=Decimal('30000'), account_type=account_type,
+                account_number=number, account_name=f'Emp {n}', ifsc_code=ifsc,
+            )
+            Attendance.objects.bulk_create([
+                Attendance(employee=employee, date=date(2025, 9, day), status='Present') for day in range(1, 31)
+            ])
+            generate_payroll(employee_id, '2025-09', '2', Decimal('0'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_open_month_is_refused(self):
+        response = self.client.post('/api/payroll/months/2025-09/payouts/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_files_per_account_type_with_totals(self):
+        close_payroll_month(date(2025, 9, 1), user=self.admin)
+        manifest = self.client.post('/api/payroll/months/2025-09/payouts/', {}, format='json').data
+
+        self.assertEqual(manifest['rejected'], [{'employee_id': 'E00003', 'reason': "invalid IFSC code 'HDFC123'"}])
+        self.assertEqual([(f['account_type'], f['rows'], f['total']) for f in manifest['files']],
+                         [('NonSBI', 1, 27000), ('SBI', 1, 27000)])
+        with default_storage.open(manifest['files'][1]['name'], 'rb') as f:
+            content = f.read()
+        self.assertEqual(hashlib.sha256(content).hexdigest(), manifest['files'][1]['sha256'])
+        header, detail, trailer = content.decode().splitlines()
+        self.assertTrue(all(len(line) == 100 for line in (header, detail, trailer)))
+        self.assertEqual(detail[1:18].strip(), '12345678901')
+        self.assertEqual(int(detail[18:33]), 2700000)
+        self.assertEqual(trailer[:28], 'T000000001' + '0' * 11 + '2700000')
+
+
+class TdsReportTests(TestCase):
+
+    def setUp(self):
+        self.admin = Employee.objects.create_user(
+            id='A00001', email='admin@example.com', password='pw', role='admin', date_joined=date(2020, 1, 1)
+        )
+        for n, pan in ((1, 'abcde1234f'), (2, '')):
+            employee = Employee.objects.create_user(
+                id=f'E0000{n}', email=f'e{n}@example.com', password='pw', name=f'Emp {n}',
+                date_joined=date(2024, 1, 1), fee_per_month=Decimal('30000'), pan_no=pan,
+            )
+            # June closes Q1, July opens Q2
+            for month in (6, 7):
+                Attendance.objects.bulk_create([
+                    Attendance(employee=employee, date=date(2025, month, day), status='Present') for day in range(1, 29)
+                ])
+                generate_payroll(employee.id, f'2025-{month:02d}', '2', Decimal('0'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_quarter_totals_and_statement(self):
+        response = self.client.get('/api/payroll/tds/', {'financial_year': 2025})
+        self.assertEqual(
+            [(q['quarter'], q['employees'], q['missing_pan'], q['tds']) for q in response.data['quarters']],
+            [(1, 2, 1, 6000), (2, 2, 1, 6000)],
+        )
+
+        response = self.client.get('/api/payroll/tds/statement/', {'financial_year': 2025, 'quarter': 2})
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([(r[2], r[3], r[8]) for r in rows[1:]], [
+            ('ABCDE1234F', 'E00001', '3000.00'), ('PANNOTAVBL', 'E00002', '3000.00'),
+        ])
+
+    def test_summary_follows_payroll_deletes(self):
+        Payroll.objects.get(employee_id='E00001', month=date(2025, 7, 1)).delete()
+        self.assertFalse(TdsQuarterSummary.objects.filter(employee_id='E00001', quarter=2).exists())
+        self.assertEqual(TdsQuarterSummary.objects.get(employee_id='E00001', quarter=1).tds, 3000)
+
+
+class YearEndStatementTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.employee = Employee.objects.create_user(
+            id='E00001', email='emp@example.com', password='pw', name='Emp', date_joined=date(2024, 1, 1),
+            fee_per_month=Decimal('30000'),
+        )
+        # March belongs to FY 2024, April and May to FY 2025
+        for month in (3, 4, 5):
+            Attendance.objects.bulk_create([
+                Attendance(employee=self.employee, date=date(2025, month, day), status='Present') for day in range(1, 29)
+            ])
+            generate_payroll('E00001', f'2025-{month:02d}', '2', Decimal('0'))
+
+    def test_statements_are_indexed_and_runs_resume(self):
+        summary = run_year_end_statements(2025)
+        self.assertEqual((summary['rendered'], summary['skipped']), (1, 0))
+        statement = YearEndStatement.objects.get(employee=self.employee, financial_year=2025)
+        self.assertEqual((statement.months, statement.net_fee_earned), (2, 54000))
+
+        self.assertEqual(run_year_end_statements(2025)['rendered'], 0)
+        self.assertEqual(run_year_end_statements(2025, force=True)['rendered'], 1)
+
+        client = APIClient()
+        client.force_authenticate(self.employee)
+        response = client.get('/api/payroll/year-end/2025/download/')
+        pdf = b''.join(response.streaming_content)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertEqual(hashlib.sha256(pdf).hexdigest(), YearEndStatement.objects.get().pdf_sha256)
+        self.assertEqual(client.get('/api/payroll/year-end/2024/download/').status_code, 404)
+
+
+class PayslipRendererTests(TestCase):
+
+    def setUp(self):
+        self.employee = Employee.objects.create_user(
+            id='E00001', email='emp@example.com', password='pw', name='Emp', date_joined=date(2024, 1, 1),
+            fee_per_month=Decimal('30000'), pan_no='ABCDE1234F',
+        )
+        Attendance.objects.bulk_create([
+            Attendance(employee=self.employee, date=date(2025, 9, day), status='Present') for day in range(1, 29)
+        ])
+        self.leave, self.payroll = generate_payroll('E00001', '2025-09', '2', Decimal('1250.50'))
+
+    def _text_runs(self, renderer):
+        pdf = render_payslip_pdf(self.payroll, self.leave, renderer).getvalue()
+        self.assertEqual(pdf.count(b'/Type /Page\n'), 1)
+        content = b''.join(
+            zlib.decompress(stream)
+            for stream in re.findall(rb'/FlateDecode \][^>]*>>\s*stream\r?\n(.*?)endstream', pdf, re.S)
+        )
+        return Counter(re.findall(rb'\(((?:\\.|[^\\)])*)\) Tj', content))
+
+    def test_canvas_renderer_draws_the_platypus_payslip_text(self):
+        platypus = self._text_runs('platypus')
+        self.assertIn(b'1,250.50', platypus)
+        self.assertEqual(self._text_runs('canvas'), platypus)
+
+    @override_settings(PAYSLIP_RENDERER='canvas')
+    def test_renderer_follows_setting(self):
+        with mock.patch('payroll.utils.render_payslip_canvas', wraps=render_payslip_canvas) as canvas_renderer:
+            self.assertTrue(render_payslip_pdf(self.payroll, self.leave).getvalue().startswith(b'%PDF'))
+        canvas_renderer.assert_called_once()
+
+    def test_payslips_are_compact(self):
+        for renderer in ('platypus', 'canvas'):
+            pdf = render_payslip_pdf(self.payroll, self.leave, renderer).getvalue()
+            # compressed, not ASCII85-armoured; the logo downsampled; no embedded fonts
+            self.assertIn(b'/Filter [ /FlateDecode ]', pdf)
+            self.assertNotIn(b'ASCII85Decode', pdf)
+            self.assertIn(b'/Width 59', pdf)
+            self.assertNotIn(b'/FontFile', pdf)
+            self.assertLess(len(pdf), 8000)
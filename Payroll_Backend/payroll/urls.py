@@ -6,6 +6,13 @@ from .views import GeneratePayslipPDFView
 from .views import MyPayslipsAPIView
 from .views import DownloadPayslipPDFView
 from .views import monthly_employees_view
+from .views import PayrollPreviewAPIView
+from .views import PayrollSimulationAPIView
+from .views import PayrollMonthView
+from .views import PayrollYearTotalsAPIView
+from .views import PayrollRegisterExportView
+from .views import TdsReportView
+from .views import YearEndStatementView
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -20,5 +27,17 @@ urlpatterns = [
     path('generate_payslip/', GeneratePayslipPDFView.as_view(), name='generate-pdf'),
     path('download_payslip/', DownloadPayslipPDFView.as_view(), name='download-pdf'),
     path('my_payslips/', MyPayslipsAPIView.as_view(), name='mypayslips'),
+    path('year-end/<int:year>/', YearEndStatementView.as_view(), name='year-end-statements'),
+    path('year-end/<int:year>/download/', YearEndStatementView.as_view(download=True), name='year-end-statement-download'),
+    path('tds/', TdsReportView.as_view(), name='tds-report'),
+    path('tds/statement/', TdsReportView.as_view(statement=True), name='tds-statement'),
+    path('register/', PayrollRegisterExportView.as_view(), name='payroll-register'),
+    path('ytd-totals/', PayrollYearTotalsAPIView.as_view(), name='payroll-ytd-totals'),
     path('monthly-employees/', monthly_employees_view, name='monthly-employees'),
+    path('preview/', PayrollPreviewAPIView.as_view(), name='payroll-preview'),
+    path('simulate/', PayrollSimulationAPIView.as_view(), name='payroll-simulate'),
+    path('months/<str:month>/', PayrollMonthView.as_view(), name='payroll-month'),
+    path('months/<str:month>/close/', PayrollMonthView.as_view(action='close'), name='payroll-month-close'),
+    path('months/<str:month>/reopen/', PayrollMonthView.as_view(action='reopen'), name='payroll-month-reopen'),
+    path('months/<str:month>/payouts/', PayrollMonthView.as_view(action='payouts'), name='payroll-month-payouts'),
 ] 
\ No newline at end of file
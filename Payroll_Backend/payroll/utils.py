@@ -0,0 +1,734 @@
+# payroll/utils.py
+"""
+Payroll generation and payslip rendering, shared by the payroll views and the
+background job handlers in payroll/jobs.py.
+"""
+import calendar
+import io
+import logging
+import os
+import shutil
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.models import F, FilteredRelation, OuterRef, Q, Subquery
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import Table, TableStyle, Paragraph, SimpleDocTemplate, Spacer, Image
+
+from attendance.models import Attendance
+from employee.models import CompensationHistory, Employee
+from employee.utils import compensation_annotations
+from leavedetails.models import LeaveDetails, compute_leave_details
+from payroll_management_system.metrics import PAYROLL_GENERATED, PAYSLIP_EMAILS, PAYSLIP_RENDER_SECONDS
+from .logo import LOGO_SIZE, logo_jpeg
+from .models import ABSENT_PENALTY_FACTOR, PERFORMANCE_MULTIPLIERS, TDS_RATE, Payroll, compute_payroll
+from .payslip_canvas import render_payslip_canvas
+
+payroll_logger = logging.getLogger('payroll_operations')
+
+CENT = Decimal('0.01')
+# First key of the two-int advisory locks taken on (employee, month)
+PAYROLL_LOCK_NAMESPACE = 0x5041
+# Stands in for the employee id in the advisory lock of a whole month
+MONTH_LOCK_ID = '*'
+
+
+class PayrollLockedError(Exception):
+    """Another transaction is computing the payroll of this employee and month."""
+    pass
+
+
+def acquire_payroll_lock(employee_id, month, wait=True, using=DEFAULT_DB_ALIAS, shared=False):
+    """
+    Takes the transaction-scoped PostgreSQL advisory lock of (employee,
+    month), so concurrent runs for the same row serialise instead of racing
+    on get_or_create. Must be called inside transaction.atomic; the lock is
+    released at commit or rollback. With wait=False returns False instead of
+    waiting when another transaction holds it; shared=True takes it in shared
+    mode. Other backends have no advisory locks and always get True.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return True
+    # crc32 fits the second int4 key once shifted to the signed range
+    key = zlib.crc32(f"{employee_id}:{month:%Y-%m}".encode()) - 2 ** 31
+    function = ('pg_advisory_xact_lock' if wait else 'pg_try_advisory_xact_lock') + ('_shared' if shared else '')
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {function}(%s, %s)", [PAYROLL_LOCK_NAMESPACE, key])
+        return True if wait else cursor.fetchone()[0]
+
+
+def acquire_month_lock(month, shared=False, wait=True, using=DEFAULT_DB_ALIAS):
+    """
+    The advisory lock of a whole month: closing and reopening take it
+    exclusively, payroll recomputes take it shared before their employee
+    lock. A recompute therefore cannot commit while a close is reading the
+    month, and one that waited for a close sees the month closed.
+    """
+    return acquire_payroll_lock(MONTH_LOCK_ID, month, wait=wait, using=using, shared=shared)
+
+
+def generate_payroll(employee_id, month_str, perform_category, reimbursement,
+                     reimbursement_proof=None, performed_by_user="Anonymous"):
+    """
+    Creates or updates the LeaveDetails and Payroll rows of one employee for
+    one month ('YYYY-MM') and returns (leave_record, payroll).
+
+    Raises Employee.DoesNotExist, ValueError for a bad month and
+    NoAttendanceRecordsError when the month has no attendance.
+    """
+    with transaction.atomic():
+        month = datetime.strptime(month_str, '%Y-%m').date().replace(day=1)
+        employee = Employee.objects.get(id=employee_id)
+        # waits for a close of the month in progress, then for a second admin
+        # generating the same employee/month
+        acquire_month_lock(month, shared=True)
+        acquire_payroll_lock(employee.id, month)
+
+        # Create or update LeaveDetails
+        leave_record, _ = LeaveDetails.objects.get_or_create(employee=employee, month=month)
+        leave_record.save()  # Triggers auto computation
+
+        # Create or update Payroll
+        payroll, created = Payroll.objects.get_or_create(employee=employee, month=month)
+
+        # Store old values for detailed logging if updating
+        old_reimbursement = payroll.reimbursement
+        old_reimbursement_proof_name = os.path.basename(payroll.reimbursement_proof.name) if payroll.reimbursement_proof else None
+
+        payroll.perform_category = perform_category
+        payroll.reimbursement = reimbursement
+        if reimbursement > 0:
+            # If reimbursement is positive, attempt to set or clear proof based on upload
+            if reimbursement_proof:
+                if payroll.reimbursement_proof:
+                    if payroll.reimbursement_proof.file != reimbursement_proof:
+                        payroll.reimbursement_proof.delete(save=False) # Delete old file
+                payroll.reimbursement_proof = reimbursement_proof
+            else:
+                if payroll.reimbursement_proof:
+                    payroll.reimbursement_proof.delete(save=False) # Delete old file
+                payroll.reimbursement_proof = None
+        else: 
+            if payroll.reimbursement_proof:
+                payroll.reimbursement_proof.delete(save=False) # delete=False prevents saving DB here
+            payroll.reimbursement_proof = None
+
+        if created:
+            log_message_parts = [
+                f"Payroll GENERATED for employee: {employee.name} (ID: {employee_id}) ",
+                f"for month: {month_str} by {performed_by_user}. ",
+                f"Initial perform_category: {perform_category}, reimbursement: {reimbursement}."
+            ]
+            if payroll.reimbursement_proof:
+                log_message_parts.append(f" Reimbursement proof: '{payroll.reimbursement_proof.name}'.")
+            else:
+                log_message_parts.append(" No reimbursement proof expected/provided (reimbursement is zero).")
+
+            payroll_logger.info("".join(log_message_parts))
+        else:
+            log_message_parts = [
+                f"Payroll UPDATED for employee: {employee_id} - {employee.name} "
+                f"for month: {month_str} by {performed_by_user}."
+            ]
+            
+            if old_reimbursement != reimbursement:
+                log_message_parts.append(
+                    f" Reimbursement changed from '{old_reimbursement}' to '{reimbursement}'."
+                )
+            
+            new_reimbursement_proof_name = payroll.reimbursement_proof.name if payroll.reimbursement_proof else None
+            if old_reimbursement_proof_name and not new_reimbursement_proof_name:
+                log_message_parts.append(f" Reimbursement proof '{old_reimbursement_proof_name}' removed.")
+            elif not old_reimbursement_proof_name and new_reimbursement_proof_name:
+                log_message_parts.append(f" Reimbursement proof '{new_reimbursement_proof_name}' added.")
+            elif old_reimbursement_proof_name and new_reimbursement_proof_name and old_reimbursement_proof_name != new_reimbursement_proof_name:
+                log_message_parts.append(f" Reimbursement proof changed from '{old_reimbursement_proof_name}' to '{new_reimbursement_proof_name}'.")
+
+            payroll_logger.info("".join(log_message_parts))
+
+
+        payroll.save()  # Triggers payroll computation
+        payroll_logger.info(f"Payroll computation triggered and saved for employee {employee_id} for month {month_str}.\n")
+
+    PAYROLL_GENERATED.inc(action='created' if created else 'updated')
+
+    return leave_record, payroll
+
+
+def recompute_arrears(employee_id, effective_from, progress=None):
+    """
+    Applies a back-dated compensation change to the payroll months it
+    affects: those on or after `effective_from` (and before the employee's
+    next recorded change) that already have payroll.
+    Open months are recomputed in place (oldest first); closed months keep
+    their snapshot, and the difference to what the new compensation would
+    pay is reported as arrears due. Returns a summary dict.
+    """
+    from .snapshots import active_snapshot  # snapshots imports this module
+
+    affected = Payroll.objects.filter(employee_id=employee_id, month__gte=effective_from)
+    # months from a later recorded change on resolve to that change instead
+    next_change = CompensationHistory.objects.filter(
+        employee_id=employee_id, effective_from__gt=effective_from
+    ).order_by('effective_from').values_list('effective_from', flat=True).first()
+    if next_change is not None:
+        affected = affected.filter(month__lt=next_change)
+    months = list(affected.order_by('month').values_list('month', 'net_fee_earned'))
+    recomputed, closed = [], []
+    for done, (month, old_net) in enumerate(months, 1):
+        snapshot = active_snapshot(employee_id, month)
+        if snapshot is None:
+            with transaction.atomic():
+                acquire_month_lock(month, shared=True)
+                acquire_payroll_lock(employee_id, month)
+                payroll = Payroll.objects.select_related('employee').get(employee_id=employee_id, month=month)
+                payroll.save()
+            recomputed.append({
+                "month": month.strftime('%Y-%m'), "old_net_fee_earned": old_net,
+                "new_net_fee_earned": payroll.net_fee_earned, "delta": payroll.net_fee_earned - old_net,
+            })
+        else:
+            previews, _ = preview_payroll(month, [employee_id])
+            due = previews[0][1].net_fee_earned if previews else snapshot.net_fee_earned
+            closed.append({
+                "month": month.strftime('%Y-%m'), "paid_net_fee_earned": snapshot.net_fee_earned,
+                "due_net_fee_earned": due, "arrears": due - snapshot.net_fee_earned,
+            })
+        if progress:
+            progress(done, len(months))
+
+    payroll_logger.info(
+        f"Arrears for employee {employee_id} from {effective_from}: {len(recomputed)} open month(s) recomputed, "
+        f"{len(closed)} closed month(s) with arrears {sum(row['arrears'] for row in closed)}."
+    )
+    return {
+        "employee_id": employee_id,
+        "effective_from": effective_from.isoformat(),
+        "recomputed": recomputed,
+        "closed": closed,
+        "total_delta": sum(row["delta"] for row in recomputed),
+        "total_arrears": sum(row["arrears"] for row in closed),
+    }
+
+
+def _quantized(instance, values):
+    # mirror what the numeric(…, 2) columns store (PostgreSQL rounds half away from zero)
+    for field, value in values.items():
+        if isinstance(instance._meta.get_field(field), models.DecimalField):
+            value = Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+        setattr(instance, field, value)
+    return instance
+
+
+def preview_payroll(month, employee_ids=None, perform_categories=None, reimbursements=None,
+                    default_perform_category='NA'):
+    """
+    Computes a payroll run for `month` (a date) in memory and writes nothing.
+
+    Returns (previews, skipped): previews is a list of unsaved (LeaveDetails,
+    Payroll) pairs with every computed field filled in, skipped the employees
+    without attendance that month. perform_categories and reimbursements map
+    employee ids to overrides; otherwise the month's existing payroll values
+    are used, then default_perform_category and no reimbursement.
+
+    Everything comes from three queries (employees with their previous leave
+    balance and existing payroll, then the month's attendance), so a whole
+    month can be previewed interactively.
+    """
+    perform_categories = perform_categories or {}
+    reimbursements = reimbursements or {}
+    month = month.replace(day=1)
+    month_end = month.replace(day=calendar.monthrange(month.year, month.month)[1])
+
+    previous = LeaveDetails.objects.filter(employee=OuterRef('pk'), month__lt=month).order_by('-month')
+    employees = Employee.objects.filter(date_joined__lte=month_end).annotate(
+        **compensation_annotations(month),
+        prev_paid_left=Subquery(previous.values('total_paid_leaves_left')[:1]),
+        prev_sick_left=Subquery(previous.values('total_sick_leaves_left')[:1]),
+        month_payroll=FilteredRelation('payrolls', condition=Q(payrolls__month=month)),
+        existing_category=F('month_payroll__perform_category'),
+        existing_reimbursement=F('month_payroll__reimbursement'),
+    ).order_by('id')
+    attendance = Attendance.objects.filter(date__range=(month, month_end))
+    if employee_ids is not None:
+        employees = employees.filter(id__in=employee_ids)
+        attendance = attendance.filter(employee_id__in=employee_ids)
+
+    attendance_by_employee = defaultdict(dict)
+    for employee_id, day, status in attendance.values_list('employee_id', 'date', 'status').iterator(chunk_size=10000):
+        attendance_by_employee[employee_id][day] = status
+
+    previews, skipped = [], []
+    for employee in employees:
+        attendance_map = attendance_by_employee.get(employee.id)
+        if not attendance_map:
+            skipped.append(employee)
+            continue
+        previous_balance = None
+        if employee.prev_paid_left is not None:
+            previous_balance = (employee.prev_paid_left, employee.prev_sick_left)
+        leave = _quantized(
+            LeaveDetails(employee=employee, month=month),
+            compute_leave_details(month, employee.date_joined, attendance_map, previous_balance),
+        )
+
+        perform_category = perform_categories.get(employee.id) or employee.existing_category or default_perform_category
+        reimbursement = reimbursements.get(employee.id)
+        if reimbursement is None:
+            reimbursement = employee.existing_reimbursement or Decimal('0')
+        payroll = Payroll(
+            employee=employee, month=month, fee_per_month=employee.effective_fee,
+            pay_structure=employee.effective_pay_structure, perform_category=perform_category,
+            reimbursement=Decimal(reimbursement),
+        )
+        _quantized(payroll, compute_payroll(
+            payroll.fee_per_month, payroll.pay_structure, leave, perform_category, payroll.reimbursement
+        ))
+        previews.append((leave, payroll))
+    return previews, skipped
+
+
+def _decimal(value, name):
+    try:
+        number = Decimal(str(value))
+    except ArithmeticError:
+        raise ValueError(f"{name} must be a number")
+    if not number.is_finite():
+        raise ValueError(f"{name} must be a number")
+    return number
+
+
+def _apply_fee_change(fee, change):
+    """change is {'percent': n} or {'amount': n}; both may be negative."""
+    if not isinstance(change, dict) or not set(change) <= {'percent', 'amount'} or not change:
+        raise ValueError("A fee change must be {'percent': n} or {'amount': n}")
+    fee = fee * (1 + _decimal(change.get('percent', 0), 'percent') / 100) + _decimal(change.get('amount', 0), 'amount')
+    return max(fee, Decimal('0')).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def simulate_payroll(month, fee_changes=None, designation_fee_changes=None, multipliers=None,
+                     performance_distribution=None, tds_rate=None, absent_penalty=None):
+    """
+    Projects a month's payroll under a what-if scenario and compares it with
+    the current rules, without writing anything. Only employees whose
+    LeaveDetails for the month exist (i.e. after a payroll run) are included.
+
+    fee_changes maps employee ids and designation_fee_changes designations to
+    {'percent': n} or {'amount': n} (per-employee entries win). multipliers
+    replaces PERFORMANCE_MULTIPLIERS; performance_distribution ({category:
+    share}) pays everyone the expected multiplier of that distribution
+    instead of their recorded category. tds_rate and absent_penalty replace
+    TDS_RATE and ABSENT_PENALTY_FACTOR. Raises ValueError for bad parameters.
+
+    All inputs come from one query; each employee is then two calls of the
+    pure compute_payroll (baseline and scenario).
+    """
+    fee_changes = fee_changes or {}
+    designation_fee_changes = designation_fee_changes or {}
+    if not isinstance(fee_changes, dict) or not isinstance(designation_fee_changes, dict):
+        raise ValueError("fee_changes and designation_fee_changes must be objects")
+    scenario = {
+        'multipliers': dict(PERFORMANCE_MULTIPLIERS),
+        'tds_rate': TDS_RATE if tds_rate is None else _decimal(tds_rate, 'tds_rate'),
+        'absent_penalty': ABSENT_PENALTY_FACTOR if absent_penalty is None else _decimal(absent_penalty, 'absent_penalty'),
+    }
+    if multipliers:
+        unknown = set(multipliers) - set(PERFORMANCE_MULTIPLIERS)
+        if unknown:
+            raise ValueError(f"Unknown performance categories: {', '.join(sorted(unknown))}")
+        scenario['multipliers'].update(
+            {category: _decimal(value, f"multiplier '{category}'") for category, value in multipliers.items()}
+        )
+    if not 0 <= scenario['tds_rate'] <= 1 or scenario['absent_penalty'] < 0:
+        raise ValueError("tds_rate must be between 0 and 1 and absent_penalty not negative")
+
+    expected_category = None
+    if performance_distribution:
+        unknown = set(performance_distribution) - set(PERFORMANCE_MULTIPLIERS)
+        if unknown:
+            raise ValueError(f"Unknown performance categories: {', '.join(sorted(unknown))}")
+        shares = {category: _decimal(share, f"share '{category}'") for category, share in performance_distribution.items()}
+        if any(share < 0 for share in shares.values()):
+            raise ValueError("performance_distribution shares cannot be negative")
+        total_share = sum(shares.values())
+        if total_share <= 0:
+            raise ValueError("performance_distribution shares must add up to more than zero")
+        # a synthetic category whose multiplier is the distribution's expected value
+        expected_category = 'expected'
+        scenario['multipliers'][expected_category] = sum(
+            share / total_share * Decimal(str(scenario['multipliers'][category]))
+            for category, share in shares.items()
+        )
+
+    rows = LeaveDetails.objects.filter(month=month.replace(day=1)).annotate(
+        **compensation_annotations(month, employee_ref='employee_id'),
+        month_payroll=FilteredRelation(
+            'employee__payrolls', condition=Q(employee__payrolls__month=month.replace(day=1))
+        ),
+    ).values(
+        'employee_id', 'working_days', 'days_worked', 'paid_leaves', 'sick_leaves', 'absent_days',
+        name=F('employee__name'), designation=F('employee__designation'),
+        fee_per_month=F('effective_fee'), pay_structure=F('effective_pay_structure'),
+        perform_category=F('month_payroll__perform_category'),
+        reimbursement=F('month_payroll__reimbursement'),
+    ).order_by('employee_id')
+
+    totals = {
+        key: {'fee_per_month': Decimal('0'), 'fee_earned': Decimal('0'), 'tds': Decimal('0'), 'net_fee_earned': 0}
+        for key in ('baseline', 'scenario')
+    }
+    employees = []
+    for row in rows:
+        leave = SimpleNamespace(**row)
+        if not leave.working_days:
+            continue
+        category = row['perform_category'] or 'NA'
+        reimbursement = row['reimbursement'] or Decimal('0')
+        change = fee_changes.get(row['employee_id'], designation_fee_changes.get(row['designation']))
+        new_fee = _apply_fee_change(row['fee_per_month'], change) if change else row['fee_per_month']
+
+        baseline = compute_payroll(row['fee_per_month'], row['pay_structure'], leave, category, reimbursement)
+        projected = compute_payroll(
+            new_fee, row['pay_structure'], leave, expected_category or category, reimbursement, **scenario
+        )
+        for key, fee, result in (('baseline', row['fee_per_month'], baseline), ('scenario', new_fee, projected)):
+            totals[key]['fee_per_month'] += fee
+            totals[key]['fee_earned'] += result['fee_earned']
+            totals[key]['tds'] += result['tds']
+            totals[key]['net_fee_earned'] += result['net_fee_earned']
+        employees.append({
+            "employee_id": row['employee_id'],
+            "name": row['name'],
+            "designation": row['designation'],
+            "fee_per_month": str(row['fee_per_month']),
+            "scenario_fee_per_month": str(new_fee),
+            "baseline_net_fee_earned": baseline['net_fee_earned'],
+            "scenario_net_fee_earned": projected['net_fee_earned'],
+            "delta": projected['net_fee_earned'] - baseline['net_fee_earned'],
+        })
+
+    summary = {
+        key: {
+            "employees": len(employees),
+            **{field: str(Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)) for field, value in values.items()
+               if field != 'net_fee_earned'},
+            "net_fee_earned": values['net_fee_earned'],
+        }
+        for key, values in totals.items()
+    }
+    summary['delta'] = {
+        field: str((totals['scenario'][field] - totals['baseline'][field]).quantize(CENT, rounding=ROUND_HALF_UP))
+        for field in ('fee_per_month', 'fee_earned', 'tds')
+    }
+    summary['delta']['net_fee_earned'] = totals['scenario']['net_fee_earned'] - totals['baseline']['net_fee_earned']
+    return {"month": month.strftime('%Y-%m'), "totals": summary, "employees": employees}
+
+
+def render_payslip_pdf(payroll, leave, renderer=None):
+    """
+    Builds the payslip PDF for a payroll row; returns a BytesIO at offset 0.
+    `renderer` ('platypus' or 'canvas') defaults to settings.PAYSLIP_RENDERER.
+    """
+    if (renderer or settings.PAYSLIP_RENDERER) == 'canvas':
+        return render_payslip_canvas(payroll, leave)
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, pageCompression=1,
+                            rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
+
+    styles = getSampleStyleSheet()
+    normal = styles["Normal"]
+    bold = ParagraphStyle("Bold", parent=normal, fontName="Helvetica-Bold", fontSize=10)
+    company_info_style = ParagraphStyle(
+        name='CompanyInfo',
+        parent=normal,
+        leading=12, # Line spacing
+        alignment=1
+    )
+    center_aligned_bold = ParagraphStyle(name='CenterAlignedBold', parent=bold, alignment=1, fontSize=12, leading=16)
+    
+    table_text_style = ParagraphStyle(name='TableText', parent=normal, fontSize=9)
+    table_label_style = ParagraphStyle(name='TableLabel', parent=bold, fontSize=9)
+
+    fee_header_style = ParagraphStyle(name='FeeHeader', parent=bold, fontSize=10, alignment=1)
+    fee_net_style = ParagraphStyle(name='FeeNet', parent=bold, fontSize=10, alignment=0) 
+    fee_label_style = ParagraphStyle(name='FeeLabel', parent=normal, fontSize=9, alignment=0)
+    fee_value_style = ParagraphStyle(name='FeeValue', parent=normal, fontSize=9, alignment=2)
+    fee_total_style = ParagraphStyle(name='FeeTotal', parent=bold, fontSize=9, alignment=1)
+
+    gen_style = ParagraphStyle(name='Gen', parent=normal, fontSize=9, alignment=1)
+    
+    leave_heading_style = ParagraphStyle(name='LeaveHeading', parent=bold, fontSize=10, alignment=1)
+    leave_table_header_style = ParagraphStyle(name='LeaveTableHeader', parent=bold, fontSize=9, alignment=1)
+    leave_table_value_style = ParagraphStyle(name='LeaveTableValue', parent=normal, fontSize=9, alignment=1)
+    leave_balance_style = ParagraphStyle(name='LeaveBalance', parent=bold, fontSize=9, alignment=1) 
+
+    
+    elements = []
+
+    company_name = Paragraph(
+        '<para alignment="center"><font size="14" face="Helvetica-Bold">Jivass Technologies</font></para>',
+        company_info_style
+    )
+
+    company_details = Paragraph(
+        '<font size="8" face="Helvetica-Bold">F1, Ashwamedha, No 121, Velachery Main Road, Chennai – 600032,<br/>'
+        'Phone: 9840694738 Email: contact@jivass.com</font>',
+        company_info_style
+    )
+
+    company_info_cell = [company_name, Spacer(1, 8), company_details]
+
+    # Header with Logo + Company Info + Title
+    header_table = Table([
+        [
+            Image(io.BytesIO(logo_jpeg()), width=LOGO_SIZE, height=LOGO_SIZE),
+            company_info_cell,
+            Paragraph(f"<b>Consultant Pay Slip</b><br/> {payroll.month.strftime('%B %Y')}", center_aligned_bold)
+        ]
+    ], colWidths=[40, 320, 140])
+    header_table.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (0, -1), 'TOP'),
+        ('VALIGN', (1, 0), (-1, -1), 'MIDDLE'),
+        ('ALIGN', (0, 0), (0, 0), 'LEFT'), # Logo left align
+        ('ALIGN', (1, 0), (1, 0), 'CENTER'), # Company info left align within its cell
+        ('BOX', (0, 0), (1, 0), 1, colors.black),
+        ('ALIGN', (2, 0), (2, 0), 'CENTER'), # Pay Slip title right align
+        ('BOX', (2, 0), (2, 0), 1, colors.black), # Border around Pay Slip cell
+        ('TOPPADDING', (1,0), (2,0), 10),
+        ('TOPPADDING', (0,0), (0,0), 5),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 10),
+    ]))
+    elements.append(header_table)
+   
+    # Employee Info Table
+    emp = payroll.employee
+    emp_info_data = [
+        [Paragraph('Consultant ID:', table_label_style), Paragraph(str(emp.id), table_label_style), '', Paragraph('Date of Joining:', table_label_style), Paragraph(emp.date_joined.strftime('%d/%m/%Y'), table_label_style)],
+        [Paragraph('Name:', table_label_style), Paragraph(emp.name, table_text_style), '', '', ''],
+        [Paragraph('Designation:', table_label_style), Paragraph(emp.designation or "N/A", table_text_style), '', '', ''],
+        [Paragraph('PAN:', table_label_style), Paragraph(emp.pan_no or "N/A", table_text_style), '', '', ''],
+        [Paragraph('Mobile:', table_label_style), Paragraph(emp.phone_no or "N/A", table_text_style), '', '', ''],
+        [Paragraph('Email:', table_label_style), Paragraph(emp.email or "N/A", table_text_style), '', '', '']
+    ]
+
+    emp_info_col_widths = [88, 194, 20, 78, 120] # Adjusted to sum to page width (~500 points)
+
+    emp_info_table = Table(emp_info_data, colWidths=emp_info_col_widths)
+    emp_info_table.setStyle(TableStyle([
+        ('BOX', (0, 0), (-1, -1), 1, colors.black), # Main box border
+        #('GRID', (0,0), (-1,-1), 0.25, colors.black), # Internal grid lines, thinner
+        ('LINEBELOW', (0, 0), (-1, 0), 0.35, colors.lightgrey),  
+        ('LINEBELOW', (0, 1), (-1, 1), 0.35, colors.lightgrey),
+        ('LINEBELOW', (0, 2), (-1, 2), 0.35, colors.lightgrey),
+        ('LINEBELOW', (0, 3), (-1, 3), 0.35, colors.lightgrey),
+        ('LINEBELOW', (0, 4), (-1, 4), 0.35, colors.lightgrey),
+        ('SPAN', (1, 1), (-1, 1)), # Name spans across remaining columns
+        ('SPAN', (1, 2), (-1, 2)), # Designation spans
+        ('SPAN', (1, 3), (-1, 3)), # PAN spans
+        ('SPAN', (1, 4), (-1, 4)), # Mobile spans
+        ('SPAN', (1, 5), (-1, 5)), # Email spans
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LEFTPADDING', (0,0), (-1,-1), 5),
+        ('LEFTPADDING', (4,0), (4,0), 0),
+        ('RIGHTPADDING', (0,0), (-1,-1), 5),
+        ('TOPPADDING', (0,0), (-1,-1), 4),
+        ('BOTTOMPADDING', (0,4), (-1,4), 3),
+        ('BOTTOMPADDING', (0,5), (-1,5), 5),
+    ]))
+    elements.append(emp_info_table)
+    elements.append(Spacer(1, 15))
+
+    
+    # Consultant Fee Details
+    fee_table_data = [
+        # Header row (Row 0)
+        [Paragraph('Consultant Fee Details', fee_header_style), '', '', '', '', ''],
+        # (Row 1)
+        ['', '', '', '','', Paragraph('Total', fee_total_style)],
+        #(Row 2)
+        [Paragraph(f'Month : <b>{payroll.month.strftime("%B")}</b>', fee_label_style), Paragraph('Base Pay Earned :', fee_label_style) ,Paragraph(f"{payroll.base_pay_earned:,.2f}", fee_value_style), '','',''],
+        # (Row 3)
+        [Paragraph(f'Working Days : {leave.working_days}', fee_label_style),Paragraph('Variable Pay Earned :', fee_label_style) ,Paragraph(f"{payroll.perform_comp_payable:,.2f}", fee_value_style), '','',''],
+        # (Row 4)
+        [Paragraph(f'Days Worked : {leave.days_worked}', fee_label_style), Paragraph('Fee Earned :', fee_label_style) ,Paragraph(f"{payroll.fee_earned:,.2f}", fee_value_style), Paragraph('TDS Deducted :', fee_label_style),Paragraph(f"{payroll.tds:,.2f}", fee_value_style) ,Paragraph(f"{(payroll.fee_earned - payroll.tds):,.2f}", fee_value_style)],
+        # (Row 5)
+        [Paragraph(f'Absent Days : {leave.absent_days}', fee_label_style), Paragraph('Reimbursement :', fee_label_style), Paragraph(f"{payroll.reimbursement:,.2f}", fee_value_style), '', '', Paragraph(f"{payroll.reimbursement:,.2f}", fee_value_style)],
+        # (Row 6)
+        [Paragraph('Total', fee_total_style), '', Paragraph(f"{(payroll.fee_earned + payroll.reimbursement):,.2f}", fee_value_style), '', Paragraph(f"{payroll.tds:,.2f}", fee_value_style),Paragraph(f"{(payroll.fee_earned - payroll.tds + payroll.reimbursement):,.2f}", fee_value_style)],
+        # Net Fee Earned row (Row 7)
+        [Paragraph('Net Fee Earned :', fee_header_style),Paragraph(f"{payroll.net_fee_earned}", fee_net_style), '', Paragraph(f"Generated On : {payroll.generated_on.strftime('%d/%m/%Y')},{payroll.generated_time.strftime('%H:%M:%S')}", gen_style), '', ''],
+    ]
+
+    fee_col_widths = [120, 100, 60, 85, 55, 80] # Adjusted to sum to page width (~500 points)
+
+    fee_table = Table(fee_table_data, colWidths=fee_col_widths)
+    fee_table.setStyle(TableStyle([
+        ('BOX', (0, 0), (-1, -1), 1, colors.black),
+        #('GRID', (0, 0), (-1, -1), 0.25, colors.black),
+        ('LINEAFTER', (0, 0), (0, 6), 0.75, colors.black),
+        ('LINEAFTER', (2, 0), (2, 6), 0.75, colors.black),
+        ('LINEAFTER', (4, 0), (4, 6), 0.75, colors.black),
+        ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
+        ('LINEBELOW', (0, 1), (-1, 1), 0.75, colors.black),
+        ('LINEBELOW', (0, 5), (-1, 6), 0.75, colors.black),
+        ('LINEBELOW', (0, 2), (-1, 4), 0.35, colors.lightgrey),
+        ('SPAN', (0, 0), (-1, 0)), # 'Consultant Fee Details'
+        ('SPAN', (3, -1), (5, -1)),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0,0), (-1,-1), 4),
+        ('TOPPADDING', (0,7), (-1,7), 5),
+        ('BOTTOMPADDING', (0,0), (-1,6), 3),
+        ('BOTTOMPADDING', (0,7), (-1,7), 5),
+        ('LEFTPADDING', (0,0), (-1,-1), 5),
+        ('LEFTPADDING', (2,0), (2,-1), 0),
+        ('LEFTPADDING', (4,0), (4,-1), 0),
+        ('RIGHTPADDING', (0,0), (-1,-1), 5),
+        ('RIGHTPADDING', (1,0), (1,-1), 0),
+        ('RIGHTPADDING', (3,0), (3,-1), 0),
+    ]))
+    elements.append(fee_table)
+    elements.append(Spacer(1, 15))
+
+    
+    leave_table_data = [
+        [Paragraph('Leave Details', leave_heading_style), '', '', ''],
+        [Paragraph('Paid Leaves', leave_table_header_style), Paragraph('Sick Leaves', leave_table_header_style), Paragraph('Unpaid Leaves', leave_table_header_style), Paragraph('Total leaves Taken', leave_table_header_style)],
+        [Paragraph(str(leave.paid_leaves), leave_table_value_style), Paragraph(str(leave.sick_leaves), leave_table_value_style), Paragraph(str(leave.unpaid_leaves), leave_table_value_style), Paragraph(str(leave.total_leaves_taken), leave_table_value_style)],
+        [Paragraph(f"Leave Balance : {leave.total_paid_leaves_left} Days", leave_balance_style), '', Paragraph(f"Sick Leave Balance : {leave.total_sick_leaves_left} Days", leave_balance_style), '']
+    ]
+
+    leave_table = Table(leave_table_data, colWidths=[85, 85, 85, 105]) 
+    leave_table.setStyle(TableStyle([
+        ('BOX', (0, 0), (-1, -1), 1, colors.black),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
+        ('SPAN', (0, 0), (-1, 0)),
+        ('SPAN', (0, 3), (1, 3)), # Span for Leave Balance
+        ('SPAN', (2, 3), (3, 3)), # Span for Sick Leave Balance
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LEFTPADDING', (0,0), (-1,-1), 5),
+        ('RIGHTPADDING', (0,0), (-1,-1), 5),
+        ('TOPPADDING', (0,0), (-1,-1), 4),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 3),
+        ('BOTTOMPADDING', (0,-1), (-1,-1), 5),
+    ]))
+    #elements.append(leave_table)
+    wrapper_table = Table([[leave_table]], colWidths=[500])  # match outer width
+    wrapper_table.setStyle(TableStyle([
+        ('LEFTPADDING', (0, 0), (-1, -1), 0),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ]))
+    elements.append(wrapper_table)
+
+    doc.build(elements)
+    buffer.seek(0)
+    return buffer
+
+
+def issue_payslip(payroll, leave, employee_id, month_str, pdf=None):
+    """
+    Renders the payslip (or uses the given `pdf` bytes, e.g. a closed month's
+    snapshot), saves it to PAYSLIP_STORAGE_DIR (moving older versions of the
+    same month to PAYSLIP_ARCHIVE_DIR) and emails it to the employee. Returns
+    a dict with message, pdf (bytes), saved_path and email_failed.
+    """
+    if pdf is not None:
+        buffer = io.BytesIO(pdf)
+    else:
+        with PAYSLIP_RENDER_SECONDS.time(view='generate'):
+            buffer = render_payslip_pdf(payroll, leave)
+
+    generated_date_for_filename = payroll.generated_on.strftime('%Y-%m-%d')
+    generated_time_for_filename = payroll.generated_time.strftime('%H-%M-%S')
+    saved_filename = f"payslip_{employee_id}_{month_str}_gen-{generated_date_for_filename},{generated_time_for_filename}.pdf"
+
+    # Create the full path for the file
+    payslip_folder = settings.PAYSLIP_STORAGE_DIR # Use the path from settings
+    payslip_archive_folder = settings.PAYSLIP_ARCHIVE_DIR
+
+    os.makedirs(payslip_folder, exist_ok=True) # Create folder if it doesn't exist
+    os.makedirs(payslip_archive_folder, exist_ok=True)
+
+    payslip_prefix_to_match = f"payslip_{employee_id}_{month_str}_"
+    moved_payslips_count = 0
+
+    # Iterate through files in the current payslip storage directory
+    for existing_filename in os.listdir(payslip_folder):
+        if (existing_filename.startswith(payslip_prefix_to_match) and existing_filename.endswith('.pdf') and existing_filename != saved_filename):
+            old_file_path = os.path.join(payslip_folder, existing_filename)
+            archive_file_path = os.path.join(payslip_archive_folder, existing_filename)
+            
+            try:
+                # Move the old payslip to the archive folder
+                shutil.move(old_file_path, archive_file_path)
+                moved_payslips_count += 1
+                print(f"Moved old payslip '{existing_filename}' to archive.")
+            except Exception as e:
+                print(f"Error moving old payslip '{existing_filename}' to archive: {e}")
+                # Log the error but continue to try saving the new one
+    
+    # Prepare message about moved payslips
+    archive_message = ""
+    if moved_payslips_count > 0:
+        archive_message = f" {moved_payslips_count} old payslip(s) moved to archive."
+    
+    file_path = os.path.join(payslip_folder, saved_filename)
+
+    try:
+        with open(file_path, 'wb') as f:
+            f.write(buffer.getvalue()) # Write the PDF content to the file
+        print(f"Payslip saved to: {file_path}") # Log for confirmation
+        file_saved_message = "Payslip saved to payslips folder." + archive_message
+    except IOError as e:
+        print(f"Error saving payslip to file: {e}")
+        file_saved_message = f"Error saving payslip to folder: {str(e)}" + archive_message
+
+    filename = f"payslip_{employee_id}_{month_str}.pdf"
+
+    # Compose Email
+    subject = f"Payslip for {payroll.month.strftime('%B %Y')}"
+    body = f"Dear {payroll.employee.name},\n\nPlease find the attached payslip for {payroll.month.strftime('%B %Y')}.\n\nBest Regards,\nJivass Technologies"
+    to_email = payroll.employee.email
+
+    email_message = "" # Initialize email message
+    email_failed = False
+
+    if not to_email:
+        email_message = "Email could not be sent (missing employee email)."
+        PAYSLIP_EMAILS.inc(outcome='no_address')
+    else:
+        try:
+            email = EmailMessage(subject, body, to=[to_email])
+            buffer.seek(0)
+            email.attach(filename, buffer.read(), 'application/pdf') 
+            email.send()
+            email_message = "Payslip emailed successfully."
+            PAYSLIP_EMAILS.inc(outcome='sent')
+        except Exception as e:
+            email_message = f"Payslip generated, but failed to email: {str(e)}"
+            email_failed = True
+            PAYSLIP_EMAILS.inc(outcome='failed')
+            # Log the error for debugging
+            print(f"Error sending email for employee {employee_id}, month {month_str}: {e}")
+
+    pdf_binary_data = buffer.getvalue()
+
+    final_message = f"Payslip generated. {file_saved_message}. {email_message}"
+    return {
+        "message": final_message,
+        "pdf": pdf_binary_data,
+        "saved_path": file_path,
+        "email_failed": email_failed,
+    }
@@ -1,39 +1,54 @@
+import calendar
+from django.db.models import F, FilteredRelation, Q
 from rest_framework import viewsets
-from .models import Payroll
+from rest_framework.pagination import PageNumberPagination
+from .models import Payroll, PayrollMonthEvent, PayrollYearTotals, YearEndStatement, financial_year
 from .serializers import PayrollSerializer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from leavedetails.models import LeaveDetails, NoAttendanceRecordsError
+from leavedetails.models import LeaveDetails, MonthClosedError, NoAttendanceRecordsError
 from employee.models import Employee
 from leavedetails.serializers import LeaveDetailsSerializer
 from datetime import datetime
-from django.db import transaction
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.platypus import Table, TableStyle, Paragraph, SimpleDocTemplate, Spacer, Image
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from django.http import FileResponse
+from django.core.files.storage import default_storage
+from django.http import FileResponse, StreamingHttpResponse
 from rest_framework.permissions import IsAuthenticated
-import io
-import os
-import shutil
-from reportlab.lib.units import mm
-from django.conf import settings
-from django.core.mail import EmailMessage
 import base64
+import io
+import tempfile
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.parsers import MultiPartParser, FormParser
 from decimal import Decimal
 import logging
 from django.views.decorators.http import require_GET
+from jobs.utils import enqueue_job, job_accepted_response, wants_async
+from .snapshots import active_snapshot, close_payroll_month, read_snapshot_payslip, reopen_payroll_month
+from .utils import generate_payroll, issue_payslip, preview_payroll, render_payslip_pdf, simulate_payroll
+from .payouts import generate_payout_files
+from .register import iter_csv, iter_register_csv, register_rows, write_register_xlsx, xlsx_available
+from .tds import STATEMENT_HEADER, tds_quarter_totals, tds_statement_rows
+from .ytd import ytd_payslips
+from payroll_management_system.metrics import PAYSLIP_RENDER_SECONDS
 
 class PayrollViewSet(viewsets.ModelViewSet):
     queryset = Payroll.objects.all()
     serializer_class = PayrollSerializer
 
+    def handle_exception(self, exc):
+        if isinstance(exc, MonthClosedError):
+            return Response({"error": str(exc)}, status=status.HTTP_409_CONFLICT)
+        return super().handle_exception(exc)
+
 payroll_logger = logging.getLogger('payroll_operations')
+
+
+def wants_dry_run(request):
+    """True when the client asked for a preview only (`dry_run=1/true/yes`)."""
+    value = request.query_params.get('dry_run') or request.data.get('dry_run') or ''
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
 class GeneratePayrollAPIView(APIView):
     parser_classes = [MultiPartParser, FormParser]
     permission_classes = [IsAuthenticated]
@@ -53,81 +68,50 @@ class GeneratePayrollAPIView(APIView):
         if not all([employee_id, month_str, perform_category]):
             return Response({"error": "Missing required fields."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            with transaction.atomic():
-                month = datetime.strptime(month_str, '%Y-%m').date().replace(day=1)
+        if wants_dry_run(request):
+            try:
+                month_date = datetime.strptime(month_str, '%Y-%m').date()
+            except ValueError:
+                return Response({"error": "Invalid month format. Use YYYY-MM."}, status=status.HTTP_400_BAD_REQUEST)
+            if not Employee.objects.filter(id=employee_id).exists():
+                return Response({"error": "Employee not found."}, status=status.HTTP_404_NOT_FOUND)
+            previews, skipped = preview_payroll(
+                month_date, [employee_id], perform_categories={employee_id: perform_category},
+                reimbursements={employee_id: reimbursement},
+            )
+            if not previews:
+                # Same message LeaveDetails.save raises; also covers joining after the month
                 employee = Employee.objects.get(id=employee_id)
+                return Response({"error": (
+                    f"No attendance record found for employee {employee.id} - {employee.name} "
+                    f"for {month_date.strftime('%B %Y')}. Payroll cannot be generated."
+                )}, status=status.HTTP_400_BAD_REQUEST)
+            leave_record, payroll = previews[0]
+            return Response({
+                "dry_run": True,
+                "leave_details": LeaveDetailsSerializer(leave_record).data,
+                "payroll": PayrollSerializer(payroll).data
+            }, status=status.HTTP_200_OK)
+
+        if wants_async(request):
+            job = enqueue_job('generate_payroll', {
+                "employee_id": employee_id,
+                "month": month_str,
+                "perform_category": perform_category,
+                "reimbursement": str(reimbursement),
+                "performed_by": str(performed_by_user),
+            }, user=request.user, files=[reimbursement_proof] if reimbursement_proof else ())
+            return job_accepted_response(job)
 
-                # Create or update LeaveDetails
-                leave_record, _ = LeaveDetails.objects.get_or_create(employee=employee, month=month)
-                leave_record.save()  # Triggers auto computation
-
-                # Create or update Payroll
-                payroll, created = Payroll.objects.get_or_create(employee=employee, month=month)
-
-                # Store old values for detailed logging if updating
-                old_reimbursement = payroll.reimbursement
-                old_reimbursement_proof_name = os.path.basename(payroll.reimbursement_proof.name) if payroll.reimbursement_proof else None
-
-                payroll.perform_category = perform_category
-                payroll.reimbursement = reimbursement
-                if reimbursement > 0:
-                    # If reimbursement is positive, attempt to set or clear proof based on upload
-                    if reimbursement_proof:
-                        if payroll.reimbursement_proof:
-                            if payroll.reimbursement_proof.file != reimbursement_proof:
-                                payroll.reimbursement_proof.delete(save=False) # Delete old file
-                        payroll.reimbursement_proof = reimbursement_proof
-                    else:
-                        if payroll.reimbursement_proof:
-                            payroll.reimbursement_proof.delete(save=False) # Delete old file
-                        payroll.reimbursement_proof = None
-                else: 
-                    if payroll.reimbursement_proof:
-                        payroll.reimbursement_proof.delete(save=False) # delete=False prevents saving DB here
-                    payroll.reimbursement_proof = None
-
-                if created:
-                    log_message_parts = [
-                        f"Payroll GENERATED for employee: {employee.name} (ID: {employee_id}) ",
-                        f"for month: {month_str} by {performed_by_user}. ",
-                        f"Initial perform_category: {perform_category}, reimbursement: {reimbursement}."
-                    ]
-                    if payroll.reimbursement_proof:
-                        log_message_parts.append(f" Reimbursement proof: '{payroll.reimbursement_proof.name}'.")
-                    else:
-                        log_message_parts.append(" No reimbursement proof expected/provided (reimbursement is zero).")
-
-                    payroll_logger.info("".join(log_message_parts))
-                else:
-                    log_message_parts = [
-                        f"Payroll UPDATED for employee: {employee_id} - {employee.name} "
-                        f"for month: {month_str} by {performed_by_user}."
-                    ]
-                    
-                    if old_reimbursement != reimbursement:
-                        log_message_parts.append(
-                            f" Reimbursement changed from '{old_reimbursement}' to '{reimbursement}'."
-                        )
-                    
-                    new_reimbursement_proof_name = payroll.reimbursement_proof.name if payroll.reimbursement_proof else None
-                    if old_reimbursement_proof_name and not new_reimbursement_proof_name:
-                        log_message_parts.append(f" Reimbursement proof '{old_reimbursement_proof_name}' removed.")
-                    elif not old_reimbursement_proof_name and new_reimbursement_proof_name:
-                        log_message_parts.append(f" Reimbursement proof '{new_reimbursement_proof_name}' added.")
-                    elif old_reimbursement_proof_name and new_reimbursement_proof_name and old_reimbursement_proof_name != new_reimbursement_proof_name:
-                        log_message_parts.append(f" Reimbursement proof changed from '{old_reimbursement_proof_name}' to '{new_reimbursement_proof_name}'.")
-
-                    payroll_logger.info("".join(log_message_parts))
-
-
-                payroll.save()  # Triggers payroll computation
-                payroll_logger.info(f"Payroll computation triggered and saved for employee {employee_id} for month {month_str}.\n")
-
-                return Response({
-                    "leave_details": LeaveDetailsSerializer(leave_record).data,
-                    "payroll": PayrollSerializer(payroll).data
-                }, status=status.HTTP_201_CREATED)
+        try:
+            leave_record, payroll = generate_payroll(
+                employee_id, month_str, perform_category, reimbursement,
+                reimbursement_proof=reimbursement_proof, performed_by_user=performed_by_user,
+            )
+            return Response({
+                "leave_details": LeaveDetailsSerializer(leave_record).data,
+                "payroll": PayrollSerializer(payroll).data
+            }, status=status.HTTP_201_CREATED)
 
         except Employee.DoesNotExist:
             return Response({"error": "Employee not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -136,11 +120,125 @@ class GeneratePayrollAPIView(APIView):
         except NoAttendanceRecordsError as e:
             # Catch the custom exception and return a specific error message
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except MonthClosedError as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
         except Exception as e:
             # Catch any other unexpected errors
             return Response({"error": f"An unexpected error occurred: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
 
+class PayrollPreviewAPIView(APIView):
+    """
+    Dry run of the month's payroll for every employee (or the given
+    employee_id values): per-employee figures and totals, nothing is written.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response({"error": "Only admins can preview payroll runs."}, status=status.HTTP_403_FORBIDDEN)
+
+        month_str = request.query_params.get('month')
+        try:
+            month_date = datetime.strptime(month_str or '', '%Y-%m').date()
+        except ValueError:
+            return Response({"error": "Invalid month format. Use YYYY-MM."}, status=status.HTTP_400_BAD_REQUEST)
+        default_category = request.query_params.get('perform_category', 'NA')
+        if default_category not in dict(Payroll.PERFORMANCE_CHOICES):
+            return Response({"error": "Invalid perform_category."}, status=status.HTTP_400_BAD_REQUEST)
+        employee_ids = request.query_params.getlist('employee_id') or None
+
+        previews, skipped = preview_payroll(month_date, employee_ids, default_perform_category=default_category)
+
+        totals = {field: Decimal('0') for field in ('base_pay_earned', 'perform_comp_payable', 'fee_earned', 'tds', 'reimbursement')}
+        total_net = 0
+        employees = []
+        for leave, payroll in previews:
+            for field in totals:
+                totals[field] += getattr(payroll, field)
+            total_net += payroll.net_fee_earned
+            employees.append({
+                "employee_id": payroll.employee.id,
+                "name": payroll.employee.name,
+                "pay_structure": payroll.pay_structure,
+                "perform_category": payroll.perform_category,
+                "working_days": str(leave.working_days),
+                "days_worked": str(leave.days_worked),
+                "paid_leaves": str(leave.paid_leaves),
+                "sick_leaves": str(leave.sick_leaves),
+                "unpaid_leaves": str(leave.unpaid_leaves),
+                "absent_days": str(leave.absent_days),
+                "fee_per_month": str(payroll.fee_per_month),
+                "base_pay_earned": str(payroll.base_pay_earned),
+                "perform_comp_payable": str(payroll.perform_comp_payable),
+                "fee_earned": str(payroll.fee_earned),
+                "tds": str(payroll.tds),
+                "reimbursement": str(payroll.reimbursement),
+                "net_fee_earned": payroll.net_fee_earned,
+            })
+
+        return Response({
+            "dry_run": True,
+            "month": month_date.strftime('%Y-%m'),
+            "employees": employees,
+            "skipped": [
+                {"employee_id": emp.id, "name": emp.name, "error": "No attendance records for this month."}
+                for emp in skipped
+            ],
+            "totals": {
+                "employees": len(employees),
+                **{field: str(value) for field, value in totals.items()},
+                "net_fee_earned": total_net,
+            },
+        })
+
+
+class PayrollSimulationAPIView(APIView):
+    """
+    What-if projection of a month's payroll (fee changes, performance
+    multipliers or distribution, TDS rate, absence penalty) against the
+    current rules. Nothing is written.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if request.user.role != 'admin':
+            return Response({"error": "Only admins can run payroll simulations."}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            month_date = datetime.strptime(request.data.get('month') or '', '%Y-%m').date()
+        except (TypeError, ValueError):
+            return Response({"error": "Invalid month format. Use YYYY-MM."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = simulate_payroll(
+                month_date,
+                fee_changes=request.data.get('fee_changes'),
+                designation_fee_changes=request.data.get('designation_fee_changes'),
+                multipliers=request.data.get('multipliers'),
+                performance_distribution=request.data.get('performance_distribution'),
+                tds_rate=request.data.get('tds_rate'),
+                absent_penalty=request.data.get('absent_penalty'),
+            )
+        except (ValueError, TypeError, AttributeError) as e:
+            return Response({"error": f"Invalid scenario: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not result["employees"]:
+            return Response(
+                {"error": "No leave details for this month. Generate the payroll first."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(result)
+
+
+def _frozen_payslip_error(snapshot, error):
+    payroll_logger.error(f"Frozen payslip of {snapshot} could not be served: {error}")
+    return Response({
+        "error": "The payslip frozen when this month was closed is missing or no longer matches its recorded "
+                 "hash. Restore the file, or reopen and close the month again."
+    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class GeneratePayslipPDFView(APIView):
 
     def get(self, request):
@@ -156,283 +254,29 @@ class GeneratePayslipPDFView(APIView):
         except LeaveDetails.DoesNotExist:
             return Response({"error": "Leave details not found"}, status=404)
 
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4,
-                                rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
-
-        styles = getSampleStyleSheet()
-        normal = styles["Normal"]
-        bold = ParagraphStyle("Bold", parent=normal, fontName="Helvetica-Bold", fontSize=10)
-        company_info_style = ParagraphStyle(
-            name='CompanyInfo',
-            parent=normal,
-            leading=12, # Line spacing
-            alignment=1
-        )
-        center_aligned_bold = ParagraphStyle(name='CenterAlignedBold', parent=bold, alignment=1, fontSize=12, leading=16)
-        
-        table_text_style = ParagraphStyle(name='TableText', parent=normal, fontSize=9)
-        table_label_style = ParagraphStyle(name='TableLabel', parent=bold, fontSize=9)
-
-        fee_header_style = ParagraphStyle(name='FeeHeader', parent=bold, fontSize=10, alignment=1)
-        fee_net_style = ParagraphStyle(name='FeeNet', parent=bold, fontSize=10, alignment=0) 
-        fee_label_style = ParagraphStyle(name='FeeLabel', parent=normal, fontSize=9, alignment=0)
-        fee_value_style = ParagraphStyle(name='FeeValue', parent=normal, fontSize=9, alignment=2)
-        fee_total_style = ParagraphStyle(name='FeeTotal', parent=bold, fontSize=9, alignment=1)
-
-        gen_style = ParagraphStyle(name='Gen', parent=normal, fontSize=9, alignment=1)
-        
-        leave_heading_style = ParagraphStyle(name='LeaveHeading', parent=bold, fontSize=10, alignment=1)
-        leave_table_header_style = ParagraphStyle(name='LeaveTableHeader', parent=bold, fontSize=9, alignment=1)
-        leave_table_value_style = ParagraphStyle(name='LeaveTableValue', parent=normal, fontSize=9, alignment=1)
-        leave_balance_style = ParagraphStyle(name='LeaveBalance', parent=bold, fontSize=9, alignment=1) 
-
-        
-        elements = []
-
-        company_name = Paragraph(
-            '<para alignment="center"><font size="14" face="Helvetica-Bold">Jivass Technologies</font></para>',
-            company_info_style
-        )
-
-        company_details = Paragraph(
-            '<font size="8" face="Helvetica-Bold">F1, Ashwamedha, No 121, Velachery Main Road, Chennai – 600032,<br/>'
-            'Phone: 9840694738 Email: contact@jivass.com</font>',
-            company_info_style
-        )
-
-        company_info_cell = [company_name, Spacer(1, 8), company_details]
-
-        # Header with Logo + Company Info + Title
-        logo_path = os.path.join(settings.BASE_DIR, "static/images/jivass_technologies_logo.jpeg")
-        header_table = Table([
-            [
-                Image(logo_path, width=10 * mm, height=10 * mm),
-                company_info_cell,
-                Paragraph(f"<b>Consultant Pay Slip</b><br/> {payroll.month.strftime('%B %Y')}", center_aligned_bold)
-            ]
-        ], colWidths=[40, 320, 140])
-        header_table.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (0, -1), 'TOP'),
-            ('VALIGN', (1, 0), (-1, -1), 'MIDDLE'),
-            ('ALIGN', (0, 0), (0, 0), 'LEFT'), # Logo left align
-            ('ALIGN', (1, 0), (1, 0), 'CENTER'), # Company info left align within its cell
-            ('BOX', (0, 0), (1, 0), 1, colors.black),
-            ('ALIGN', (2, 0), (2, 0), 'CENTER'), # Pay Slip title right align
-            ('BOX', (2, 0), (2, 0), 1, colors.black), # Border around Pay Slip cell
-            ('TOPPADDING', (1,0), (2,0), 10),
-            ('TOPPADDING', (0,0), (0,0), 5),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 10),
-        ]))
-        elements.append(header_table)
-       
-        # Employee Info Table
-        emp = payroll.employee
-        emp_info_data = [
-            [Paragraph('Consultant ID:', table_label_style), Paragraph(str(emp.id), table_label_style), '', Paragraph('Date of Joining:', table_label_style), Paragraph(emp.date_joined.strftime('%d/%m/%Y'), table_label_style)],
-            [Paragraph('Name:', table_label_style), Paragraph(emp.name, table_text_style), '', '', ''],
-            [Paragraph('Designation:', table_label_style), Paragraph(emp.designation or "N/A", table_text_style), '', '', ''],
-            [Paragraph('PAN:', table_label_style), Paragraph(emp.pan_no or "N/A", table_text_style), '', '', ''],
-            [Paragraph('Mobile:', table_label_style), Paragraph(emp.phone_no or "N/A", table_text_style), '', '', ''],
-            [Paragraph('Email:', table_label_style), Paragraph(emp.email or "N/A", table_text_style), '', '', '']
-        ]
-
-        emp_info_col_widths = [88, 194, 20, 78, 120] # Adjusted to sum to page width (~500 points)
-
-        emp_info_table = Table(emp_info_data, colWidths=emp_info_col_widths)
-        emp_info_table.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 1, colors.black), # Main box border
-            #('GRID', (0,0), (-1,-1), 0.25, colors.black), # Internal grid lines, thinner
-            ('LINEBELOW', (0, 0), (-1, 0), 0.35, colors.lightgrey),  
-            ('LINEBELOW', (0, 1), (-1, 1), 0.35, colors.lightgrey),
-            ('LINEBELOW', (0, 2), (-1, 2), 0.35, colors.lightgrey),
-            ('LINEBELOW', (0, 3), (-1, 3), 0.35, colors.lightgrey),
-            ('LINEBELOW', (0, 4), (-1, 4), 0.35, colors.lightgrey),
-            ('SPAN', (1, 1), (-1, 1)), # Name spans across remaining columns
-            ('SPAN', (1, 2), (-1, 2)), # Designation spans
-            ('SPAN', (1, 3), (-1, 3)), # PAN spans
-            ('SPAN', (1, 4), (-1, 4)), # Mobile spans
-            ('SPAN', (1, 5), (-1, 5)), # Email spans
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('LEFTPADDING', (0,0), (-1,-1), 5),
-            ('LEFTPADDING', (4,0), (4,0), 0),
-            ('RIGHTPADDING', (0,0), (-1,-1), 5),
-            ('TOPPADDING', (0,0), (-1,-1), 4),
-            ('BOTTOMPADDING', (0,4), (-1,4), 3),
-            ('BOTTOMPADDING', (0,5), (-1,5), 5),
-        ]))
-        elements.append(emp_info_table)
-        elements.append(Spacer(1, 15))
-
-        
-        # Consultant Fee Details
-        fee_table_data = [
-            # Header row (Row 0)
-            [Paragraph('Consultant Fee Details', fee_header_style), '', '', '', '', ''],
-            # (Row 1)
-            ['', '', '', '','', Paragraph('Total', fee_total_style)],
-            #(Row 2)
-            [Paragraph(f'Month : <b>{payroll.month.strftime("%B")}</b>', fee_label_style), Paragraph('Base Pay Earned :', fee_label_style) ,Paragraph(f"{payroll.base_pay_earned:,.2f}", fee_value_style), '','',''],
-            # (Row 3)
-            [Paragraph(f'Working Days : {leave.working_days}', fee_label_style),Paragraph('Variable Pay Earned :', fee_label_style) ,Paragraph(f"{payroll.perform_comp_payable:,.2f}", fee_value_style), '','',''],
-            # (Row 4)
-            [Paragraph(f'Days Worked : {leave.days_worked}', fee_label_style), Paragraph('Fee Earned :', fee_label_style) ,Paragraph(f"{payroll.fee_earned:,.2f}", fee_value_style), Paragraph('TDS Deducted :', fee_label_style),Paragraph(f"{payroll.tds:,.2f}", fee_value_style) ,Paragraph(f"{(payroll.fee_earned - payroll.tds):,.2f}", fee_value_style)],
-            # (Row 5)
-            [Paragraph(f'Absent Days : {leave.absent_days}', fee_label_style), Paragraph('Reimbursement :', fee_label_style), Paragraph(f"{payroll.reimbursement:,.2f}", fee_value_style), '', '', Paragraph(f"{payroll.reimbursement:,.2f}", fee_value_style)],
-            # (Row 6)
-            [Paragraph('Total', fee_total_style), '', Paragraph(f"{(payroll.fee_earned + payroll.reimbursement):,.2f}", fee_value_style), '', Paragraph(f"{payroll.tds:,.2f}", fee_value_style),Paragraph(f"{(payroll.fee_earned - payroll.tds + payroll.reimbursement):,.2f}", fee_value_style)],
-            # Net Fee Earned row (Row 7)
-            [Paragraph('Net Fee Earned :', fee_header_style),Paragraph(f"{payroll.net_fee_earned}", fee_net_style), '', Paragraph(f"Generated On : {payroll.generated_on.strftime('%d/%m/%Y')},{payroll.generated_time.strftime('%H:%M:%S')}", gen_style), '', ''],
-        ]
-
-        fee_col_widths = [120, 100, 60, 85, 55, 80] # Adjusted to sum to page width (~500 points)
-
-        fee_table = Table(fee_table_data, colWidths=fee_col_widths)
-        fee_table.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-            #('GRID', (0, 0), (-1, -1), 0.25, colors.black),
-            ('LINEAFTER', (0, 0), (0, 6), 0.75, colors.black),
-            ('LINEAFTER', (2, 0), (2, 6), 0.75, colors.black),
-            ('LINEAFTER', (4, 0), (4, 6), 0.75, colors.black),
-            ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
-            ('LINEBELOW', (0, 1), (-1, 1), 0.75, colors.black),
-            ('LINEBELOW', (0, 5), (-1, 6), 0.75, colors.black),
-            ('LINEBELOW', (0, 2), (-1, 4), 0.35, colors.lightgrey),
-            ('SPAN', (0, 0), (-1, 0)), # 'Consultant Fee Details'
-            ('SPAN', (3, -1), (5, -1)),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0,0), (-1,-1), 4),
-            ('TOPPADDING', (0,7), (-1,7), 5),
-            ('BOTTOMPADDING', (0,0), (-1,6), 3),
-            ('BOTTOMPADDING', (0,7), (-1,7), 5),
-            ('LEFTPADDING', (0,0), (-1,-1), 5),
-            ('LEFTPADDING', (2,0), (2,-1), 0),
-            ('LEFTPADDING', (4,0), (4,-1), 0),
-            ('RIGHTPADDING', (0,0), (-1,-1), 5),
-            ('RIGHTPADDING', (1,0), (1,-1), 0),
-            ('RIGHTPADDING', (3,0), (3,-1), 0),
-        ]))
-        elements.append(fee_table)
-        elements.append(Spacer(1, 15))
-
-        
-        leave_table_data = [
-            [Paragraph('Leave Details', leave_heading_style), '', '', ''],
-            [Paragraph('Paid Leaves', leave_table_header_style), Paragraph('Sick Leaves', leave_table_header_style), Paragraph('Unpaid Leaves', leave_table_header_style), Paragraph('Total leaves Taken', leave_table_header_style)],
-            [Paragraph(str(leave.paid_leaves), leave_table_value_style), Paragraph(str(leave.sick_leaves), leave_table_value_style), Paragraph(str(leave.unpaid_leaves), leave_table_value_style), Paragraph(str(leave.total_leaves_taken), leave_table_value_style)],
-            [Paragraph(f"Leave Balance : {leave.total_paid_leaves_left} Days", leave_balance_style), '', Paragraph(f"Sick Leave Balance : {leave.total_sick_leaves_left} Days", leave_balance_style), '']
-        ]
-
-        leave_table = Table(leave_table_data, colWidths=[85, 85, 85, 105]) 
-        leave_table.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
-            ('SPAN', (0, 0), (-1, 0)),
-            ('SPAN', (0, 3), (1, 3)), # Span for Leave Balance
-            ('SPAN', (2, 3), (3, 3)), # Span for Sick Leave Balance
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('LEFTPADDING', (0,0), (-1,-1), 5),
-            ('RIGHTPADDING', (0,0), (-1,-1), 5),
-            ('TOPPADDING', (0,0), (-1,-1), 4),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 3),
-            ('BOTTOMPADDING', (0,-1), (-1,-1), 5),
-        ]))
-        #elements.append(leave_table)
-        wrapper_table = Table([[leave_table]], colWidths=[500])  # match outer width
-        wrapper_table.setStyle(TableStyle([
-            ('LEFTPADDING', (0, 0), (-1, -1), 0),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ]))
-        elements.append(wrapper_table)
-
-        doc.build(elements)
-        buffer.seek(0)
-
-        generated_date_for_filename = payroll.generated_on.strftime('%Y-%m-%d')
-        generated_time_for_filename = payroll.generated_time.strftime('%H-%M-%S')
-        saved_filename = f"payslip_{employee_id}_{month_str}_gen-{generated_date_for_filename},{generated_time_for_filename}.pdf"
-
-        # Create the full path for the file
-        payslip_folder = settings.PAYSLIP_STORAGE_DIR # Use the path from settings
-        payslip_archive_folder = settings.PAYSLIP_ARCHIVE_DIR
-
-        os.makedirs(payslip_folder, exist_ok=True) # Create folder if it doesn't exist
-        os.makedirs(payslip_archive_folder, exist_ok=True)
-
-        payslip_prefix_to_match = f"payslip_{employee_id}_{month_str}_"
-        moved_payslips_count = 0
-
-        # Iterate through files in the current payslip storage directory
-        for existing_filename in os.listdir(payslip_folder):
-            if (existing_filename.startswith(payslip_prefix_to_match) and existing_filename.endswith('.pdf') and existing_filename != saved_filename):
-                old_file_path = os.path.join(payslip_folder, existing_filename)
-                archive_file_path = os.path.join(payslip_archive_folder, existing_filename)
-                
-                try:
-                    # Move the old payslip to the archive folder
-                    shutil.move(old_file_path, archive_file_path)
-                    moved_payslips_count += 1
-                    print(f"Moved old payslip '{existing_filename}' to archive.")
-                except Exception as e:
-                    print(f"Error moving old payslip '{existing_filename}' to archive: {e}")
-                    # Log the error but continue to try saving the new one
-        
-        # Prepare message about moved payslips
-        archive_message = ""
-        if moved_payslips_count > 0:
-            archive_message = f" {moved_payslips_count} old payslip(s) moved to archive."
-        
-        file_path = os.path.join(payslip_folder, saved_filename)
-
-        try:
-            with open(file_path, 'wb') as f:
-                f.write(buffer.getvalue()) # Write the PDF content to the file
-            print(f"Payslip saved to: {file_path}") # Log for confirmation
-            file_saved_message = "Payslip saved to payslips folder." + archive_message
-        except IOError as e:
-            print(f"Error saving payslip to file: {e}")
-            file_saved_message = f"Error saving payslip to folder: {str(e)}" + archive_message
-
-        filename = f"payslip_{employee_id}_{month_str}.pdf"
-
-        # Compose Email
-        subject = f"Payslip for {payroll.month.strftime('%B %Y')}"
-        body = f"Dear {payroll.employee.name},\n\nPlease find the attached payslip for {payroll.month.strftime('%B %Y')}.\n\nBest Regards,\nJivass Technologies"
-        to_email = payroll.employee.email
-
-        email_message = "" # Initialize email message
-        email_status_code = status.HTTP_200_OK
-
-        if not to_email:
-            email_message = "Email could not be sent (missing employee email)."
-        else:
+        if wants_async(request):
+            job = enqueue_job(
+                'generate_payslip', {"employee_id": employee_id, "month": month_str},
+                user=request.user,
+            )
+            return job_accepted_response(job)
+
+        # Closed months send the payslip frozen at close time
+        snapshot = active_snapshot(employee_id, month_date)
+        pdf = None
+        if snapshot:
             try:
-                email = EmailMessage(subject, body, to=[to_email])
-                buffer.seek(0)
-                email.attach(filename, buffer.read(), 'application/pdf') 
-                email.send()
-                email_message = "Payslip emailed successfully."
-            except Exception as e:
-                email_message = f"Payslip generated, but failed to email: {str(e)}"
-                email_status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
-                # Log the error for debugging
-                print(f"Error sending email for employee {employee_id}, month {month_str}: {e}")
-
-        buffer.seek(0)
-
-        pdf_binary_data = buffer.getvalue()
-        pdf_base64_string = base64.b64encode(pdf_binary_data).decode('utf-8')
-
-        final_message = f"Payslip generated. {file_saved_message}. {email_message}"
+                pdf = read_snapshot_payslip(snapshot)
+            except (OSError, ValueError) as e:
+                return _frozen_payslip_error(snapshot, e)
+        result = issue_payslip(payroll, leave, employee_id, month_str, pdf=pdf)
+        pdf_base64_string = base64.b64encode(result["pdf"]).decode('utf-8')
 
         return Response({
-            "message": final_message,
+            "message": result["message"],
             "pdf_data": pdf_base64_string,
-            "saved_path": file_path # Include the saved path in the response
-        }, status=email_status_code if email_status_code != status.HTTP_200_OK else status.HTTP_200_OK)
+            "saved_path": result["saved_path"] # Include the saved path in the response
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR if result["email_failed"] else status.HTTP_200_OK)
 
 
 class DownloadPayslipPDFView(APIView):
@@ -450,221 +294,284 @@ class DownloadPayslipPDFView(APIView):
         except LeaveDetails.DoesNotExist:
             return Response({"error": "Leave details not found"}, status=404)
 
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4,
-                                rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
-
-        styles = getSampleStyleSheet()
-        normal = styles["Normal"]
-        bold = ParagraphStyle("Bold", parent=normal, fontName="Helvetica-Bold", fontSize=10)
-        company_info_style = ParagraphStyle(
-            name='CompanyInfo',
-            parent=normal,
-            leading=12, # Line spacing
-            alignment=1
-        )
-        center_aligned_bold = ParagraphStyle(name='CenterAlignedBold', parent=bold, alignment=1, fontSize=12, leading=16)
+        snapshot = active_snapshot(employee_id, month_date)
+        if snapshot:
+            try:
+                buffer = io.BytesIO(read_snapshot_payslip(snapshot))
+            except (OSError, ValueError) as e:
+                return _frozen_payslip_error(snapshot, e)
+        else:
+            with PAYSLIP_RENDER_SECONDS.time(view='download'):
+                buffer = render_payslip_pdf(payroll, leave)
         
-        table_text_style = ParagraphStyle(name='TableText', parent=normal, fontSize=9)
-        table_label_style = ParagraphStyle(name='TableLabel', parent=bold, fontSize=9)
+        filename = f"payslip_{employee_id}_{month_str}.pdf"
 
-        fee_header_style = ParagraphStyle(name='FeeHeader', parent=bold, fontSize=10, alignment=1)
-        fee_net_style = ParagraphStyle(name='FeeNet', parent=bold, fontSize=10, alignment=0) 
-        fee_label_style = ParagraphStyle(name='FeeLabel', parent=normal, fontSize=9, alignment=0)
-        fee_value_style = ParagraphStyle(name='FeeValue', parent=normal, fontSize=9, alignment=2)
-        fee_total_style = ParagraphStyle(name='FeeTotal', parent=bold, fontSize=9, alignment=1)
+        return FileResponse(buffer, as_attachment=True, filename=filename, content_type='application/pdf')
+    
 
-        gen_style = ParagraphStyle(name='Gen', parent=normal, fontSize=9, alignment=1)
+class MyPayslipsAPIView(APIView):
+    permission_classes = [IsAuthenticated]
 
-        leave_heading_style = ParagraphStyle(name='LeaveHeading', parent=bold, fontSize=10, alignment=1)
-        leave_table_header_style = ParagraphStyle(name='LeaveTableHeader', parent=bold, fontSize=9, alignment=1)
-        leave_table_value_style = ParagraphStyle(name='LeaveTableValue', parent=normal, fontSize=9, alignment=1)
-        leave_balance_style = ParagraphStyle(name='LeaveBalance', parent=bold, fontSize=9, alignment=1) 
+    def get(self, request):
+        """
+        The user's payslips, newest first, with running year-to-date totals
+        over the April-March financial year, in one query. Closed months
+        report the figures frozen at close time. ?financial_year=2025 limits
+        the list to April 2025 - March 2026; admins may pass ?employee_id.
+        """
+        employee_id = request.user.id
+        if request.query_params.get('employee_id'):
+            if request.user.role != 'admin':
+                return Response({"error": "Only admins can view other employees' payslips."}, status=status.HTTP_403_FORBIDDEN)
+            employee_id = request.query_params['employee_id']
+        year = request.query_params.get('financial_year')
+        if year is not None:
+            try:
+                year = int(year)
+            except ValueError:
+                return Response({"error": "financial_year must be a year, e.g. 2025."}, status=status.HTTP_400_BAD_REQUEST)
 
-        
-        elements = []
+        data = ytd_payslips(employee_id=employee_id, year=year)
+        for row in data:
+            row['month'] = row['month'].strftime('%Y-%m')
+        return Response(data)
+
+
+class PayrollYearTotalsAPIView(APIView):
+    """
+    GET (admin only): each employee's payroll totals for a financial year,
+    from PayrollYearTotals. ?financial_year defaults to the current one;
+    ?employee_id narrows it to one employee.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response({"error": "Only admins can view payroll totals."}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            year = int(request.query_params.get('financial_year') or financial_year(datetime.now().date()))
+        except ValueError:
+            return Response({"error": "financial_year must be a year, e.g. 2025."}, status=status.HTTP_400_BAD_REQUEST)
+
+        totals = PayrollYearTotals.objects.filter(financial_year=year)
+        if request.query_params.get('employee_id'):
+            totals = totals.filter(employee_id=request.query_params['employee_id'])
+        rows = list(totals.order_by('employee_id').values(
+            'employee_id', 'months', 'fee_earned', 'tds', 'reimbursement', 'net_fee_earned',
+            employee_name=F('employee__name'),
+        ))
+        return Response({"financial_year": year, "count": len(rows), "results": rows})
+
+
+class YearEndStatementView(APIView):
+    """
+    Year-end earnings statements of a financial year (year-end/<year>/).
+    GET lists the indexed statements: all of them for admins (?employee_id
+    narrows it), else the user's own. POST (admin only, body: force)
+    queues the `year_end_statements` job that renders the missing ones.
+    year-end/<year>/download/ returns one PDF (?employee_id for admins).
+    """
+    permission_classes = [IsAuthenticated]
+    download = False
+
+    def _employee_id(self, request):
+        if request.user.role == 'admin':
+            return request.query_params.get('employee_id')
+        return request.user.id
+
+    def get(self, request, year):
+        statements = YearEndStatement.objects.filter(financial_year=year)
+        employee_id = self._employee_id(request)
+        if employee_id:
+            statements = statements.filter(employee_id=employee_id)
+
+        if self.download:
+            statement = statements.first() if employee_id else None
+            if statement is None:
+                return Response({"error": "Statement not found"}, status=status.HTTP_404_NOT_FOUND)
+            return FileResponse(
+                statement.pdf.open('rb'), as_attachment=True, content_type='application/pdf',
+                filename=f"year_end_statement_{statement.employee_id}_FY{year}.pdf",
+            )
+        return Response(list(statements.order_by('employee_id').values(
+            'employee_id', 'months', 'fee_earned', 'tds', 'reimbursement', 'net_fee_earned',
+            'pdf_sha256', 'generated_at',
+        )))
+
+    def post(self, request, year):
+        if self.download or request.user.role != 'admin':
+            return Response({"error": "Only admins can generate year-end statements."}, status=status.HTTP_403_FORBIDDEN)
+        job = enqueue_job('year_end_statements', {
+            "financial_year": year, "force": bool(request.data.get('force')),
+        }, user=request.user)
+        return job_accepted_response(job)
+
+
+class TdsReportView(APIView):
+    """
+    GET (admin only) tds/?financial_year=2025: TDS per quarter of the
+    financial year. tds/statement/?financial_year=2025[&quarter=1] streams
+    the deductee-wise statement (one row per quarter and PAN) as CSV.
+    """
+    permission_classes = [IsAuthenticated]
+    statement = False
 
-        company_name = Paragraph(
-            '<para alignment="center"><font size="14" face="Helvetica-Bold">Jivass Technologies</font></para>',
-            company_info_style
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response({"error": "Only admins can view TDS reports."}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            year = int(request.query_params.get('financial_year') or financial_year(datetime.now().date()))
+            quarter = request.query_params.get('quarter')
+            quarter = int(quarter) if quarter else None
+        except ValueError:
+            return Response({"error": "financial_year and quarter must be numbers."}, status=status.HTTP_400_BAD_REQUEST)
+        if quarter is not None and quarter not in (1, 2, 3, 4):
+            return Response({"error": "quarter must be 1 to 4."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not self.statement:
+            quarters = tds_quarter_totals(year)
+            if quarter is not None:
+                quarters = [q for q in quarters if q['quarter'] == quarter]
+            return Response({"financial_year": year, "quarters": quarters})
+
+        payroll_logger.info(f"TDS statement FY {year} Q{quarter or '1-4'} exported by {request.user.id}")
+        response = StreamingHttpResponse(
+            iter_csv(STATEMENT_HEADER, tds_statement_rows(year, quarter)), content_type='text/csv'
         )
+        suffix = f"_Q{quarter}" if quarter else ""
+        response['Content-Disposition'] = f'attachment; filename=tds_statement_FY{year}{suffix}.csv'
+        return response
+
+
+class PayrollRegisterExportView(APIView):
+    """
+    GET (admin only): the payroll register with the month's leave details,
+    one row per employee and month, for ?month=YYYY-MM or ?start=YYYY-MM
+    &end=YYYY-MM. ?file_type=csv (default) streams the CSV as rows are read;
+    ?file_type=xlsx builds a workbook in a temporary file (needs openpyxl).
+    """
+    permission_classes = [IsAuthenticated]
 
-        company_details = Paragraph(
-            '<font size="8" face="Helvetica-Bold">F1, Ashwamedha, No 121, Velachery Main Road, Chennai – 600032,<br/>'
-            'Phone: 9840694738 Email: contact@jivass.com</font>',
-            company_info_style
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response({"error": "Only admins can export the payroll register."}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            start = datetime.strptime(request.query_params.get('start') or request.query_params['month'], '%Y-%m').date()
+            end = datetime.strptime(request.query_params.get('end') or request.query_params['month'], '%Y-%m').date()
+        except (KeyError, ValueError):
+            return Response({"error": "Pass month, or start and end, as YYYY-MM."}, status=status.HTTP_400_BAD_REQUEST)
+        if end < start:
+            return Response({"error": "end must not be before start."}, status=status.HTTP_400_BAD_REQUEST)
+        file_type = request.query_params.get('file_type', 'csv')
+        if file_type not in ('csv', 'xlsx'):
+            return Response({"error": "file_type must be 'csv' or 'xlsx'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        filename = f"payroll_register_{start:%Y-%m}" + (f"_{end:%Y-%m}" if end != start else "")
+        payroll_logger.info(
+            f"Payroll register {start:%Y-%m}..{end:%Y-%m} exported as {file_type} by {request.user.id}"
         )
+        if file_type == 'xlsx':
+            if not xlsx_available():
+                return Response({"error": "XLSX export needs openpyxl installed; use file_type=csv."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            workbook = tempfile.TemporaryFile()
+            write_register_xlsx(register_rows(start, end), workbook)
+            workbook.seek(0)
+            return FileResponse(
+                workbook, as_attachment=True, filename=f"{filename}.xlsx",
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            )
+
+        response = StreamingHttpResponse(iter_register_csv(register_rows(start, end)), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename={filename}.csv'
+        return response
+
+
+class PayrollMonthView(APIView):
+    """
+    GET: whether a payroll month is closed, with its close/reopen history.
+    POST .../close/ freezes the month into snapshots (async=1 runs it as a
+    background job); POST .../reopen/ with a reason reopens it; POST
+    .../payouts/ writes the bank payout files of a closed month (async=1
+    supported). Admin only.
+    """
+    permission_classes = [IsAuthenticated]
+    action = None
 
-        company_info_cell = [company_name, Spacer(1, 8), company_details]
-
-        # Header with Logo + Company Info + Title
-        logo_path = os.path.join(settings.BASE_DIR, "static/images/jivass_technologies_logo.jpeg")
-        header_table = Table([
-            [
-                Image(logo_path, width=10 * mm, height=10 * mm),
-                company_info_cell,
-                Paragraph(f"<b>Consultant Pay Slip</b><br/> {payroll.month.strftime('%B %Y')}", center_aligned_bold)
-            ]
-        ], colWidths=[40, 320, 140])
-        header_table.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (0, -1), 'TOP'),
-            ('VALIGN', (1, 0), (-1, -1), 'MIDDLE'),
-            ('ALIGN', (0, 0), (0, 0), 'LEFT'), # Logo left align
-            ('ALIGN', (1, 0), (1, 0), 'CENTER'), # Company info left align within its cell
-            ('BOX', (0, 0), (1, 0), 1, colors.black),
-            ('ALIGN', (2, 0), (2, 0), 'CENTER'), # Pay Slip title right align
-            ('BOX', (2, 0), (2, 0), 1, colors.black), # Border around Pay Slip cell
-            ('TOPPADDING', (1,0), (2,0), 10),
-            ('TOPPADDING', (0,0), (0,0), 5),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 10),
-        ]))
-        elements.append(header_table)
-       
-        # Employee Info Table
-        emp = payroll.employee
-        emp_info_data = [
-            [Paragraph('Consultant ID:', table_label_style), Paragraph(str(emp.id), table_label_style), '', Paragraph('Date of Joining:', table_label_style), Paragraph(emp.date_joined.strftime('%d/%m/%Y'), table_label_style)],
-            [Paragraph('Name:', table_label_style), Paragraph(emp.name, table_text_style), '', '', ''],
-            [Paragraph('Designation:', table_label_style), Paragraph(emp.designation or "N/A", table_text_style), '', '', ''],
-            [Paragraph('PAN:', table_label_style), Paragraph(emp.pan_no or "N/A", table_text_style), '', '', ''],
-            [Paragraph('Mobile:', table_label_style), Paragraph(emp.phone_no or "N/A", table_text_style), '', '', ''],
-            [Paragraph('Email:', table_label_style), Paragraph(emp.email or "N/A", table_text_style), '', '', '']
-        ]
-
-        emp_info_col_widths = [88, 194, 20, 78, 120] # Adjusted to sum to page width (~500 points)
-
-        emp_info_table = Table(emp_info_data, colWidths=emp_info_col_widths)
-        emp_info_table.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 1, colors.black), # Main box border
-            #('GRID', (0,0), (-1,-1), 0.25, colors.black), # Internal grid lines, thinner
-            ('LINEBELOW', (0, 0), (-1, 0), 0.35, colors.lightgrey),  
-            ('LINEBELOW', (0, 1), (-1, 1), 0.35, colors.lightgrey),
-            ('LINEBELOW', (0, 2), (-1, 2), 0.35, colors.lightgrey),
-            ('LINEBELOW', (0, 3), (-1, 3), 0.35, colors.lightgrey),
-            ('LINEBELOW', (0, 4), (-1, 4), 0.35, colors.lightgrey),
-            ('SPAN', (1, 1), (-1, 1)), # Name spans across remaining columns
-            ('SPAN', (1, 2), (-1, 2)), # Designation spans
-            ('SPAN', (1, 3), (-1, 3)), # PAN spans
-            ('SPAN', (1, 4), (-1, 4)), # Mobile spans
-            ('SPAN', (1, 5), (-1, 5)), # Email spans
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('LEFTPADDING', (0,0), (-1,-1), 5),
-            ('LEFTPADDING', (4,0), (4,0), 0),
-            ('RIGHTPADDING', (0,0), (-1,-1), 5),
-            ('TOPPADDING', (0,0), (-1,-1), 4),
-            ('BOTTOMPADDING', (0,4), (-1,4), 3),
-            ('BOTTOMPADDING', (0,5), (-1,5), 5),
-        ]))
-        elements.append(emp_info_table)
-        elements.append(Spacer(1, 15))
+    def _month(self, month_str):
+        try:
+            return datetime.strptime(month_str, '%Y-%m').date()
+        except ValueError:
+            return None
 
-        
-        # Consultant Fee Details
-        fee_table_data = [
-            # Header row (Row 0)
-            [Paragraph('Consultant Fee Details', fee_header_style), '', '', '', '', ''],
-            # (Row 1)
-            ['', '', '', '','', Paragraph('Total', fee_total_style)],
-            #(Row 2)
-            [Paragraph(f'Month : <b>{payroll.month.strftime("%B")}</b>', fee_label_style), Paragraph('Base Pay Earned :', fee_label_style) ,Paragraph(f"{payroll.base_pay_earned:,.2f}", fee_value_style), '','',''],
-            # (Row 3)
-            [Paragraph(f'Working Days : {leave.working_days}', fee_label_style),Paragraph('Variable Pay Earned :', fee_label_style) ,Paragraph(f"{payroll.perform_comp_payable:,.2f}", fee_value_style), '','',''],
-            # (Row 4)
-            [Paragraph(f'Days Worked : {leave.days_worked}', fee_label_style), Paragraph('Fee Earned :', fee_label_style) ,Paragraph(f"{payroll.fee_earned:,.2f}", fee_value_style), Paragraph('TDS Deducted :', fee_label_style),Paragraph(f"{payroll.tds:,.2f}", fee_value_style) ,Paragraph(f"{(payroll.fee_earned - payroll.tds):,.2f}", fee_value_style)],
-            # (Row 5)
-            [Paragraph(f'Absent Days : {leave.absent_days}', fee_label_style), Paragraph('Reimbursement :', fee_label_style), Paragraph(f"{payroll.reimbursement:,.2f}", fee_value_style), '', '', Paragraph(f"{payroll.reimbursement:,.2f}", fee_value_style)],
-            # (Row 6)
-            [Paragraph('Total', fee_total_style), '', Paragraph(f"{(payroll.fee_earned + payroll.reimbursement):,.2f}", fee_value_style), '', Paragraph(f"{payroll.tds:,.2f}", fee_value_style),Paragraph(f"{(payroll.fee_earned - payroll.tds + payroll.reimbursement):,.2f}", fee_value_style)],
-            # Net Fee Earned row (Row 7)
-            [Paragraph('Net Fee Earned :', fee_header_style),Paragraph(f"{payroll.net_fee_earned}", fee_net_style), '', Paragraph(f"Generated On : {payroll.generated_on.strftime('%d/%m/%Y')},{payroll.generated_time.strftime('%H:%M:%S')}", gen_style), '', ''],
-        ]
-
-        fee_col_widths = [120, 100, 60, 85, 55, 80] # Adjusted to sum to page width (~500 points)
-
-        fee_table = Table(fee_table_data, colWidths=fee_col_widths)
-        fee_table.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-            #('GRID', (0, 0), (-1, -1), 0.25, colors.black),
-            ('LINEAFTER', (0, 0), (0, 6), 0.75, colors.black),
-            ('LINEAFTER', (2, 0), (2, 6), 0.75, colors.black),
-            ('LINEAFTER', (4, 0), (4, 6), 0.75, colors.black),
-            ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
-            ('LINEBELOW', (0, 1), (-1, 1), 0.75, colors.black),
-            ('LINEBELOW', (0, 5), (-1, 6), 0.75, colors.black),
-            ('LINEBELOW', (0, 2), (-1, 4), 0.35, colors.lightgrey),
-            ('SPAN', (0, 0), (-1, 0)), # 'Consultant Fee Details'
-            ('SPAN', (3, -1), (5, -1)),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0,0), (-1,-1), 4),
-            ('TOPPADDING', (0,7), (-1,7), 5),
-            ('BOTTOMPADDING', (0,0), (-1,6), 3),
-            ('BOTTOMPADDING', (0,7), (-1,7), 5),
-            ('LEFTPADDING', (0,0), (-1,-1), 5),
-            ('LEFTPADDING', (2,0), (2,-1), 0),
-            ('LEFTPADDING', (4,0), (4,-1), 0),
-            ('RIGHTPADDING', (0,0), (-1,-1), 5),
-            ('RIGHTPADDING', (1,0), (1,-1), 0),
-            ('RIGHTPADDING', (3,0), (3,-1), 0),
-        ]))
-        elements.append(fee_table)
-        elements.append(Spacer(1, 15))
+    def get(self, request, month):
+        if request.user.role != 'admin':
+            return Response({"error": "Only admins can view payroll month status."}, status=status.HTTP_403_FORBIDDEN)
+        month_date = self._month(month)
+        if month_date is None:
+            return Response({"error": "Invalid month format. Use YYYY-MM."}, status=status.HTTP_400_BAD_REQUEST)
+        events = PayrollMonthEvent.objects.filter(month=month_date).select_related('performed_by')
+        return Response({
+            "month": month,
+            "closed": PayrollMonthEvent.is_closed(month_date),
+            "events": [
+                {
+                    "action": event.action,
+                    "performed_by": event.performed_by.id if event.performed_by else None,
+                    "reason": event.reason,
+                    "snapshot_count": event.snapshot_count,
+                    "created_at": event.created_at,
+                }
+                for event in events
+            ],
+        })
+
+    def post(self, request, month):
+        if self.action is None:
+            return Response({"error": "POST to close/, reopen/ or payouts/."}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+        if request.user.role != 'admin':
+            return Response({"error": "Only admins can close or reopen payroll months."}, status=status.HTTP_403_FORBIDDEN)
+        month_date = self._month(month)
+        if month_date is None:
+            return Response({"error": "Invalid month format. Use YYYY-MM."}, status=status.HTTP_400_BAD_REQUEST)
+        reason = request.data.get('reason', '')
 
-        
-        leave_table_data = [
-            [Paragraph('Leave Details', leave_heading_style), '', '', ''],
-            [Paragraph('Paid Leaves', leave_table_header_style), Paragraph('Sick Leaves', leave_table_header_style), Paragraph('Unpaid Leaves', leave_table_header_style), Paragraph('Total leaves Taken', leave_table_header_style)],
-            [Paragraph(str(leave.paid_leaves), leave_table_value_style), Paragraph(str(leave.sick_leaves), leave_table_value_style), Paragraph(str(leave.unpaid_leaves), leave_table_value_style), Paragraph(str(leave.total_leaves_taken), leave_table_value_style)],
-            [Paragraph(f"Leave Balance : {leave.total_paid_leaves_left} Days", leave_balance_style), '', Paragraph(f"Sick Leave Balance : {leave.total_sick_leaves_left} Days", leave_balance_style), '']
-        ]
-
-        leave_table = Table(leave_table_data, colWidths=[85, 85, 85, 105]) 
-        leave_table.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
-            ('SPAN', (0, 0), (-1, 0)),
-            ('SPAN', (0, 3), (1, 3)), # Span for Leave Balance
-            ('SPAN', (2, 3), (3, 3)), # Span for Sick Leave Balance
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('LEFTPADDING', (0,0), (-1,-1), 5),
-            ('RIGHTPADDING', (0,0), (-1,-1), 5),
-            ('TOPPADDING', (0,0), (-1,-1), 4),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 3),
-            ('BOTTOMPADDING', (0,-1), (-1,-1), 5),
-        ]))
-        #elements.append(leave_table)
-        wrapper_table = Table([[leave_table]], colWidths=[500])  # match outer width
-        wrapper_table.setStyle(TableStyle([
-            ('LEFTPADDING', (0, 0), (-1, -1), 0),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ]))
-        elements.append(wrapper_table)
-
-        doc.build(elements)
-        buffer.seek(0)
-        
-        filename = f"payslip_{employee_id}_{month_str}.pdf"
+        if self.action == 'payouts':
+            return self._payouts(request, month, month_date)
+        try:
+            if self.action == 'close':
+                if wants_async(request):
+                    job = enqueue_job('close_payroll_month', {"month": month, "reason": reason}, user=request.user)
+                    return job_accepted_response(job)
+                event = close_payroll_month(month_date, user=request.user, reason=reason)
+            else:
+                event = reopen_payroll_month(month_date, user=request.user, reason=reason)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        return FileResponse(buffer, as_attachment=True, filename=filename, content_type='application/pdf')
-    
+        return Response({
+            "month": month,
+            "closed": event.action == 'close',
+            "snapshot_count": event.snapshot_count,
+        }, status=status.HTTP_200_OK)
+
+    def _payouts(self, request, month, month_date):
+        if wants_async(request):
+            return job_accepted_response(enqueue_job('payout_files', {"month": month}, user=request.user))
+        try:
+            manifest = generate_payout_files(month_date)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        for f in manifest["files"]:
+            f["url"] = request.build_absolute_uri(default_storage.url(f["name"]))
+        payroll_logger.info(f"Payout files for {month} generated by {request.user.id}")
+        return Response(manifest, status=status.HTTP_200_OK)
 
-class MyPayslipsAPIView(APIView):
-    permission_classes = [IsAuthenticated]
+class MonthlyEmployeesPagination(PageNumberPagination):
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
 
-    def get(self, request):
-        employee = request.user  
-        payslips = Payroll.objects.filter(employee=employee).order_by('-month')
-        data = [
-            {
-                "month": p.month.strftime('%Y-%m'),
-                "net_fee_earned": p.net_fee_earned,
-                "employee_id": p.employee.id
-            }
-            for p in payslips
-        ]
-        return Response(data)
 
 @require_GET    
 @api_view(['GET'])
@@ -678,63 +585,67 @@ def monthly_employees_view(request):
         month_date = datetime.strptime(month_str, "%Y-%m").date().replace(day=1)
     except ValueError:
         return Response({"error": "Invalid format, use YYYY-MM"}, status=400)
-
-    employees_for_month = []
-    payroll_exists = False
-    existing_payroll_data = []
-
-    # Fetch all employees relevant to the selected month
-    all_relevant_employees = Employee.objects.filter(
-        # Only include employees who joined on or before the selected month
-        # This is more efficient than iterating all employees in Python
-        date_joined__year__lte=month_date.year,
-        date_joined__month__lte=month_date.month
+    month_end = month_date.replace(day=calendar.monthrange(month_date.year, month_date.month)[1])
+
+    # Employees who joined by the end of the month, LEFT JOINed to their payroll
+    # row for this month (unique per employee and month) in a single query
+    employee_rows = Employee.objects.filter(
+        date_joined__lte=month_end
+    ).annotate(
+        month_payroll=FilteredRelation('payrolls', condition=Q(payrolls__month=month_date))
+    ).values(
+        'id', 'name', 'role', 'pay_structure',
+        payroll_id=F('month_payroll__id'),
+        perform_category=F('month_payroll__perform_category'),
+        reimbursement=F('month_payroll__reimbursement'),
+        reimbursement_proof=F('month_payroll__reimbursement_proof'),
     ).order_by('id')
 
+    # Pagination is opt-in so existing clients keep receiving the full list
+    paginator = None
+    if 'page' in request.GET:
+        paginator = MonthlyEmployeesPagination()
+        employee_rows = paginator.paginate_queryset(employee_rows, request)
 
-    # Fetch all payroll records for the given month in one query
-    # and select_related to get employee data efficiently
-    payroll_records_for_month = Payroll.objects.filter(
-        month=month_date
-    ).select_related('employee')
-
-    # Determine if payroll already exists for this month
-    if payroll_records_for_month.exists():
-        payroll_exists = True
-        # Serialize existing payroll data
-        existing_payroll_data = PayrollSerializer(payroll_records_for_month, many=True, context={'request': request}).data
-
-    # Create a dictionary for quick lookup of existing payroll by employee ID
-    payroll_by_employee_id = {str(p.employee.id): p for p in payroll_records_for_month}
-
-
-    for emp in all_relevant_employees:
-        emp_data = {
-            "id": emp.id,
-            "name": emp.name,
-            "role": emp.role,
-            "pay_structure": emp.pay_structure,
-            # Default values if no payroll exists for this employee this month
-            "perform_category": "",
-            "reimbursement": 0.0,
-            "reimbursement_proof": None, # Default to None
-        }
-
-        # If payroll exists for this employee for this month, override defaults
-        if str(emp.id) in payroll_by_employee_id:
-            payroll_instance = payroll_by_employee_id[str(emp.id)]
-
-            serialized_payroll = PayrollSerializer(payroll_instance, context={'request': request}).data
-
-            emp_data["perform_category"] = serialized_payroll.get("perform_category", "")
-            emp_data["reimbursement"] = float(serialized_payroll.get("reimbursement", 0))
-            # Get the absolute URL from the serialized output
-            emp_data["reimbursement_proof"] = serialized_payroll.get("reimbursement_proof", None)
-        employees_for_month.append(emp_data)
-
+    proof_storage = Payroll._meta.get_field('reimbursement_proof').storage
+    employees_for_month = []
+    for row in employee_rows:
+        has_payroll = row['payroll_id'] is not None
+        proof = row['reimbursement_proof']
+        employees_for_month.append({
+            "id": row['id'],
+            "name": row['name'],
+            "role": row['role'],
+            "pay_structure": row['pay_structure'],
+            # Defaults when no payroll exists for this employee this month
+            "perform_category": row['perform_category'] if has_payroll else "",
+            "reimbursement": float(row['reimbursement']) if has_payroll else 0.0,
+            # Absolute URL, as PayrollSerializer renders it
+            "reimbursement_proof": request.build_absolute_uri(proof_storage.url(proof)) if proof else None,
+        })
+
+    # Serialize the month's payroll rows once (only the current page's when paginated)
+    payroll_records_for_month = Payroll.objects.filter(month=month_date).select_related('employee')
+    if paginator is not None:
+        payroll_records_for_month = payroll_records_for_month.filter(
+            employee_id__in=[row['id'] for row in employees_for_month]
+        )
+    existing_payroll_data = PayrollSerializer(payroll_records_for_month, many=True, context={'request': request}).data
+    if paginator is None:
+        payroll_exists = bool(existing_payroll_data)
+    else:
+        payroll_exists = Payroll.objects.filter(month=month_date).exists()
 
-    return Response({
+    data = {
         "employees": employees_for_month,
         "payroll_exists": payroll_exists,
+        "month_closed": PayrollMonthEvent.is_closed(month_date),
         "payroll_data": existing_payroll_data # Optionally, you can send this too, though the merged 'employees' might be enough
-    }, status=200)
+    }
+    if paginator is not None:
+        data.update({
+            "count": paginator.page.paginator.count,
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+        })
+    return Response(data, status=200)
@@ -0,0 +1,86 @@
+# payroll/ytd.py
+"""
+Year-to-date payroll figures over the April-March financial year.
+
+ytd_payslips returns a payslip history with running YTD columns computed by
+window functions, so the whole list is one query. Closed months report the
+figures frozen in their snapshot, like the payslips themselves. The per-year
+end totals are kept in PayrollYearTotals (see Payroll.save).
+"""
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When, Window
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, Coalesce, ExtractYear
+
+from .models import FINANCIAL_YEAR_START_MONTH, Payroll, PayrollSnapshot, financial_year_bounds
+
+YTD_FIELDS = ('fee_earned', 'tds', 'reimbursement', 'net_fee_earned')
+
+
+def financial_year_expression(field='month'):
+    """SQL counterpart of models.financial_year() for a date column."""
+    return ExtractYear(field) - Case(
+        When(**{f'{field}__month__lt': FINANCIAL_YEAR_START_MONTH}, then=Value(1)),
+        default=Value(0),
+    )
+
+
+def financial_quarter_expression(field='month'):
+    """SQL counterpart of models.financial_quarter() for a date column."""
+    return Case(
+        *[
+            When(**{f'{field}__month__in': [(FINANCIAL_YEAR_START_MONTH + 3 * q + m - 1) % 12 + 1 for m in range(3)]},
+                 then=Value(q + 1))
+            for q in range(4)
+        ],
+    )
+
+
+def _paid(field):
+    # the snapshot's figure while the month is closed, else the live row's
+    output_field = Payroll._meta.get_field(field).clone()
+    snapshot = PayrollSnapshot.objects.active().filter(employee_id=OuterRef('employee_id'), month=OuterRef('month'))
+    if field == 'net_fee_earned':
+        frozen = snapshot.values('net_fee_earned')[:1]
+    else:
+        frozen = snapshot.annotate(value=Cast(KT(f'payroll__{field}'), output_field)).values('value')[:1]
+    return Coalesce(Subquery(frozen, output_field=output_field), F(field), output_field=output_field)
+
+
+def ytd_payslips(employee_id=None, year=None, employees=None):
+    """
+    Payslips newest first as dicts: employee_id, month (a date),
+    financial_year, the month's fee_earned, tds, reimbursement and
+    net_fee_earned, and ytd_<field> running totals within the financial year.
+    Optionally limited to one employee (or the `employees` ids, a list or
+    a values_list queryset) and/or one financial year.
+    """
+    payrolls = Payroll.objects.all()
+    if employee_id is not None:
+        payrolls = payrolls.filter(employee_id=employee_id)
+    if employees is not None:
+        payrolls = payrolls.filter(employee_id__in=employees)
+    if year is not None:
+        start, end = financial_year_bounds(year)
+        payrolls = payrolls.filter(month__gte=start, month__lt=end)
+
+    partition = [F('employee_id'), financial_year_expression()]
+    annotations = {'fy': financial_year_expression()}
+    for field in YTD_FIELDS:
+        # aliases cannot reuse the model's field names
+        annotations[f'paid_{field}'] = _paid(field)
+        annotations[f'running_{field}'] = Window(
+            Sum(F(f'paid_{field}')), partition_by=partition, order_by=F('month').asc()
+        )
+    rows = payrolls.annotate(**annotations).order_by('-month', 'employee_id').values(
+        'employee_id', 'month', *annotations
+    )
+    return [
+        {
+            'employee_id': row['employee_id'],
+            'month': row['month'],
+            'financial_year': row['fy'],
+            **{field: row[f'paid_{field}'] for field in YTD_FIELDS},
+            **{f'ytd_{field}': row[f'running_{field}'] for field in YTD_FIELDS},
+        }
+        for row in rows
+    ]
@@ -0,0 +1,390 @@
+# payroll_management_system/metrics.py
+"""
+A small Prometheus-style metrics registry (counters, histograms, gauges)
+exported in the text exposition format at /metrics.
+
+Updates only touch an in-memory dict, so instrumenting a hot path costs a
+lock and a dict update. With several gunicorn workers each process writes its
+values to METRICS_DIR/<pid>.json from a background thread every
+METRICS_FLUSH_INTERVAL seconds (and at exit), never on the request path; a
+scrape flushes the serving process and merges every file: counters and
+histograms are summed over all processes (including exited ones, so totals
+do not drop when a worker is recycled), gauges over live processes only.
+The files of exited processes are folded into METRICS_DIR/retired.json by
+the next scrape. Clear METRICS_DIR when the service is restarted.
+"""
+import atexit
+import fcntl
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Where the counters and histograms of exited processes are kept
+RETIRED_FILE = 'retired.json'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._flusher_pid = None
+        atexit.register(self._flush_at_exit)
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def _update(self, metric, key, func):
+        with self._lock:
+            if os.getpid() != self._pid:
+                # forked worker: start from zero instead of inheriting the parent's values
+                for m in self._metrics.values():
+                    m._values.clear()
+                self._pid = os.getpid()
+            metric._values[key] = func(metric._values.get(key))
+            if self._flusher_pid != self._pid:
+                # threads do not survive a fork, so each process starts its own
+                self._flusher_pid = self._pid
+                threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while os.getpid() == pid:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except OSError:
+                pass  # METRICS_DIR unwritable right now; try again next interval
+
+    def _flush_at_exit(self):
+        if self._flusher_pid == os.getpid():
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def _snapshot(self):
+        # computed gauges are evaluated by whichever process is scraped, not stored
+        with self._lock:
+            return {
+                name: [[list(key), value] for key, value in metric._values.items()]
+                for name, metric in self._metrics.items()
+                if not metric.computed
+            }
+
+    def flush(self):
+        """Writes this process's values to METRICS_DIR/<pid>.json (atomically)."""
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def _collect_processes(self):
+        """[(pid, snapshot)] for every process that wrote values, this one included."""
+        own_pid = os.getpid()
+        processes = [(own_pid, self._snapshot())]
+        directory = settings.METRICS_DIR
+        if not directory or not os.path.isdir(directory):
+            return processes
+
+        self.flush()
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json') or filename == RETIRED_FILE:
+                continue
+            pid = int(filename[:-5])
+            if pid == own_pid:
+                continue
+            path = os.path.join(directory, filename)
+            if not _pid_alive(pid):
+                try:
+                    # claims the file; a concurrent scrape gets FileNotFoundError
+                    os.rename(path, f"{path}.retiring")
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as f:
+                    processes.append((pid, json.load(f)))
+            except (OSError, ValueError):
+                continue  # being replaced or removed right now
+        retired = self._retire(directory)
+        if retired:
+            processes.append((None, retired))
+        return processes
+
+    def _retire(self, directory):
+        """
+        Folds the claimed files of exited processes into RETIRED_FILE (their
+        counters and histograms; gauges die with the process), deletes them
+        and returns the retired totals.
+        """
+        path = os.path.join(directory, RETIRED_FILE)
+        with open(os.path.join(directory, f"{RETIRED_FILE}.lock"), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(path) as f:
+                    retired = json.load(f)
+            except (OSError, ValueError):
+                retired = {}
+            claimed = [name for name in os.listdir(directory) if name.endswith('.json.retiring')]
+            if not claimed:
+                return retired
+
+            merged = {name: {tuple(key): value for key, value in samples} for name, samples in retired.items()}
+            for filename in claimed:
+                try:
+                    with open(os.path.join(directory, filename)) as f:
+                        snapshot = json.load(f)
+                except (OSError, ValueError):
+                    snapshot = {}
+                for name, samples in snapshot.items():
+                    metric = self._metrics.get(name)
+                    if metric is None or metric.type == 'gauge':
+                        continue
+                    values = merged.setdefault(name, {})
+                    for key, value in samples:
+                        values[tuple(key)] = metric.merge(values.get(tuple(key)), value)
+            retired = {name: [[list(key), value] for key, value in values.items()] for name, values in merged.items()}
+            with open(f"{path}.tmp", 'w') as f:
+                json.dump(retired, f)
+            os.replace(f"{path}.tmp", path)
+            for filename in claimed:
+                os.remove(os.path.join(directory, filename))
+        return retired
+
+    def render(self):
+        """All metrics, merged across processes, in Prometheus text format."""
+        for metric in self._metrics.values():
+            metric.refresh()
+        merged = {name: {} for name in self._metrics}
+        for pid, snapshot in self._collect_processes():
+            alive = pid is not None and _pid_alive(pid)
+            for name, samples in snapshot.items():
+                metric = self._metrics.get(name)
+                if metric is None or (metric.type == 'gauge' and not alive):
+                    continue
+                values = merged[name]
+                for key, value in samples:
+                    key = tuple(key)
+                    values[key] = metric.merge(values.get(key), value)
+        for name, metric in self._metrics.items():
+            if metric.computed:
+                merged[name] = dict(metric._values)
+
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for key, value in sorted(merged[name].items()):
+                lines.extend(metric.render_samples(key, value))
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+    computed = False
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._registry = registry or REGISTRY
+        self._registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def refresh(self):
+        pass
+
+    def render_samples(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self._registry._update(self, self._key(labels), lambda current: (current or 0) + amount)
+
+    @staticmethod
+    def merge(current, value):
+        return (current or 0) + value
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down. `set_function` makes it computed when
+    scraped (e.g. a queue length), in the scraping process only.
+    """
+    type = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._function = None
+
+    def set(self, value, **labels):
+        self._registry._update(self, self._key(labels), lambda current: value)
+
+    def inc(self, amount=1, **labels):
+        self._registry._update(self, self._key(labels), lambda current: (current or 0) + amount)
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, func):
+        """func() returns a number, or {label value tuple: number} for labelled gauges."""
+        self._function = func
+        self.computed = True
+        return func
+
+    def refresh(self):
+        if self._function is None:
+            return
+        result = self._function()
+        values = result if isinstance(result, dict) else {(): result}
+        with self._registry._lock:
+            self._values = {tuple(key): value for key, value in values.items()}
+
+    @staticmethod
+    def merge(current, value):
+        return (current or 0) + value
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+
+        def add(current):
+            # [per-bucket counts (not cumulative)..., sum, count]
+            current = list(current) if current else [0] * len(self.buckets) + [0.0, 0]
+            current[index] += 1
+            current[-2] += value
+            current[-1] += 1
+            return current
+
+        self._registry._update(self, self._key(labels), add)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    @staticmethod
+    def merge(current, value):
+        if current is None:
+            return list(value)
+        return [a + b for a, b in zip(current, value)]
+
+    def render_samples(self, key, value):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, value):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(value[-2])}")
+        lines.append(f"{self.name}_count{labels} {value[-1]}")
+        return lines
+
+
+REGISTRY = MetricsRegistry()
+
+
+# --- Application metrics ---
+
+PAYROLL_GENERATED = Counter(
+    'payroll_rows_generated_total', 'Payroll rows created or recomputed.', ['action'])
+PAYSLIP_RENDER_SECONDS = Histogram(
+    'payslip_render_seconds', 'Time to render one payslip PDF.', ['view'])
+PAYSLIP_EMAILS = Counter(
+    'payslip_emails_total', 'Payslip emails by outcome (sent, failed, no_address).', ['outcome'])
+ATTENDANCE_PUNCHES = Counter(
+    'attendance_punches_total', 'Clock-in/out punches received.', ['kind', 'path'])
+LEAVE_APPROVALS = Counter(
+    'leave_approvals_total', 'Approved leave requests applied to attendance.', ['leave_type'])
+LEAVE_APPROVAL_DAYS = Counter(
+    'leave_approval_days_total', 'Attendance days written by approved leave.', ['leave_type'])
+BACKUPS = Counter(
+    'backups_total', 'Backups by mode and outcome.', ['mode', 'outcome'])
+BACKUP_SECONDS = Histogram(
+    'backup_duration_seconds', 'Time to produce a complete backup.', ['mode'])
+JOB_QUEUE_DEPTH = Gauge(
+    'job_queue_depth', 'Background jobs waiting or running.', ['status'])
+PUNCH_BACKLOG = Gauge(
+    'attendance_punch_backlog', 'Queued punches not yet consolidated into Attendance.')
+
+
+@JOB_QUEUE_DEPTH.set_function
+def _job_queue_depth():
+    from django.db.models import Count
+    from jobs.models import Job
+
+    counts = {(status,): 0 for status in ('queued', 'running')}
+    for row in Job.objects.filter(status__in=['queued', 'running']).values('status').annotate(n=Count('id')):
+        counts[(row['status'],)] = row['n']
+    return counts
+
+
+@PUNCH_BACKLOG.set_function
+def _punch_backlog():
+    from attendance.models import AttendancePunch
+
+    return AttendancePunch.objects.filter(processed=False).count()
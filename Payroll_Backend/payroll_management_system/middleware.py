@@ -0,0 +1,159 @@
+# payroll_management_system/middleware.py
+"""
+Per-request cost accounting: SQL query count and time (via
+connection.execute_wrapper), DRF rendering time (via TimedJSONRenderer, the
+default renderer) and total latency.
+
+Every response gets a Server-Timing header, slow requests are written to the
+`request_performance` logger, and the last REQUEST_STATS_WINDOW timings of
+each URL name are kept in memory for the admin-only /api/request-stats/
+endpoint. The window is per process, so with several gunicorn workers each
+one reports the requests it served.
+
+A streamed body (CSV exports, backups) is produced after the view returns,
+so its Server-Timing header covers the time to the first byte only; the
+stats and the slow-request log are recorded when the body is exhausted or
+the client disconnects, with the queries run while streaming included.
+"""
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import connection
+from django.http import FileResponse
+from rest_framework.renderers import JSONRenderer
+
+perf_logger = logging.getLogger('request_performance')
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+# url name -> deque of (total_ms, db_ms, serializer_ms, queries)
+_request_stats = defaultdict(lambda: deque(maxlen=settings.REQUEST_STATS_WINDOW))
+
+
+class RequestCost:
+    """Collects the cost of one request; also the execute_wrapper callable."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer that charges the time spent rendering to the current request."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        cost = getattr(_local, 'cost', None)
+        started = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            if cost is not None:
+                cost.serializer_time += time.perf_counter() - started
+
+
+def _percentile(sorted_values, pct):
+    # nearest-rank
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def request_stats_snapshot():
+    """{url name: {count, p50/p95/p99 of total_ms, avg db_ms/serializer_ms/queries}}."""
+    with _stats_lock:
+        samples = {name: list(window) for name, window in _request_stats.items()}
+
+    summary = {}
+    for name, rows in samples.items():
+        totals = sorted(row[0] for row in rows)
+        count = len(rows)
+        summary[name] = {
+            "count": count,
+            "p50_ms": round(_percentile(totals, 50), 2),
+            "p95_ms": round(_percentile(totals, 95), 2),
+            "p99_ms": round(_percentile(totals, 99), 2),
+            "avg_db_ms": round(sum(row[1] for row in rows) / count, 2),
+            "avg_serializer_ms": round(sum(row[2] for row in rows) / count, 2),
+            "avg_queries": round(sum(row[3] for row in rows) / count, 1),
+            "max_queries": max(row[3] for row in rows),
+        }
+    return summary
+
+
+def reset_request_stats():
+    with _stats_lock:
+        _request_stats.clear()
+
+
+class RequestTimingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cost = RequestCost()
+        _local.cost = cost
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(cost):
+                response = self.get_response(request)
+        finally:
+            _local.cost = None
+
+        response['Server-Timing'] = (
+            f'db;dur={cost.db_time * 1000:.1f};desc="{cost.queries} queries", '
+            f'ser;dur={cost.serializer_time * 1000:.1f}, '
+            f'total;dur={(time.perf_counter() - started) * 1000:.1f}'
+        )
+        # FileResponse is left alone so the server can still send the file directly
+        if response.streaming and not response.is_async and not isinstance(response, FileResponse):
+            response.streaming_content = self._timed_stream(
+                request, response, iter(response.streaming_content), cost, started
+            )
+        else:
+            self._record(request, response, cost, started)
+        return response
+
+    def _timed_stream(self, request, response, content, cost, started):
+        try:
+            while True:
+                with connection.execute_wrapper(cost):
+                    try:
+                        chunk = next(content)
+                    except StopIteration:
+                        return
+                yield chunk
+        finally:
+            self._record(request, response, cost, started)
+
+    def _record(self, request, response, cost, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = cost.db_time * 1000
+        serializer_ms = cost.serializer_time * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        # unresolved paths share one bucket so 404 scans cannot grow the table
+        url_name = match.view_name if match is not None else '<unresolved>'
+        with _stats_lock:
+            _request_stats[url_name].append((total_ms, db_ms, serializer_ms, cost.queries))
+
+        if total_ms >= settings.SLOW_REQUEST_MS or cost.queries >= settings.SLOW_REQUEST_QUERIES:
+            perf_logger.warning(
+                f"Slow request {request.method} {request.path} ({url_name}): "
+                f"{total_ms:.0f} ms total, {cost.queries} queries in {db_ms:.0f} ms, "
+                f"rendering {serializer_ms:.0f} ms, status {response.status_code}"
+            )
@@ -12,8 +12,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
-from decouple import config
+from decouple import config, Csv
 import os
+import tempfile
 
 
 
@@ -49,10 +50,13 @@ INSTALLED_APPS = [
     'payroll',
     'leave_requests',
     'backup_restore',
+    'jobs',
+    'benchmarks',
     'corsheaders',
 ]
 
 MIDDLEWARE = [
+    'payroll_management_system.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -162,7 +166,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',  # ✅ Ensure API returns JSON responses
+        'payroll_management_system.middleware.TimedJSONRenderer',  # ✅ JSONRenderer, timed for Server-Timing
     ],
 
     'DEFAULT_PARSER_CLASSES': [
@@ -186,10 +190,40 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')   # ✅ Use App Password (no
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 
+# When enabled, mark-entry1/mark-exit1 append to the AttendancePunch log and
+# return 202; run `manage.py consolidate_punches --loop` to fold punches into Attendance.
+ATTENDANCE_PUNCH_QUEUE = config('ATTENDANCE_PUNCH_QUEUE', default=False, cast=bool)
+
+# RequestTimingMiddleware: requests over either limit go to request_performance.log
+SLOW_REQUEST_MS = config('SLOW_REQUEST_MS', default=1000, cast=int)
+SLOW_REQUEST_QUERIES = config('SLOW_REQUEST_QUERIES', default=50, cast=int)
+REQUEST_STATS_WINDOW = config('REQUEST_STATS_WINDOW', default=500, cast=int)  # timings kept per URL name
+
+# /metrics (Prometheus text format). Each gunicorn worker writes its values to
+# METRICS_DIR so a scrape of any worker sees them all; empty = this process only.
+METRICS_DIR = config('METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'payroll_metrics'))
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=float)  # seconds
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1', cast=Csv())
+# Bearer token Prometheus must send (authorization.credentials in its scrape
+# config); /metrics stays off while it is empty.
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Bank payout files (payroll.payouts). PAYOUT_IFSC_FILE is the bank-published
+# IFSC list (one code per line, or a CSV with an IFSC column) that payees are
+# checked against; empty = check the IFSC format only.
+PAYOUT_IFSC_FILE = config('PAYOUT_IFSC_FILE', default='')
+PAYOUT_NARRATION = config('PAYOUT_NARRATION', default='SALARY')
+
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 PAYSLIP_STORAGE_DIR = os.path.join(MEDIA_ROOT, 'payslips')
 PAYSLIP_ARCHIVE_DIR = os.path.join(MEDIA_ROOT, 'payslips_archive')
+# 'platypus' lays the payslip out with ReportLab tables; 'canvas' draws the
+# same page at fixed coordinates (payroll.payslip_canvas), several times faster.
+PAYSLIP_RENDERER = config('PAYSLIP_RENDERER', default='platypus')
+# Resolution the logo is downsampled to before it is embedded (payroll.logo)
+PAYSLIP_LOGO_DPI = config('PAYSLIP_LOGO_DPI', default=150, cast=int)
 
 LOGGING = {
     'version': 1,
@@ -217,6 +251,12 @@ LOGGING = {
             'filename': os.path.join(MEDIA_ROOT, 'employee_operations.log'), # New log file path
             'formatter': 'verbose', 
         },
+        'performance_file': {
+            'level': 'INFO',
+            'class': 'logging.FileHandler',
+            'filename': os.path.join(MEDIA_ROOT, 'request_performance.log'), # Slow requests from RequestTimingMiddleware
+            'formatter': 'verbose',
+        },
         'console': {
             'class': 'logging.StreamHandler',
             'formatter': 'simple',
@@ -233,6 +273,11 @@ LOGGING = {
             'level': 'INFO', 
             'propagate': False, 
         },
+        'request_performance': {
+            'handlers': ['performance_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 DEBUG = True
\ No newline at end of file
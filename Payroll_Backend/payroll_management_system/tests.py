@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import date
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from employee.models import Employee
+from .metrics import Counter, Gauge, Histogram, MetricsRegistry
+from .middleware import reset_request_stats
+
+
+class RequestTimingMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Employee.objects.create_user(
+            id='900700', email='timing@example.com', password='pass',
+            name='Timing', role='admin', date_joined=date(2024, 1, 1),
+        )
+
+    def setUp(self):
+        reset_request_stats()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    @override_settings(SLOW_REQUEST_QUERIES=1)
+    def test_server_timing_header_stats_and_slow_log(self):
+        with self.assertLogs('request_performance', level='WARNING') as logs:
+            response = self.client.get('/api/attendance/attendance/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", ser;dur=[\d.]+, total;dur=[\d.]+$')
+        self.assertIn('attendance-list', logs.output[0])
+
+        stats = self.client.get('/api/request-stats/').data
+        self.assertEqual(stats['attendance-list']['count'], 1)
+        self.assertGreaterEqual(stats['attendance-list']['max_queries'], 1)
+
+    def test_streamed_export_is_recorded_when_the_body_ends(self):
+        response = self.client.get('/api/payroll/register/?month=2024-01')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ser;dur=', response['Server-Timing'])
+        self.assertNotIn('payroll-register', self.client.get('/api/request-stats/').data)
+
+        b''.join(response.streaming_content)
+        stats = self.client.get('/api/request-stats/').data
+        self.assertEqual(stats['payroll-register']['count'], 1)
+        self.assertGreaterEqual(stats['payroll-register']['max_queries'], 1)
+
+    def test_stats_endpoint_is_admin_only(self):
+        other = Employee.objects.create_user(
+            id='900701', email='nottiming@example.com', password='pass',
+            name='Not admin', date_joined=date(2024, 1, 1),
+        )
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get('/api/request-stats/').status_code, 403)
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir)
+        override = override_settings(METRICS_DIR=self.metrics_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_registry_merges_worker_files_in_text_format(self):
+        registry = MetricsRegistry()
+        punches = Counter('punches_total', 'Punches.', ['kind'], registry=registry)
+        render = Histogram('render_seconds', 'Render time.', buckets=(0.1, 1), registry=registry)
+        in_flight = Gauge('in_flight', 'In flight.', registry=registry)
+
+        punches.inc(kind='entry')
+        punches.inc(2, kind='entry')
+        render.observe(0.05)
+        render.observe(0.5)
+        in_flight.set(3)
+        # another worker, already exited: its counter survives, its gauge does not
+        with open(os.path.join(self.metrics_dir, '999999999.json'), 'w') as f:
+            json.dump({'punches_total': [[['entry'], 4]], 'in_flight': [[[], 7]]}, f)
+
+        text = registry.render()
+        self.assertIn('# TYPE punches_total counter\npunches_total{kind="entry"} 7\n', text)
+        self.assertIn('render_seconds_bucket{le="0.1"} 1\n', text)
+        self.assertIn('render_seconds_bucket{le="+Inf"} 2\n', text)
+        self.assertIn('render_seconds_count 2\n', text)
+        self.assertIn('in_flight 3\n', text)
+        # the exited worker's file is folded into retired.json, keeping its counter
+        self.assertEqual(sorted(os.listdir(self.metrics_dir)), [f'{os.getpid()}.json', 'retired.json', 'retired.json.lock'])
+        self.assertIn('punches_total{kind="entry"} 7\n', registry.render())
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_metrics_endpoint_requires_token(self):
+        auth = {'HTTP_AUTHORIZATION': 'Bearer scrape-secret'}
+        response = self.client.get('/metrics', **auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE payroll_rows_generated_total counter', response.content)
+        self.assertIn(b'attendance_punch_backlog 0', response.content)
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3', **auth).status_code, 404)
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 404)
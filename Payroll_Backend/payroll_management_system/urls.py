@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from .views import request_stats_view, metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -26,7 +27,10 @@ urlpatterns = [
     path('api/leavedetails/', include('leavedetails.urls')),
     path('api/payroll/', include('payroll.urls')),
     path('api/leave-requests/', include('leave_requests.urls')),
-    path('api/backup_restore/', include('backup_restore.urls'))
+    path('api/backup_restore/', include('backup_restore.urls')),
+    path('api/jobs/', include('jobs.urls')),
+    path('api/request-stats/', request_stats_view, name='request-stats'),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
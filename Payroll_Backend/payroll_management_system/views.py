@@ -0,0 +1,46 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .metrics import REGISTRY
+from .middleware import request_stats_snapshot, reset_request_stats
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def request_stats_view(request):
+    """
+    Admin-only: rolling latency percentiles, DB/rendering time and query
+    counts per URL name for this worker process. DELETE clears the window.
+    """
+    if request.user.role != 'admin':
+        return Response({"detail": "Not authorized."}, status=status.HTTP_403_FORBIDDEN)
+
+    if request.method == 'DELETE':
+        reset_request_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(request_stats_snapshot())
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Answered only for a request from
+    METRICS_ALLOWED_IPS carrying "Authorization: Bearer <METRICS_TOKEN>"
+    (Prometheus does not send the API's JWT; a local reverse proxy makes
+    every client look like 127.0.0.1). 404 for everyone else, and for
+    everyone while METRICS_TOKEN is unset.
+    """
+    token = settings.METRICS_TOKEN
+    supplied = request.META.get('HTTP_AUTHORIZATION', '')
+    if (
+        not token
+        or request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS
+        or not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode())
+    ):
+        return HttpResponse(status=404)
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,7 @@
+# reportlab_settings.py
+# ReportLab reads its overrides from this module at import time (it must be
+# importable, i.e. next to manage.py on the path the server is started from).
+
+# PDFs are stored and mailed as binary files; ASCII85-armouring their
+# compressed streams and images only makes them a quarter larger
+useA85 = 0